@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -12,14 +13,45 @@ db = SQLAlchemy()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 
-def create_app():
+def create_app(config_name=None, config_overrides=None):
+    """
+    Tạo Flask app
+    - config_name: 'development' | 'production' (mặc định lấy từ biến môi trường APP_CONFIG,
+      không có thì dùng Config gốc)
+    - config_overrides: dict ghi đè config (dùng cho benchmark / script)
+    """
     app = Flask(__name__, template_folder='views')
     
     # Load config
-    app.config.from_object('app.config.Config')
+    from app.config import config
+    config_name = config_name or os.environ.get('APP_CONFIG')
+    app.config.from_object(config[config_name] if config_name else 'app.config.Config')
+    if config_overrides:
+        app.config.update(config_overrides)
     
-    # Khởi tạo database
+    # Bytecode cache cho template (phải đăng ký trước khi jinja_env được tạo)
+    from app.utils.startup import init_template_cache, dispose_engines_after_fork
+    init_template_cache(app)
+    
+    # Khởi tạo database; pool kết nối được bỏ trong process con sau fork (gunicorn --preload)
     db.init_app(app)
+    dispose_engines_after_fork(app)
+    
+    # Áp dụng PRAGMA cho SQLite (WAL, busy timeout...) trên mỗi kết nối mới
+    from app.utils.sqlite import configure_sqlite
+    configure_sqlite(app)
+    
+    # Số liệu request / SQL / template cho Prometheus (/metrics)
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+    
+    # Cảnh báo N+1 query trong môi trường dev / test (NPLUSONE_DETECT)
+    from app.utils.nplusone import init_nplusone
+    init_nplusone(app)
+    
+    # Cache fragment HTML cho các trang danh sách (FRAGMENT_CACHE_TYPE)
+    from app.utils.fragment_cache import init_fragment_cache
+    init_fragment_cache(app)
     
     # Khởi tạo CSRF protection
     csrf.init_app(app)
@@ -30,31 +62,54 @@ def create_app():
     login_manager.login_message = 'Vui lòng đăng nhập để truy cập trang này.'
     login_manager.login_message_category = 'warning'
     
-    # User loader cho Flask-Login
+    # User loader cho Flask-Login: dùng bản chụp Principal được cache,
+    # phần lớn request không cần query bảng users
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models.user import User
-        return User.query.get(int(user_id))
+        from app.utils.principal import load_principal
+        return load_principal(int(user_id))
     
     # Import models trước khi tạo tables (QUAN TRỌNG!)
     from app.models.user import User
     from app.models.assignment import Assignment
     from app.models.submission import Submission
     from app.models.challenge import Challenge
+    from app.models.counter import Counter
+    from app.models.blob import Blob
+    from app.models.chunked_upload import ChunkedUpload
+    from app.models.job import Job
+    from app.models.stored_result import StoredResult
+    from app.models.challenge_attempt import ChallengeAttempt, ChallengeStanding, UserScore
+    from app.models.search_document import SearchDocument
     
-    # Tạo database tables
-    with app.app_context():
-        db.create_all()
-        print("✓ Database tables created successfully!")
+    # Tạo bảng / index còn thiếu ngay khi tạo app (môi trường dev / test)
+    # Production tắt AUTO_UPGRADE_SCHEMA: schema được nâng cấp một lần ở bước release
+    # (flask db upgrade) nên worker khởi động không chạm vào database
+    if app.config.get('AUTO_UPGRADE_SCHEMA'):
+        from app.schema import upgrade_schema
+        with app.app_context():
+            changes = upgrade_schema()
+        if changes:
+            app.logger.info('Schema đã cập nhật: %s', ', '.join(changes))
     
     # Import và đăng ký blueprints
     from app.controllers.auth_controller import auth_bp
     from app.controllers.user_controller import user_bp
     from app.controllers.assignment_controller import assignment_bp
     from app.controllers.challenge_controller import challenge_bp
+    from app.controllers.upload_controller import upload_bp
+    from app.controllers.job_controller import job_bp
+    from app.controllers.search_controller import search_bp
     app.register_blueprint(auth_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(assignment_bp)
     app.register_blueprint(challenge_bp)
+    app.register_blueprint(upload_bp)
+    app.register_blueprint(job_bp)
+    app.register_blueprint(search_bp)
+    
+    # Đăng ký các lệnh CLI
+    from app.cli import register_commands
+    register_commands(app)
     
     return app
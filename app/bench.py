@@ -0,0 +1,427 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import click
+from flask.cli import AppGroup
+
+
+bench_cli = AppGroup('bench', help='Benchmark hiệu năng')
+
+
+def _bench_overrides(database_path, upload_folder):
+    return {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + database_path,
+        'UPLOAD_FOLDER': upload_folder,
+    }
+
+
+def _submission_worker(config_name, overrides, student_ids, assignment_id, barrier, results):
+    """Một process giả lập gunicorn worker: nộp bài liên tục ngay khi barrier mở"""
+    from app import create_app
+    from app.services.assignment_service import AssignmentService
+
+    app = create_app(config_name, overrides)
+    ok, locked, other = 0, 0, 0
+    latencies = []
+    with app.app_context():
+        barrier.wait()
+        for student_id in student_ids:
+            started = time.perf_counter()
+            submission, error = AssignmentService.create_submission(
+                student_id, assignment_id, f'submissions/bench_{student_id}.zip', 'bench.zip'
+            )
+            latencies.append(time.perf_counter() - started)
+            if submission:
+                ok += 1
+            elif 'locked' in error:
+                locked += 1
+            else:
+                other += 1
+    results.put((ok, locked, other, latencies))
+
+
+def _seed_submission_bench(config_name, overrides, total_students):
+    """Tạo schema, 1 giáo viên, 1 bài tập và total_students sinh viên (hash mật khẩu dùng chung)"""
+    from app import create_app, db
+    from app.models.user import User
+    from app.services.assignment_service import AssignmentService
+    from app.schema import upgrade_schema
+    from app.services.counter_service import CounterService
+
+    app = create_app(config_name, overrides)
+    with app.app_context():
+        upgrade_schema()
+        teacher = User('bench_teacher', 'Bench Teacher', 'bench_teacher@example.com', None, 'teacher')
+        teacher.set_password('bench')
+        db.session.add(teacher)
+        db.session.commit()
+
+        password_hash = teacher.password
+        students = []
+        for i in range(total_students):
+            student = User(f'bench_s{i}', f'Bench Student {i}', f'bench_s{i}@example.com', None, 'student')
+            student.password = password_hash
+            students.append(student)
+        db.session.add_all(students)
+        db.session.commit()
+
+        assignment, _ = AssignmentService.create_assignment('Bench', None, teacher.id)
+        CounterService.rebuild_all()
+        return assignment.id, [student.id for student in students]
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def run_submission_bench(config_name, processes, per_process):
+    """
+    Chạy `processes` process cùng lúc, mỗi process nộp `per_process` bài trên database tạm
+    Returns: dict kết quả
+    """
+    workdir = tempfile.mkdtemp(prefix='classroom-bench-')
+    try:
+        overrides = _bench_overrides(os.path.join(workdir, 'bench.db'), os.path.join(workdir, 'uploads'))
+        assignment_id, student_ids = _seed_submission_bench(config_name, overrides, processes * per_process)
+
+        ctx = multiprocessing.get_context('spawn')
+        barrier = ctx.Barrier(processes + 1)
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(
+                target=_submission_worker,
+                args=(config_name, overrides, student_ids[i::processes], assignment_id, barrier, results)
+            )
+            for i in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        started = time.perf_counter()
+        collected = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - started
+        for worker in workers:
+            worker.join()
+
+        latencies = [latency for *_, worker_latencies in collected for latency in worker_latencies]
+        ok = sum(item[0] for item in collected)
+        return {
+            'profile': config_name or 'default',
+            'ok': ok,
+            'locked': sum(item[1] for item in collected),
+            'other_errors': sum(item[2] for item in collected),
+            'seconds': elapsed,
+            'throughput': ok / elapsed if elapsed else 0.0,
+            'p50_ms': _percentile(latencies, 50) * 1000,
+            'p99_ms': _percentile(latencies, 99) * 1000,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@bench_cli.command('submissions')
+@click.option('--processes', default=8, show_default=True, help='Số process ghi đồng thời (giả lập gunicorn worker)')
+@click.option('--per-process', default=200, show_default=True, help='Số bài nộp mỗi process')
+@click.option('--profile', 'profiles', multiple=True, default=['default', 'production'], show_default=True,
+              help='Profile config cần so sánh (default = Config gốc)')
+def bench_submissions(processes, per_process, profiles):
+    """So sánh throughput create_submission đồng thời giữa các profile database"""
+    click.echo(f'{"profile":<12} {"ok":>6} {"locked":>7} {"errors":>7} {"sec":>8} {"commit/s":>9} {"p50 ms":>8} {"p99 ms":>8}')
+    for profile in profiles:
+        result = run_submission_bench(None if profile == 'default' else profile, processes, per_process)
+        click.echo(f'{result["profile"]:<12} {result["ok"]:>6} {result["locked"]:>7} {result["other_errors"]:>7} '
+                   f'{result["seconds"]:>8.2f} {result["throughput"]:>9.1f} '
+                   f'{result["p50_ms"]:>8.1f} {result["p99_ms"]:>8.1f}')
+
+
+@bench_cli.command('load')
+@click.option('--url', default=None, help='Server đang chạy cần test (bỏ trống = tự chạy gunicorn run:app)')
+@click.option('--workers', default=4, show_default=True, help='Số gunicorn worker khi tự chạy server')
+@click.option('--users', default=20, show_default=True, help='Số người dùng ảo đồng thời')
+@click.option('--duration', default=30.0, show_default=True, help='Thời gian chạy (giây)')
+@click.option('--teacher-ratio', default=0.1, show_default=True, help='Tỉ lệ người dùng ảo là giáo viên')
+@click.option('--upload-size', default=4096, show_default=True, help='Kích thước file nộp bài (byte)')
+@click.option('--password', default=None, help='Mật khẩu tài khoản test (mặc định của flask seed)')
+def bench_load(url, workers, users, duration, teacher_ratio, upload_size, password):
+    """Load test các route thật (login, danh sách, nộp bài, tải file, challenge) và in p50/p95/p99"""
+    from contextlib import nullcontext
+    from flask import current_app
+    from app.loadtest import gunicorn_server, load_targets, run_load_test
+    from app.seed import SEED_PASSWORD
+
+    targets = load_targets()
+    if not targets['students']:
+        raise click.ClickException('Không có tài khoản seed, hãy chạy: flask --app run seed')
+
+    project_root = os.path.dirname(current_app.root_path)
+    # gunicorn.conf.py mặc định APP_CONFIG=production (cookie secure): giữ config của lệnh hiện tại
+    server = nullcontext(url) if url else gunicorn_server(project_root, workers=workers,
+                                                          env={'APP_CONFIG': os.environ.get('APP_CONFIG', '')})
+    with server as base_url:
+        click.echo(f'Load test {base_url}: {users} người dùng ảo trong {duration:.0f}s...')
+        rows, elapsed = run_load_test(base_url, targets, password or SEED_PASSWORD, users=users,
+                                      duration=duration, teacher_ratio=teacher_ratio, upload_size=upload_size)
+
+    click.echo(f'{"route":<22} {"count":>7} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for row in rows:
+        click.echo(f'{row["route"]:<22} {row["count"]:>7} {row["errors"]:>7} {row["rps"]:>8.1f} '
+                   f'{row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} {row["p99_ms"]:>8.1f}')
+    click.echo(f'({elapsed:.1f}s)')
+
+
+def run_login_bench(hash_workers, threads, logins, method=None):
+    """
+    `threads` thread (giả lập gthread worker) cùng gọi UserService.authenticate
+    với PASSWORD_HASH_WORKERS = hash_workers trên database tạm
+    Returns: dict kết quả
+    """
+    import threading
+    from app import create_app, db
+    from app.models.user import User
+    from app.schema import upgrade_schema
+    from app.services.user_service import UserService
+    from app.utils.passwords import shutdown_pool
+
+    workdir = tempfile.mkdtemp(prefix='classroom-bench-')
+    try:
+        overrides = _bench_overrides(os.path.join(workdir, 'bench.db'), os.path.join(workdir, 'uploads'))
+        overrides['PASSWORD_HASH_WORKERS'] = hash_workers
+        if method:
+            overrides['PASSWORD_HASH_METHOD'] = method
+        app = create_app(None, overrides)
+        with app.app_context():
+            upgrade_schema()
+            template = User('bench_login', 'Bench', 'bench_login@example.com', None, 'student')
+            template.set_password('bench')
+            users = []
+            for i in range(threads):
+                user = User(f'bench_login{i}', 'Bench', f'bench_login{i}@example.com', None, 'student')
+                user.password = template.password
+                users.append(user)
+            db.session.add_all(users)
+            db.session.commit()
+
+        latencies = []
+        failures = []
+        lock = threading.Lock()
+
+        def worker(index, count):
+            with app.app_context():
+                for _ in range(count):
+                    started = time.perf_counter()
+                    ok = UserService.authenticate(f'bench_login{index}', 'bench') is not None
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        if not ok:
+                            failures.append(index)
+                    db.session.remove()
+
+        per_thread = max(1, logins // threads)
+        workers = [threading.Thread(target=worker, args=(i, per_thread)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        shutdown_pool()
+
+        return {
+            'hash_workers': hash_workers,
+            'logins': len(latencies),
+            'failures': len(failures),
+            'seconds': elapsed,
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': _percentile(latencies, 50) * 1000,
+            'p99_ms': _percentile(latencies, 99) * 1000,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@bench_cli.command('login')
+@click.option('--threads', default=16, show_default=True, help='Số request đăng nhập đồng thời')
+@click.option('--logins', default=200, show_default=True, help='Tổng số lần đăng nhập')
+@click.option('--hash-workers', 'hash_workers_list', multiple=True, type=int, default=[0, os.cpu_count() or 1],
+              show_default=True, help='PASSWORD_HASH_WORKERS cần so sánh (0 = hash ngay trong request)')
+@click.option('--method', default=None, help='PASSWORD_HASH_METHOD (mặc định theo config)')
+def bench_login(threads, logins, hash_workers_list, method):
+    """So sánh throughput đăng nhập đồng thời khi hash trong request và trong process pool"""
+    click.echo(f'{"hash workers":<13} {"logins":>7} {"fail":>5} {"sec":>8} {"login/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+    for hash_workers in hash_workers_list:
+        result = run_login_bench(hash_workers, threads, logins, method)
+        click.echo(f'{result["hash_workers"]:<13} {result["logins"]:>7} {result["failures"]:>5} '
+                   f'{result["seconds"]:>8.2f} {result["throughput"]:>8.1f} '
+                   f'{result["p50_ms"]:>8.1f} {result["p99_ms"]:>8.1f}')
+
+
+# Chạy trong process Python mới để đo đúng chi phí của một worker vừa khởi động
+_STARTUP_PROBE = """
+import json, time
+started = time.perf_counter()
+import app as package
+imported = time.perf_counter()
+application = package.create_app()
+created = time.perf_counter()
+response = application.test_client().get('/auth/login')
+served = time.perf_counter()
+print(json.dumps({'status': response.status_code, 'import': imported - started,
+                  'create_app': created - imported, 'first_request': served - created}))
+"""
+
+
+def run_startup_bench(runs=5):
+    """
+    Đo thời gian import package, create_app và request đầu tiên (render template)
+    của một process mới, với các chế độ khởi động khác nhau
+    Returns: list dict (trung vị của `runs` lần chạy, đơn vị giây)
+    """
+    import json
+    import subprocess
+    import sys
+    from app import create_app
+    from app.schema import upgrade_schema
+    from app.utils.startup import precompile_templates
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix='classroom-bench-')
+    try:
+        database_url = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        base_env = dict(os.environ, DATABASE_URL=database_url, APP_CONFIG='',
+                        PRINCIPAL_VERSION_DIR=os.path.join(workdir, 'principal-versions'),
+                        FRAGMENT_CACHE_TYPE='memory', METRICS_DIR='')
+        warm_dir = os.path.join(workdir, 'jinja-warm')
+
+        # Schema + template biên dịch sẵn, như sau bước release
+        app = create_app(None, {'SQLALCHEMY_DATABASE_URI': database_url, 'TEMPLATE_BYTECODE_CACHE': True,
+                                'TEMPLATE_CACHE_DIR': warm_dir, 'AUTO_UPGRADE_SCHEMA': False})
+        with app.app_context():
+            upgrade_schema()
+        precompile_templates(app)
+
+        scenarios = [
+            ('create_all, không cache template', {'AUTO_UPGRADE_SCHEMA': '1', 'TEMPLATE_BYTECODE_CACHE': '0'}),
+            ('không create_all, không cache template', {'AUTO_UPGRADE_SCHEMA': '0', 'TEMPLATE_BYTECODE_CACHE': '0'}),
+            ('không create_all, template biên dịch sẵn', {'AUTO_UPGRADE_SCHEMA': '0', 'TEMPLATE_BYTECODE_CACHE': '1',
+                                                        'TEMPLATE_CACHE_DIR': warm_dir}),
+        ]
+        results = []
+        for name, overrides in scenarios:
+            samples = []
+            for _ in range(runs):
+                output = subprocess.run([sys.executable, '-c', _STARTUP_PROBE], cwd=project_root,
+                                        env=dict(base_env, **overrides), capture_output=True, text=True, check=True)
+                sample = json.loads(output.stdout.strip().splitlines()[-1])
+                if sample['status'] != 200:
+                    raise RuntimeError(f'/auth/login trả về {sample["status"]}')
+                samples.append(sample)
+            row = {'scenario': name}
+            for key in ('import', 'create_app', 'first_request'):
+                row[key] = _percentile([sample[key] for sample in samples], 50)
+            row['total'] = row['import'] + row['create_app'] + row['first_request']
+            results.append(row)
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@bench_cli.command('startup')
+@click.option('--runs', default=5, show_default=True, help='Số process khởi động cho mỗi chế độ (lấy trung vị)')
+def bench_startup(runs):
+    """Đo thời gian import, create_app và request đầu tiên của một worker mới"""
+    click.echo(f'{"chế độ":<42} {"import ms":>10} {"create_app ms":>14} {"1st req ms":>11} {"tổng ms":>9}')
+    for row in run_startup_bench(runs):
+        click.echo(f'{row["scenario"]:<42} {row["import"] * 1000:>10.1f} {row["create_app"] * 1000:>14.1f} '
+                   f'{row["first_request"] * 1000:>11.1f} {row["total"] * 1000:>9.1f}')
+
+
+PROFILE_MODULES = {'sync': None, 'gthread': None, 'gevent': 'gevent', 'eventlet': 'eventlet'}
+
+
+def run_profile_bench(profile, workers=None, users=16, slow_uploads=4, slow_downloads=4, duration=30.0,
+                      upload_size=256 * 1024, download_size=256 * 1024, slow_download_size=1024 * 1024,
+                      slow_rate=64 * 1024, assignments=1000):
+    """
+    Chạy gunicorn -c gunicorn.conf.py với GUNICORN_PROFILE = profile (ProductionConfig)
+    trên database / thư mục upload tạm rồi chạy kịch bản upload / download nhanh + client chậm
+    Returns: dict kết quả, hoặc None nếu chưa cài gevent / eventlet
+    """
+    import importlib.util
+    from app import create_app
+    from app.loadtest import gunicorn_server, run_profile_scenario, seed_profile_bench
+    from app.schema import upgrade_schema
+
+    module = PROFILE_MODULES[profile]
+    if module and importlib.util.find_spec(module) is None:
+        return None
+
+    password = 'bench'
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix='classroom-bench-')
+    try:
+        overrides = _bench_overrides(os.path.join(workdir, 'bench.db'), os.path.join(workdir, 'uploads'))
+        overrides['PRINCIPAL_VERSION_DIR'] = os.path.join(workdir, 'principal-versions')
+        app = create_app(None, overrides)
+        with app.app_context():
+            upgrade_schema()
+            targets = seed_profile_bench(users + slow_uploads + slow_downloads, assignments,
+                                         download_size, slow_download_size, password)
+
+        env = {
+            'APP_CONFIG': 'production',
+            'GUNICORN_PROFILE': profile,
+            'DATABASE_URL': overrides['SQLALCHEMY_DATABASE_URI'],
+            'UPLOAD_FOLDER': overrides['UPLOAD_FOLDER'],
+            'PRINCIPAL_VERSION_DIR': overrides['PRINCIPAL_VERSION_DIR'],
+            'FRAGMENT_CACHE_DIR': os.path.join(workdir, 'fragments'),
+            'TEMPLATE_CACHE_DIR': os.path.join(workdir, 'jinja-cache'),
+            'METRICS_DIR': '',
+            'SESSION_COOKIE_SECURE': '0',
+        }
+        config_path = os.path.join(project_root, 'gunicorn.conf.py')
+        with gunicorn_server(project_root, workers=workers, extra_args=('-c', config_path), env=env) as base_url:
+            fast, slow, elapsed = run_profile_scenario(
+                base_url, targets, password, users=users, slow_uploads=slow_uploads,
+                slow_downloads=slow_downloads, duration=duration, upload_size=upload_size, slow_rate=slow_rate
+            )
+        return {'profile': profile, 'fast': fast, 'slow': slow, 'seconds': elapsed}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@bench_cli.command('profiles')
+@click.option('--profile', 'profiles', multiple=True, type=click.Choice(list(PROFILE_MODULES)),
+              default=list(PROFILE_MODULES), show_default=True, help='Profile worker trong gunicorn.conf.py')
+@click.option('--workers', default=None, type=int, help='Số worker cho mọi profile (mặc định theo số core)')
+@click.option('--users', default=16, show_default=True, help='Số client upload + download nhanh')
+@click.option('--slow-uploads', default=4, show_default=True, help='Số client upload chậm')
+@click.option('--slow-downloads', default=4, show_default=True, help='Số client download chậm')
+@click.option('--duration', default=30.0, show_default=True, help='Thời gian chạy mỗi profile (giây)')
+@click.option('--upload-size', default=256 * 1024, show_default=True, help='Kích thước file nộp (byte)')
+@click.option('--download-size', default=256 * 1024, show_default=True, help='Kích thước file handout (byte)')
+@click.option('--slow-download-size', default=1024 * 1024, show_default=True,
+              help='Kích thước file client chậm tải về (byte, nên lớn hơn buffer socket)')
+@click.option('--slow-rate', default=64 * 1024, show_default=True, help='Tốc độ client chậm (byte/s)')
+def bench_profiles(profiles, workers, users, slow_uploads, slow_downloads, duration, upload_size, download_size,
+                   slow_download_size, slow_rate):
+    """So sánh các profile gunicorn (sync, gthread, gevent, eventlet) trên route upload / download"""
+    click.echo(f'{"profile":<10} {"route":<14} {"count":>7} {"errors":>7} {"req/s":>8} '
+               f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    for profile in profiles:
+        result = run_profile_bench(profile, workers=workers, users=users, slow_uploads=slow_uploads,
+                                   slow_downloads=slow_downloads, duration=duration, upload_size=upload_size,
+                                   download_size=download_size, slow_download_size=slow_download_size,
+                                   slow_rate=slow_rate)
+        if result is None:
+            click.echo(f'{profile:<10} bỏ qua: chưa cài {PROFILE_MODULES[profile]} (pip install {PROFILE_MODULES[profile]})')
+            continue
+        for row in result['fast'] + [row for row in result['slow'] if row['route'] != 'TOTAL']:
+            click.echo(f'{profile:<10} {row["route"]:<14} {row["count"]:>7} {row["errors"]:>7} {row["rps"]:>8.1f} '
+                       f'{row["p50_ms"]:>9.1f} {row["p95_ms"]:>9.1f} {row["p99_ms"]:>9.1f}')
@@ -0,0 +1,228 @@
+import click
+from flask.cli import AppGroup, with_appcontext
+
+
+db_cli = AppGroup('db', help='Quản lý schema database')
+
+
+@db_cli.command('upgrade')
+def upgrade_db():
+    """Tạo bảng, cột và index còn thiếu (an toàn trên database đang chạy)"""
+    from app.schema import upgrade_schema
+    
+    changes = upgrade_schema()
+    for change in changes:
+        click.echo(f'  + {change}')
+    click.echo(f'✓ Schema đã cập nhật ({len(changes)} thay đổi)')
+
+
+@db_cli.command('check-plans')
+@click.option('--verbose', '-v', is_flag=True, help='In query plan của mọi câu lệnh')
+def check_plans(verbose):
+    """Kiểm tra EXPLAIN QUERY PLAN của các query service, lỗi nếu có full scan"""
+    from app.utils.query_plans import check_query_plans
+    
+    results = check_query_plans()
+    failures = [result for result in results if result['problems']]
+    for result in results:
+        if verbose or result['problems']:
+            status = 'FAIL' if result['problems'] else 'ok'
+            click.echo(f"[{status}] {result['probe']}")
+            click.echo(f"    {result['statement']}")
+            for line in result['plan']:
+                click.echo(f'      {line}')
+            for problem in result['problems']:
+                click.echo(f'    ! {problem}')
+    
+    if failures:
+        raise click.ClickException(f'{len(failures)}/{len(results)} query bị full scan hoặc sort tạm')
+    click.echo(f'✓ {len(results)} query đều dùng index')
+
+
+templates_cli = AppGroup('templates', help='Template Jinja')
+
+
+@templates_cli.command('compile')
+def compile_templates():
+    """Biên dịch trước mọi template vào bytecode cache (TEMPLATE_BYTECODE_CACHE)"""
+    from flask import current_app
+    from app.utils.startup import precompile_templates
+    
+    if not current_app.config.get('TEMPLATE_BYTECODE_CACHE'):
+        raise click.ClickException('TEMPLATE_BYTECODE_CACHE đang tắt, không có nơi lưu template đã biên dịch')
+    total = precompile_templates(current_app)
+    click.echo(f'✓ Đã biên dịch {total} template')
+
+
+@click.command('seed')
+@click.option('--students', default=20000, show_default=True)
+@click.option('--teachers', default=50, show_default=True)
+@click.option('--assignments', default=2000, show_default=True)
+@click.option('--submissions', default=500000, show_default=True)
+@click.option('--challenges', default=200, show_default=True)
+@click.option('--file-size', default=2048, show_default=True, help='Kích thước (byte) mỗi file sinh ra')
+@click.option('--seed', 'random_seed', default=0, show_default=True, help='Seed cho bộ sinh ngẫu nhiên')
+@with_appcontext
+def seed_data(students, teachers, assignments, submissions, challenges, file_size, random_seed):
+    """Sinh bộ dữ liệu giả lập quy mô production (kèm file thật)"""
+    from app.schema import upgrade_schema
+    from app.seed import SEED_PASSWORD, seed_dataset
+    
+    upgrade_schema()
+    stats, error = seed_dataset(
+        students=students, teachers=teachers, assignments=assignments,
+        submissions=submissions, challenges=challenges, file_size=file_size,
+        seed=random_seed, progress=click.echo
+    )
+    if error:
+        raise click.ClickException(error)
+    click.echo('✓ Đã tạo ' + ', '.join(f'{value} {key}' for key, value in stats.items()))
+    click.echo(f'  Tài khoản: seed_student<i> / seed_teacher<i>, mật khẩu {SEED_PASSWORD}')
+
+
+users_cli = AppGroup('users', help='Quản lý người dùng')
+
+
+@users_cli.command('import')
+@click.argument('csv_file', type=click.File('rb'))
+@click.option('--role', default='student', show_default=True, type=click.Choice(['student', 'teacher']),
+              help='Vai trò cho các dòng không có cột role')
+@click.option('--batch-size', default=500, show_default=True, help='Số user mỗi transaction')
+def import_users(csv_file, role, batch_size):
+    """Tạo user hàng loạt từ file CSV (username,password,fullname,email[,phone][,role])"""
+    from app.services.user_service import UserService
+    
+    rows, error = UserService.read_user_csv(csv_file, role)
+    if error:
+        raise click.ClickException(error)
+    
+    result = UserService.import_users(rows, batch_size=batch_size)
+    for line, message in result['errors']:
+        click.echo(f'  dòng {line}: {message}')
+    click.echo(f"✓ Đã tạo {result['created']}/{len(rows)} người dùng ({len(result['errors'])} dòng lỗi)")
+
+
+@users_cli.command('backfill-keys')
+def backfill_user_keys():
+    """Điền cột tìm kiếm chuẩn hóa cho user tạo trước khi có tìm kiếm"""
+    from app.services.user_service import UserService
+    
+    total = UserService.backfill_search_keys()
+    click.echo(f'✓ Đã cập nhật {total} người dùng')
+
+
+counters_cli = AppGroup('counters', help='Quản lý các bộ đếm denormalized')
+
+
+@counters_cli.command('rebuild')
+def rebuild_counters():
+    """Tính lại toàn bộ bộ đếm từ dữ liệu gốc"""
+    from app.services.counter_service import CounterService
+    
+    total, error = CounterService.rebuild_all()
+    if error:
+        raise click.ClickException(error)
+    click.echo(f'✓ Đã tính lại {total} bộ đếm')
+
+
+@counters_cli.command('leaderboards')
+def rebuild_leaderboards():
+    """Tính lại bảng xếp hạng challenge từ nhật ký trả lời"""
+    from app.services.attempt_service import AttemptService
+    
+    total, error = AttemptService.rebuild_leaderboards()
+    if error:
+        raise click.ClickException(error)
+    click.echo(f'✓ Đã tính lại {total} dòng bảng xếp hạng')
+
+
+blobs_cli = AppGroup('blobs', help='Quản lý kho file content-addressed')
+
+
+@blobs_cli.command('migrate')
+def migrate_blobs():
+    """Chuyển các file upload cũ vào kho content-addressed"""
+    from app.services.blob_service import BlobService
+    
+    stats = BlobService.migrate_existing()
+    click.echo(f"✓ Đã chuyển {stats['migrated']} file "
+               f"(thiếu file: {stats['missing']}, lỗi: {stats['errors']})")
+
+
+@blobs_cli.command('recount')
+def recount_blobs():
+    """Tính lại reference count và dọn blob mồ côi"""
+    from app.services.blob_service import BlobService
+    
+    stats = BlobService.recount()
+    click.echo(f"✓ {stats['blobs']} blob đang được dùng, đã xóa {stats['orphans']} blob mồ côi")
+
+
+uploads_cli = AppGroup('uploads', help='Quản lý các phiên upload chia nhỏ')
+
+
+@uploads_cli.command('purge')
+@click.option('--hours', default=24, show_default=True, help='Xóa phiên upload cũ hơn số giờ này')
+def purge_uploads(hours):
+    """Xóa các phiên upload bị bỏ dở"""
+    from app.services.upload_service import UploadService
+    
+    total = UploadService.purge_stale(hours)
+    click.echo(f'✓ Đã xóa {total} phiên upload')
+
+
+search_cli = AppGroup('search', help='Chỉ mục tìm kiếm toàn văn')
+
+
+@search_cli.command('rebuild')
+def rebuild_search():
+    """Đánh chỉ mục lại toàn bộ bài tập và challenge"""
+    from app.services.search_service import SearchService
+    
+    total, error = SearchService.rebuild()
+    if error:
+        raise click.ClickException(error)
+    click.echo(f'✓ Đã đánh chỉ mục {total} tài liệu')
+
+
+jobs_cli = AppGroup('jobs', help='Hàng đợi công việc nền')
+
+
+@jobs_cli.command('work')
+@click.option('--workers', default=2, show_default=True, help='Số thread xử lý job')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Số giây chờ khi hàng đợi trống')
+@click.option('--burst', is_flag=True, help='Thoát khi hàng đợi trống')
+def work_jobs(workers, poll_interval, burst):
+    """Chạy worker xử lý hàng đợi công việc nền"""
+    from flask import current_app
+    from app.services.job_service import JobService
+    
+    app = current_app._get_current_object()
+    click.echo(f'Job worker đang chạy với {workers} thread...')
+    ok, errors = JobService.work(app, workers=workers, poll_interval=poll_interval, burst=burst)
+    click.echo(f'✓ Hoàn tất {ok} job, {errors} job lỗi')
+
+
+@jobs_cli.command('stats')
+def job_stats():
+    """In độ sâu hàng đợi"""
+    from app.services.job_service import JobService
+    
+    for key, value in JobService.get_stats().items():
+        click.echo(f'{key}: {value}')
+
+
+def register_commands(app):
+    """Đăng ký các lệnh CLI (flask <lệnh>) cho app"""
+    from app.bench import bench_cli
+    
+    app.cli.add_command(db_cli)
+    app.cli.add_command(templates_cli)
+    app.cli.add_command(seed_data)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(blobs_cli)
+    app.cli.add_command(uploads_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(bench_cli)
@@ -17,18 +17,140 @@ class Config:
         'sqlite:///' + os.path.join(basedir, '..', 'instance', 'classroom.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
-    UPLOAD_FOLDER = os.path.join(basedir, 'static', 'uploads')
+    # PRAGMA áp dụng cho mỗi kết nối SQLite mới (rỗng = mặc định của SQLite)
+    SQLITE_PRAGMAS = {}
+    
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(basedir, 'static', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    
+    # Upload chia nhỏ (resumable) cho file lớn: mỗi request chỉ mang 1 chunk
+    # nên vẫn nằm dưới MAX_CONTENT_LENGTH
+    MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE') or 500 * 1024 * 1024)
+    UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+    
+    # Để proxy phía trước gửi file sau khi app đã kiểm tra quyền:
+    # 'x-accel-redirect' (nginx) hoặc 'x-sendfile' (apache/lighttpd), để trống = app tự gửi
+    FILE_OFFLOAD_MODE = os.environ.get('FILE_OFFLOAD_MODE') or None
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX') or '/protected-uploads/'
+    
+    # Hàng đợi công việc nền (bảng jobs), chạy worker bằng: flask --app run jobs work
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_BASE_SECONDS = 10
+    JOB_LOCK_TIMEOUT = 600
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'doc', 'docx', 'zip'}
+    
+    # Lưu file upload theo SHA-256 (khử trùng lặp, đếm reference)
+    # Chuyển file cũ sang kho mới bằng: flask --app run blobs migrate
+    CONTENT_ADDRESSED_STORAGE = os.environ.get('CONTENT_ADDRESSED_STORAGE', '').lower() in ('1', 'true', 'yes')
+    
+    # Số bản ghi mỗi trang cho các trang danh sách (phân trang keyset)
+    ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE') or 20)
+    
+    # Số liệu Prometheus tại /metrics; METRICS_DIR là thư mục dùng chung để
+    # cộng dồn số liệu của mọi gunicorn worker (bỏ trống = chỉ process hiện tại)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    METRICS_DIR = os.environ.get('METRICS_DIR') or None
+    METRICS_FLUSH_INTERVAL = 1.0
+    # Token cho Prometheus (Authorization: Bearer <token>); bỏ trống = chỉ truy cập từ localhost
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+    
+    # Phát hiện N+1 query (lazy-load lặp lại trong một request):
+    # 'log' = ghi warning kèm dòng template / code gây ra, 'raise' = ném lỗi (dùng cho test)
+    NPLUSONE_DETECT = os.environ.get('NPLUSONE_DETECT') or None
+    NPLUSONE_THRESHOLD = 3
+    
+    # Cache current_user (Principal) trong mỗi process; PRINCIPAL_VERSION_DIR chứa
+    # file đánh dấu version của từng user, dùng chung giữa các worker (mặc định trong instance/)
+    PRINCIPAL_CACHE_TTL = 300
+    PRINCIPAL_CACHE_SIZE = 10000
+    PRINCIPAL_VERSION_DIR = os.environ.get('PRINCIPAL_VERSION_DIR') or None
+    
+    # Hash mật khẩu: thuật toán + tham số theo cú pháp Werkzeug (vd: 'scrypt:32768:8:1',
+    # 'pbkdf2:sha256:600000'); hash cũ được nâng cấp khi user đăng nhập thành công
+    # PASSWORD_HASH_WORKERS > 0: chạy KDF trong process pool riêng thay vì trong request worker
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 0)
+    PASSWORD_HASH_TIMEOUT = 30
+    
+    # Số dòng tối đa khi import user qua trang /users/import (hash mật khẩu chạy trong request,
+    # phải xong trước gunicorn timeout); file lớn hơn dùng: flask --app run users import
+    USER_IMPORT_MAX_ROWS = int(os.environ.get('USER_IMPORT_MAX_ROWS') or 200)
+    
+    # Cache nội dung file challenge trong mỗi process (giới hạn theo byte);
+    # file lớn hơn CHALLENGE_MMAP_THRESHOLD được đọc qua mmap
+    CHALLENGE_CACHE_BYTES = int(os.environ.get('CHALLENGE_CACHE_BYTES') or 64 * 1024 * 1024)
+    CHALLENGE_MMAP_THRESHOLD = 1024 * 1024
+    
+    # Kết quả challenge lưu phía server (bảng stored_results), cookie chỉ giữ key
+    RESULT_STORE_TTL = 600
+    RESULT_STORE_MAX_BYTES = 1024 * 1024
+    RESULT_STORE_MAX_PER_USER = 20
+    
+    # Nhật ký trả lời challenge: gom các lần trả lời đồng thời vào một transaction
+    # (group commit) tối đa ATTEMPT_BATCH_SIZE dòng; False = commit ngay trong request
+    ATTEMPT_GROUP_COMMIT = os.environ.get('ATTEMPT_GROUP_COMMIT', '1').lower() in ('1', 'true', 'yes')
+    ATTEMPT_BATCH_SIZE = 200
+    ATTEMPT_BATCH_WAIT_MS = 0
+    ATTEMPT_COMMIT_TIMEOUT = 30
+    
+    # Tìm kiếm toàn văn (SQLite FTS5): số ký tự tối đa của nội dung file challenge được đánh chỉ mục
+    SEARCH_MAX_CONTENT_CHARS = 200000
+    
+    # Cache fragment HTML của trang danh sách bài tập / challenge:
+    # 'memory' = LRU trong từng process, 'filesystem' = thư mục dùng chung giữa các
+    # gunicorn worker (FRAGMENT_CACHE_DIR, mặc định trong instance/), 'null' = tắt
+    FRAGMENT_CACHE_TYPE = os.environ.get('FRAGMENT_CACHE_TYPE') or 'memory'
+    FRAGMENT_CACHE_DIR = os.environ.get('FRAGMENT_CACHE_DIR') or None
+    FRAGMENT_CACHE_SIZE = 1000
+    FRAGMENT_CACHE_TTL = 300
+    
+    # Khởi động: AUTO_UPGRADE_SCHEMA = tạo bảng / index còn thiếu trong create_app
+    # (tắt ở production, dùng flask db upgrade); TEMPLATE_BYTECODE_CACHE = lưu template đã
+    # biên dịch vào TEMPLATE_CACHE_DIR (mặc định instance/jinja-cache, flask templates compile)
+    AUTO_UPGRADE_SCHEMA = os.environ.get('AUTO_UPGRADE_SCHEMA', '1').lower() in ('1', 'true', 'yes')
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE', '0').lower() in ('1', 'true', 'yes')
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR') or None
 
 class DevelopmentConfig(Config):
     DEBUG = True
     TESTING = False
+    NPLUSONE_DETECT = os.environ.get('NPLUSONE_DETECT') or 'log'
 
 class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
-    SESSION_COOKIE_SECURE = True
+    # Tắt (SESSION_COOKIE_SECURE=0) chỉ khi chạy thử qua http, vd: flask bench profiles
+    SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', '1').lower() in ('1', 'true', 'yes')
+    
+    # Các gunicorn worker dùng chung cache fragment trên đĩa
+    FRAGMENT_CACHE_TYPE = os.environ.get('FRAGMENT_CACHE_TYPE') or 'filesystem'
+    
+    # Worker khởi động không tạo schema (chạy flask db upgrade khi deploy) và dùng template đã biên dịch
+    AUTO_UPGRADE_SCHEMA = os.environ.get('AUTO_UPGRADE_SCHEMA', '0').lower() in ('1', 'true', 'yes')
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE', '1').lower() in ('1', 'true', 'yes')
+    
+    # SQLite cho nhiều gunicorn worker ghi đồng thời (giờ cao điểm nộp bài):
+    # - WAL: reader không chặn writer và ngược lại
+    # - synchronous=NORMAL: an toàn với WAL, chỉ fsync khi checkpoint
+    # - busy_timeout: chờ lock thay vì báo ngay "database is locked"
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 30000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # KiB
+        'temp_store': 'MEMORY',
+    }
+    # Mỗi worker process có pool riêng (engine được tạo lại sau fork);
+    # check_same_thread=False để dùng được với worker dạng thread / greenlet
+    # Kích thước pool theo số request đồng thời của một worker: gunicorn.conf.py đặt
+    # DB_POOL_SIZE / DB_MAX_OVERFLOW theo profile (sync, gthread, gevent, eventlet)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 5),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 5),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT') or 30),
+        'connect_args': {'timeout': 30, 'check_same_thread': False},
+    }
 
 config = {
     'development': DevelopmentConfig,
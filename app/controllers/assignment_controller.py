@@ -1,8 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
+import hashlib
+from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, stream_with_context
 from flask_login import login_required, current_user
+from app import db
 from app.services.assignment_service import AssignmentService
+from app.services.counter_service import CounterService
 from app.services.file_service import FileService
+from app.services.upload_service import UploadService
 from app.utils.decorators import teacher_required
+from app.utils.fragment_cache import cached_fragment, make_key
+from werkzeug.utils import secure_filename
 from datetime import datetime
 
 assignment_bp = Blueprint('assignment', __name__, url_prefix='/assignments')
@@ -12,21 +18,34 @@ assignment_bp = Blueprint('assignment', __name__, url_prefix='/assignments')
 @login_required
 def list_assignments():
     """Hiển thị danh sách tất cả bài tập"""
-    assignments = AssignmentService.get_all_assignments()
+    after = request.args.get('after')
+    before = request.args.get('before')
+    student_id = current_user.id if current_user.is_student() else None
     
-    # Kiểm tra sinh viên đã nộp bài nào chưa
-    submissions_status = {}
-    if current_user.is_student():
-        for assignment in assignments:
-            submission = AssignmentService.get_submission_by_student_and_assignment(
-                current_user.id, 
-                assignment.id
-            )
-            submissions_status[assignment.id] = submission is not None
+    # Fragment dùng chung cho mọi người cùng role (sinh viên: cùng tập bài đã nộp),
+    # hết hiệu lực khi giáo viên ghi (version 'assignments')
+    submitted_key = '-'
+    if student_id is not None:
+        submitted = sorted(AssignmentService.get_submitted_assignment_ids(student_id))
+        submitted_key = hashlib.sha1(','.join(map(str, submitted)).encode()).hexdigest()
+    key = make_key('assignments', current_user.role, CounterService.get_version('assignments'),
+                   submitted_key, after, before)
     
-    return render_template('assignment/list.html', 
-                         assignments=assignments,
-                         submissions_status=submissions_status)
+    def render():
+        # Lấy bài tập, giáo viên và trạng thái nộp bài trong số query cố định
+        assignments, submitted_ids = AssignmentService.get_assignments_with_status(
+            student_id, after=after, before=before
+        )
+        # Nhãn "Đã quá hạn" phụ thuộc thời gian: fragment hết hạn đúng lúc deadline gần nhất trôi qua
+        now = datetime.utcnow()
+        upcoming = [a.deadline for a in assignments if a.deadline and a.deadline > now]
+        ttl = int((min(upcoming) - now).total_seconds()) + 1 if upcoming else None
+        html = render_template('assignment/_cards.html',
+                               assignments=assignments,
+                               submitted_ids=submitted_ids)
+        return html, ttl
+    
+    return render_template('assignment/list.html', cards=cached_fragment(key, render))
 
 
 @assignment_bp.route('/upload', methods=['GET', 'POST'])
@@ -39,6 +58,7 @@ def upload():
         description = request.form.get('description')
         deadline_str = request.form.get('deadline')
         file = request.files.get('file')
+        upload_id = request.form.get('upload_id')
         
         # Validate
         if not title:
@@ -54,11 +74,21 @@ def upload():
                 flash('Định dạng ngày giờ không hợp lệ', 'danger')
                 return render_template('assignment/upload.html')
         
+        # File lớn được upload trước theo từng chunk, form chỉ gửi upload_id
+        if upload_id:
+            file, error = UploadService.open_completed(upload_id, current_user.id, 'assignment')
+            if error:
+                flash(f'Lỗi upload file: {error}', 'danger')
+                return render_template('assignment/upload.html')
+        
         # Xử lý file upload (optional)
         file_path = None
         filename = None
         if file and file.filename:
             file_path, result = FileService.save_assignment_file(file, current_user.id)
+            if upload_id:
+                file.close()
+                UploadService.discard(upload_id)
             if file_path is None:
                 flash(f'Lỗi upload file: {result}', 'danger')
                 return render_template('assignment/upload.html')
@@ -110,6 +140,14 @@ def submit(assignment_id):
     if request.method == 'POST':
         file = request.files.get('file')
         note = request.form.get('note')
+        upload_id = request.form.get('upload_id')
+        
+        # File lớn được upload trước theo từng chunk, form chỉ gửi upload_id
+        if upload_id:
+            file, error = UploadService.open_completed(upload_id, current_user.id, 'submission', assignment_id)
+            if error:
+                flash(f'Lỗi upload file: {error}', 'danger')
+                return render_template('assignment/submit.html', assignment=assignment)
         
         # Validate file
         if not file or not file.filename:
@@ -122,6 +160,9 @@ def submit(assignment_id):
             current_user.id, 
             assignment_id
         )
+        if upload_id:
+            file.close()
+            UploadService.discard(upload_id)
         if file_path is None:
             flash(f'Lỗi upload file: {result}', 'danger')
             return render_template('assignment/submit.html', assignment=assignment)
@@ -164,7 +205,7 @@ def view_submissions(assignment_id):
         flash('Bạn không có quyền xem bài nộp của assignment này', 'danger')
         return redirect(url_for('assignment.list_assignments'))
     
-    submissions = AssignmentService.get_submissions_by_assignment(assignment_id)
+    submissions = AssignmentService.get_submission_rows(assignment_id)
     stats = AssignmentService.get_submission_stats(assignment_id)
     
     return render_template('assignment/submissions.html', 
@@ -186,13 +227,12 @@ def download_assignment(assignment_id):
         flash('Bài tập này không có file đính kèm', 'warning')
         return redirect(url_for('assignment.list_assignments'))
     
-    # Kiểm tra file có tồn tại không
-    if not FileService.file_exists(assignment.file_path):
+    response = FileService.send_upload(assignment.file_path, assignment.filename)
+    if response is None:
         flash('File không tồn tại', 'danger')
         return redirect(url_for('assignment.list_assignments'))
     
-    file_path = FileService.get_file_path(assignment.file_path)
-    return send_file(file_path, as_attachment=True, download_name=assignment.filename)
+    return response
 
 
 @assignment_bp.route('/download/submission/<int:submission_id>')
@@ -212,13 +252,43 @@ def download_submission(submission_id):
         flash('Bạn không có quyền download bài nộp này', 'danger')
         return redirect(url_for('assignment.list_assignments'))
     
-    # Kiểm tra file có tồn tại không
-    if not FileService.file_exists(submission.file_path):
+    response = FileService.send_upload(submission.file_path, submission.filename)
+    if response is None:
         flash('File không tồn tại', 'danger')
         return redirect(url_for('assignment.view_submissions', assignment_id=submission.assignment_id))
     
-    file_path = FileService.get_file_path(submission.file_path)
-    return send_file(file_path, as_attachment=True, download_name=submission.filename)
+    return response
+
+
+@assignment_bp.route('/<int:assignment_id>/submissions/download')
+@login_required
+@teacher_required
+def download_all_submissions(assignment_id):
+    """Download toàn bộ bài nộp của một assignment dưới dạng ZIP (stream)"""
+    assignment = AssignmentService.get_assignment_by_id(assignment_id)
+    if not assignment:
+        flash('Không tìm thấy bài tập', 'danger')
+        return redirect(url_for('assignment.list_assignments'))
+    
+    # IDOR Fix: Chỉ giáo viên tạo assignment mới được download bài nộp
+    if assignment.teacher_id != current_user.id:
+        flash('Bạn không có quyền download bài nộp của assignment này', 'danger')
+        return redirect(url_for('assignment.list_assignments'))
+    
+    entries = AssignmentService.get_submission_archive_entries(assignment_id)
+    if not entries:
+        flash('Chưa có bài nộp nào để download', 'warning')
+        return redirect(url_for('assignment.view_submissions', assignment_id=assignment_id))
+    
+    archive_name = secure_filename(f"{assignment.title}_submissions.zip") or f"assignment_{assignment_id}_submissions.zip"
+    # stream_with_context giữ app context tới khi gửi xong: trả kết nối DB về pool ngay,
+    # client tải chậm không chiếm kết nối của worker (gthread / gevent)
+    db.session.close()
+    return Response(
+        stream_with_context(FileService.stream_zip(entries)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{archive_name}"'}
+    )
 
 
 @assignment_bp.route('/<int:assignment_id>/delete', methods=['POST'])
@@ -236,15 +306,7 @@ def delete(assignment_id):
         flash('Bạn không có quyền xóa assignment này', 'danger')
         return redirect(url_for('assignment.list_assignments'))
     
-    # Xóa file nếu có
-    if assignment.has_file():
-        FileService.delete_file(assignment.file_path)
-    
-    # Xóa tất cả file submissions
-    for submission in assignment.submissions:
-        FileService.delete_file(submission.file_path)
-    
-    # Xóa assignment
+    # Xóa assignment (file được dọn nền bởi worker: flask jobs work)
     success, error = AssignmentService.delete_assignment(assignment_id)
     if not success:
         flash(f'Lỗi: {error}', 'danger')
@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from app.models.user import User
+from app.services.counter_service import CounterService
+from app.services.user_service import UserService
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -20,9 +22,9 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        user = User.query.filter_by(username=username).first()
+        user = UserService.authenticate(username, password)
         
-        if user and user.check_password(password):
+        if user:
             login_user(user)
             flash(f'Chào mừng {user.fullname}!', 'success')
             return redirect(url_for('auth.home'))
@@ -62,6 +64,7 @@ def register():
         new_user.set_password(password)
         
         db.session.add(new_user)
+        CounterService.add_user(role)
         db.session.commit()
         
         flash('Đăng ký thành công! Vui lòng đăng nhập.', 'success')
@@ -1,7 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_login import login_required, current_user
+from app.services.attempt_service import AttemptService
 from app.services.challenge_service import ChallengeService
+from app.services.counter_service import CounterService
+from app.services.result_store_service import ResultStoreService
 from app.utils.decorators import teacher_required
+from app.utils.fragment_cache import cached_fragment, make_key
 
 challenge_bp = Blueprint('challenge', __name__, url_prefix='/challenges')
 
@@ -10,14 +14,21 @@ challenge_bp = Blueprint('challenge', __name__, url_prefix='/challenges')
 @login_required
 def list_challenges():
     """Hiển thị danh sách challenges"""
-    if current_user.is_teacher():
-        # Giáo viên thấy tất cả challenges (kể cả đã deactivate)
-        challenges = ChallengeService.get_all_challenges_for_teacher()
-    else:
-        # Sinh viên chỉ thấy challenges đang hoạt động
-        challenges = ChallengeService.get_all_challenges()
-    
-    return render_template('challenge/list.html', challenges=challenges)
+    after = request.args.get('after')
+    before = request.args.get('before')
+    # Fragment dùng chung theo role, hết hiệu lực khi giáo viên ghi (version 'challenges')
+    key = make_key('challenges', current_user.role, CounterService.get_version('challenges'), after, before)
+    
+    def render():
+        if current_user.is_teacher():
+            # Giáo viên thấy tất cả challenges (kể cả đã deactivate)
+            challenges = ChallengeService.get_all_challenges_for_teacher(after=after, before=before)
+        else:
+            # Sinh viên chỉ thấy challenges đang hoạt động
+            challenges = ChallengeService.get_all_challenges(after=after, before=before)
+        return render_template('challenge/_cards.html', challenges=challenges), None
+    
+    return render_template('challenge/list.html', cards=cached_fragment(key, render))
 
 
 @challenge_bp.route('/create', methods=['GET', 'POST'])
@@ -41,7 +52,7 @@ def create():
             return render_template('challenge/create.html')
         
         # Lưu file và lấy tên file (đây sẽ là đáp án)
-        file_path, result = ChallengeService.save_challenge_file(file, current_user.id)
+        file_path, result, encoding = ChallengeService.save_challenge_file(file, current_user.id)
         if file_path is None:
             flash(f'Lỗi upload file: {result}', 'danger')
             return render_template('challenge/create.html')
@@ -55,7 +66,8 @@ def create():
             teacher_id=current_user.id,
             file_path=file_path,
             filename=filename_without_ext,
-            hint=hint
+            hint=hint,
+            encoding=encoding
         )
         
         if error:
@@ -95,20 +107,40 @@ def play(challenge_id):
         
         is_correct = challenge.check_answer(user_answer)
         
-        content = None
-        if is_correct:
-            content, error = ChallengeService.read_challenge_content(challenge)
-            if error:
-                flash(f'Lỗi khi đọc nội dung: {error}', 'danger')
+        # Ghi nhật ký + cập nhật bảng xếp hạng (gom commit với các request đồng thời)
+        _, error = AttemptService.record_attempt(challenge.id, current_user.id, user_answer, is_correct)
+        if error:
+            flash(f'Lỗi: {error}', 'danger')
+            return render_template('challenge/play.html', challenge=challenge)
+        
+        if not is_correct:
+            # Trả lời sai: kết quả nhỏ giữ ngay trong session, request không tốn thêm commit
+            # (cookie đọc được nên không chứa đáp án đúng; trang kết quả cũng không hiện)
+            session['challenge_result'] = {
+                'challenge_id': challenge.id,
+                'challenge_title': challenge.title,
+                'user_answer': user_answer[:200],
+                'is_correct': False
+            }
+            return redirect(url_for('challenge.result'))
         
-        session['challenge_result'] = {
+        content, error = ChallengeService.read_challenge_content(challenge)
+        if error:
+            flash(f'Lỗi khi đọc nội dung: {error}', 'danger')
+        
+        # Kết quả đúng (kèm nội dung file) lưu phía server, cookie chỉ giữ key
+        key, error = ResultStoreService.put(current_user.id, 'challenge_result', {
             'challenge_id': challenge.id,
             'challenge_title': challenge.title,
             'user_answer': user_answer,
             'correct_answer': challenge.get_answer(),
-            'is_correct': is_correct,
+            'is_correct': True,
             'content': content
-        }
+        })
+        if error:
+            flash(f'Lỗi: {error}', 'danger')
+            return render_template('challenge/play.html', challenge=challenge)
+        session['challenge_result'] = key
         
         return redirect(url_for('challenge.result'))
     
@@ -118,7 +150,12 @@ def play(challenge_id):
 @challenge_bp.route('/result')
 @login_required
 def result():
-    result_data = session.pop('challenge_result', None)
+    stored = session.pop('challenge_result', None)
+    if isinstance(stored, dict) and stored.get('is_correct') is False and 'challenge_id' in stored:
+        # Kết quả trả lời sai nằm ngay trong session (không có nội dung file)
+        result_data = dict(stored, content=None)
+    else:
+        result_data = ResultStoreService.pop(stored, current_user.id, 'challenge_result')
     
     if not result_data:
         flash('Không có kết quả để hiển thị', 'warning')
@@ -128,6 +165,27 @@ def result():
     return render_template('challenge/result.html', result=result_data, content=content)
 
 
+@challenge_bp.route('/leaderboard')
+@login_required
+def leaderboard():
+    """Bảng xếp hạng tổng của mọi challenge"""
+    scores = AttemptService.get_overall_leaderboard()
+    return render_template('challenge/leaderboard.html', scores=scores)
+
+
+@challenge_bp.route('/<int:challenge_id>/leaderboard')
+@login_required
+def challenge_leaderboard(challenge_id):
+    """Bảng xếp hạng của một challenge"""
+    challenge = ChallengeService.get_challenge_by_id(challenge_id)
+    if not challenge:
+        flash('Không tìm thấy challenge', 'danger')
+        return redirect(url_for('challenge.list_challenges'))
+    
+    standings = AttemptService.get_challenge_leaderboard(challenge_id)
+    return render_template('challenge/challenge_leaderboard.html', challenge=challenge, standings=standings)
+
+
 @challenge_bp.route('/<int:challenge_id>/deactivate', methods=['POST'])
 @login_required
 @teacher_required
@@ -167,10 +225,7 @@ def delete(challenge_id):
         flash('Bạn không có quyền xóa challenge này', 'danger')
         return redirect(url_for('challenge.list_challenges'))
     
-    # Xóa file
-    ChallengeService.delete_challenge_file(challenge.file_path)
-    
-    # Xóa challenge
+    # Xóa challenge (file được dọn nền bởi worker: flask jobs work)
     success, error = ChallengeService.delete_challenge(challenge_id)
     if not success:
         flash(f'Lỗi: {error}', 'danger')
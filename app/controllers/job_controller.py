@@ -0,0 +1,26 @@
+from flask import Blueprint, render_template, redirect, url_for, flash
+from flask_login import login_required
+from app.services.job_service import JobService
+from app.utils.decorators import teacher_required
+
+job_bp = Blueprint('job', __name__, url_prefix='/jobs')
+
+
+@job_bp.route('/')
+@login_required
+@teacher_required
+def status():
+    """Trạng thái hàng đợi công việc nền (giáo viên)"""
+    stats = JobService.get_stats()
+    failed_jobs = JobService.get_failed_jobs()
+    return render_template('job/status.html', stats=stats, failed_jobs=failed_jobs)
+
+
+@job_bp.route('/retry', methods=['POST'])
+@login_required
+@teacher_required
+def retry():
+    """Chạy lại toàn bộ job bị lỗi"""
+    total = JobService.retry_failed()
+    flash(f'Đã đưa {total} job vào hàng đợi lại', 'success')
+    return redirect(url_for('job.status'))
@@ -0,0 +1,20 @@
+from flask import Blueprint, render_template, request, flash
+from flask_login import login_required, current_user
+from app.services.search_service import SearchService
+
+search_bp = Blueprint('search', __name__, url_prefix='/search')
+
+
+@search_bp.route('/')
+@login_required
+def search():
+    """Tìm kiếm bài tập và challenge"""
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    
+    # Giáo viên tìm được cả nội dung file challenge và challenge đã vô hiệu hóa
+    results, error = SearchService.search(query, include_private=current_user.is_teacher(), page=page)
+    if error:
+        flash(f'Lỗi: {error}', 'danger')
+    
+    return render_template('search/results.html', query=query, results=results)
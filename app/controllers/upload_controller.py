@@ -0,0 +1,110 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required, current_user
+from app.services.assignment_service import AssignmentService
+from app.services.upload_service import UploadService
+
+upload_bp = Blueprint('upload', __name__, url_prefix='/uploads')
+
+
+def _upload_state(upload):
+    return {
+        'upload_id': upload.id,
+        'offset': UploadService.get_offset(upload),
+        'size': upload.total_size,
+        'completed': bool(upload.is_completed),
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']
+    }
+
+
+@upload_bp.route('/', methods=['POST'])
+@login_required
+def init():
+    """Bắt đầu một phiên upload chia nhỏ"""
+    data = request.get_json(silent=True) or {}
+    purpose = data.get('purpose')
+    assignment_id = data.get('assignment_id')
+    
+    if purpose == 'assignment' and not current_user.is_teacher():
+        return jsonify(error='Chỉ giáo viên mới được upload bài tập'), 403
+    
+    if purpose == 'submission':
+        if not current_user.is_student():
+            return jsonify(error='Chỉ sinh viên mới có thể nộp bài'), 403
+        try:
+            assignment_id = int(assignment_id)
+        except (TypeError, ValueError):
+            return jsonify(error='Thiếu assignment_id'), 400
+        if not AssignmentService.get_assignment_by_id(assignment_id):
+            return jsonify(error='Không tìm thấy bài tập'), 404
+        if AssignmentService.get_submission_by_student_and_assignment(current_user.id, assignment_id):
+            return jsonify(error='Bạn đã nộp bài cho assignment này rồi'), 409
+    else:
+        assignment_id = None
+    
+    upload, error = UploadService.init_upload(
+        user_id=current_user.id,
+        filename=data.get('filename'),
+        total_size=data.get('size'),
+        purpose=purpose,
+        assignment_id=assignment_id
+    )
+    if error:
+        return jsonify(error=error), 400
+    
+    return jsonify(_upload_state(upload)), 201
+
+
+@upload_bp.route('/<upload_id>', methods=['GET'])
+@login_required
+def status(upload_id):
+    """Trạng thái upload - client dùng offset để tiếp tục sau khi mất kết nối"""
+    upload = UploadService.get_upload(upload_id, current_user.id)
+    if not upload:
+        return jsonify(error='Không tìm thấy phiên upload'), 404
+    return jsonify(_upload_state(upload))
+
+
+@upload_bp.route('/<upload_id>', methods=['PUT'])
+@login_required
+def put_chunk(upload_id):
+    """Nhận một chunk (body thô) ghi tại ?offset=N"""
+    upload = UploadService.get_upload(upload_id, current_user.id)
+    if not upload:
+        return jsonify(error='Không tìm thấy phiên upload'), 404
+    
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify(error='Thiếu offset'), 400
+    
+    new_offset, error = UploadService.write_chunk(upload, offset, request.stream)
+    if error:
+        return jsonify(error=error, offset=new_offset), 409
+    
+    return jsonify(offset=new_offset, size=upload.total_size)
+
+
+@upload_bp.route('/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize(upload_id):
+    """Hoàn tất upload khi đã nhận đủ dữ liệu"""
+    upload = UploadService.get_upload(upload_id, current_user.id)
+    if not upload:
+        return jsonify(error='Không tìm thấy phiên upload'), 404
+    
+    success, error = UploadService.finalize(upload)
+    if not success:
+        return jsonify(error=error, offset=UploadService.get_offset(upload)), 409
+    
+    return jsonify(_upload_state(upload))
+
+
+@upload_bp.route('/<upload_id>', methods=['DELETE'])
+@login_required
+def cancel(upload_id):
+    """Hủy phiên upload"""
+    upload = UploadService.get_upload(upload_id, current_user.id)
+    if not upload:
+        return jsonify(error='Không tìm thấy phiên upload'), 404
+    
+    UploadService.discard(upload.id)
+    return '', 204
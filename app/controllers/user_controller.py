@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
 from app.services.user_service import UserService
 from app.utils.decorators import teacher_required
@@ -9,8 +9,15 @@ user_bp = Blueprint('user', __name__, url_prefix='/users')
 @user_bp.route('/')
 @login_required
 def list_users():
-    users = UserService.get_all_users()
-    return render_template('user/list.html', users=users)
+    query = request.args.get('q', '').strip()
+    role = request.args.get('role') or None
+    users = UserService.search_users(
+        query=query,
+        role=role,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+    return render_template('user/list.html', users=users, query=query, role=role)
 
 
 @user_bp.route('/<int:user_id>')
@@ -50,6 +57,36 @@ def create():
     return render_template('user/create.html')
 
 
+@user_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+@teacher_required
+def import_users():
+    """Tạo user hàng loạt từ file CSV"""
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('Vui lòng chọn file CSV', 'danger')
+            return render_template('user/import.html')
+        
+        rows, error = UserService.read_user_csv(file.stream, request.form.get('role') or 'student')
+        if error:
+            flash(f'Lỗi: {error}', 'danger')
+            return render_template('user/import.html')
+        
+        max_rows = current_app.config['USER_IMPORT_MAX_ROWS']
+        if len(rows) > max_rows:
+            flash(f'File có {len(rows)} dòng, vượt quá {max_rows} dòng cho mỗi lần import trên web. '
+                  f'Hãy chia nhỏ file hoặc chạy: flask --app run users import <file.csv>', 'danger')
+            return render_template('user/import.html')
+        
+        result = UserService.import_users(rows)
+        flash(f"Đã tạo {result['created']}/{len(rows)} người dùng",
+              'success' if not result['errors'] else 'warning')
+        return render_template('user/import.html', result=result, total=len(rows))
+    
+    return render_template('user/import.html')
+
+
 @user_bp.route('/edit/<int:user_id>', methods=['GET', 'POST'])
 @login_required
 def edit(user_id):
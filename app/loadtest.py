@@ -0,0 +1,418 @@
+import http.cookiejar
+import itertools
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from app.bench import _percentile
+
+
+CSRF_PATTERN = re.compile(r'name="csrf[-_]token"\s+(?:content|value)="([^"]+)"')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Không tự theo redirect để mỗi route được đo riêng"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class LoadClient:
+    """Một người dùng ảo: cookie session riêng, đo thời gian từng request theo tên route"""
+
+    def __init__(self, base_url, stats, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.csrf_token = None
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect
+        )
+
+    def request(self, route, path, data=None, headers=None, read_rate=None):
+        """
+        Gửi request và ghi nhận (route, thời gian, thành công)
+        Status < 400 (kể cả redirect sau khi POST) được tính là thành công
+        read_rate (byte/s): đọc response chậm như client mạng yếu
+        Returns: (status, body)
+        """
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                status = response.status
+                body = _read_slowly(response, read_rate) if read_rate else response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        except (urllib.error.URLError, OSError):
+            status, body = 0, b''
+        self.stats.record(route, time.perf_counter() - started, 0 < status < 400)
+
+        match = CSRF_PATTERN.search(body.decode('utf-8', 'ignore')) if status == 200 else None
+        if match:
+            self.csrf_token = match.group(1)
+        return status, body
+
+    def get(self, route, path, read_rate=None):
+        return self.request(route, path, read_rate=read_rate)
+
+    def post(self, route, path, fields, files=None, send_rate=None):
+        """send_rate (byte/s): gửi body chậm như client upload qua mạng yếu"""
+        fields = dict(fields, csrf_token=self.csrf_token or '')
+        if not files:
+            data = urllib.parse.urlencode(fields).encode()
+            return self.request(route, path, data, {'Content-Type': 'application/x-www-form-urlencoded'})
+
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for name, (filename, content) in files.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                         f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+        parts.append(f'--{boundary}--\r\n'.encode())
+        body = b''.join(parts)
+        headers = {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+        if send_rate:
+            headers['Content-Length'] = str(len(body))
+            body = _send_slowly(body, send_rate)
+        return self.request(route, path, body, headers)
+
+    def login(self, username, password):
+        self.get('login_page', '/auth/login')
+        status, _ = self.post('login', '/auth/login', {'username': username, 'password': password})
+        return status == 302
+
+
+_THROTTLE_CHUNK = 16 * 1024
+
+
+def _send_slowly(body, rate):
+    """Chia body thành chunk, nghỉ giữa các chunk để đạt khoảng `rate` byte/s"""
+    for offset in range(0, len(body), _THROTTLE_CHUNK):
+        yield body[offset:offset + _THROTTLE_CHUNK]
+        time.sleep(_THROTTLE_CHUNK / rate)
+
+
+def _read_slowly(response, rate):
+    """Đọc response theo chunk với tốc độ khoảng `rate` byte/s (bỏ nội dung, trả về b'')"""
+    while True:
+        chunk = response.read(_THROTTLE_CHUNK)
+        if not chunk:
+            return b''
+        time.sleep(len(chunk) / rate)
+
+
+class LoadStats:
+    """Gom latency theo route từ nhiều thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, route, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def report(self, elapsed):
+        """Returns: list dict theo route (count, errors, rps, p50/p95/p99 ms) + dòng tổng"""
+        rows = []
+        everything = []
+        for route in sorted(self.latencies):
+            values = self.latencies[route]
+            everything.extend(values)
+            rows.append(self._row(route, values, self.errors.get(route, 0), elapsed))
+        rows.append(self._row('TOTAL', everything, sum(self.errors.values()), elapsed))
+        return rows
+
+    @staticmethod
+    def _row(route, values, errors, elapsed):
+        return {
+            'route': route,
+            'count': len(values),
+            'errors': errors,
+            'rps': len(values) / elapsed if elapsed else 0.0,
+            'p50_ms': _percentile(values, 50) * 1000,
+            'p95_ms': _percentile(values, 95) * 1000,
+            'p99_ms': _percentile(values, 99) * 1000,
+        }
+
+
+def load_targets(sample_size=500):
+    """
+    Lấy mẫu tài khoản và id từ database (cần app context) cho kịch bản load test
+    Ưu tiên tài khoản do `flask seed` tạo
+    """
+    from app.models.assignment import Assignment
+    from app.models.challenge import Challenge
+    from app.models.submission import Submission
+    from app.models.user import User
+    from app.seed import SEED_PREFIX
+
+    def usernames(role):
+        return [row.username for row in User.query.with_entities(User.username).filter(
+            User.role == role, User.username.startswith(SEED_PREFIX)
+        ).limit(sample_size)]
+
+    assignments = Assignment.query.with_entities(Assignment.id, Assignment.file_path).order_by(
+        Assignment.created_at.desc(), Assignment.id.desc()
+    ).limit(sample_size).all()
+    return {
+        'students': usernames('student'),
+        'teachers': usernames('teacher'),
+        'assignment_ids': [row.id for row in assignments],
+        'handout_ids': [row.id for row in assignments if row.file_path],
+        'submission_ids': [row.id for row in Submission.query.with_entities(Submission.id).order_by(
+            Submission.submitted_at.desc(), Submission.id.desc()
+        ).limit(sample_size)],
+        'challenges': [(row.id, row.filename) for row in Challenge.query.with_entities(
+            Challenge.id, Challenge.filename
+        ).filter_by(is_active=True).limit(sample_size)],
+    }
+
+
+def _student_iteration(client, targets, rng, upload_size):
+    client.get('list_assignments', '/assignments/')
+
+    if targets['assignment_ids']:
+        assignment_id = rng.choice(targets['assignment_ids'])
+        status, _ = client.get('submit_page', f'/assignments/{assignment_id}/submit')
+        # Trang nộp bài redirect nếu sinh viên đã nộp rồi
+        if status == 200:
+            client.post('submit', f'/assignments/{assignment_id}/submit', {'note': 'load test'},
+                        files={'file': ('load_test.txt', os.urandom(upload_size))})
+
+    if targets['handout_ids']:
+        client.get('download_assignment', f"/assignments/download/assignment/{rng.choice(targets['handout_ids'])}")
+
+    if targets['challenges']:
+        challenge_id, answer = rng.choice(targets['challenges'])
+        client.get('challenge_page', f'/challenges/{challenge_id}/play')
+        status, _ = client.post('challenge_play', f'/challenges/{challenge_id}/play',
+                                {'answer': answer if rng.random() < 0.5 else 'sai'})
+        if status == 302:
+            client.get('challenge_result', '/challenges/result')
+
+
+def _teacher_iteration(client, targets, rng, upload_size):
+    client.get('list_assignments', '/assignments/')
+    if targets['assignment_ids']:
+        client.get('view_submissions', f"/assignments/{rng.choice(targets['assignment_ids'])}/submissions")
+    if targets['submission_ids']:
+        client.get('download_submission', f"/assignments/download/submission/{rng.choice(targets['submission_ids'])}")
+
+
+def _virtual_user(base_url, role, username, password, targets, stats, deadline, seed, upload_size, relogin_every):
+    rng = random.Random(seed)
+    iteration = _teacher_iteration if role == 'teacher' else _student_iteration
+    client = None
+    count = 0
+    while time.monotonic() < deadline:
+        # Đăng nhập lại định kỳ để route login cũng có đủ mẫu
+        if client is None or count % relogin_every == 0:
+            client = LoadClient(base_url, stats)
+            if not client.login(username, password):
+                time.sleep(0.1)
+                client = None
+                continue
+        iteration(client, targets, rng, upload_size)
+        count += 1
+
+
+def run_load_test(base_url, targets, password, users=20, duration=30.0, teacher_ratio=0.1,
+                  upload_size=4096, relogin_every=20, seed=0):
+    """
+    Chạy `users` người dùng ảo (mỗi người một thread) gọi các route thật trong `duration` giây
+    Returns: (danh sách dòng báo cáo theo route, số giây thực chạy)
+    """
+    teacher_count = min(len(targets['teachers']), int(round(users * teacher_ratio)))
+    accounts = [('teacher', targets['teachers'][i % len(targets['teachers'])]) for i in range(teacher_count)]
+    accounts += [('student', targets['students'][i % len(targets['students'])])
+                 for i in range(users - teacher_count)]
+
+    stats = LoadStats()
+    started = time.monotonic()
+    deadline = started + duration
+    threads = [
+        threading.Thread(
+            target=_virtual_user,
+            args=(base_url, role, username, password, targets, stats, deadline, seed + i, upload_size, relogin_every),
+            daemon=True,
+        )
+        for i, (role, username) in enumerate(accounts)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return stats.report(elapsed), elapsed
+
+
+def seed_profile_bench(students, assignments, download_size, slow_download_size, password):
+    """
+    Dữ liệu cho `flask bench profiles` trên database trống (cần app context):
+    1 giáo viên, `students` sinh viên, `assignments` bài tập dùng chung 1 file handout nhỏ
+    và 1 bài tập kèm file lớn cho client tải chậm
+    Returns: dict {students, assignment_ids, large_id}
+    """
+    from flask import current_app
+    from app import db
+    from app.models.assignment import Assignment
+    from app.models.user import User
+    from app.services.counter_service import CounterService
+
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'assignments')
+    os.makedirs(folder, exist_ok=True)
+    for name, size in (('bench_small.bin', download_size), ('bench_large.bin', slow_download_size)):
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(os.urandom(size))
+
+    teacher = User('bench_teacher', 'Bench Teacher', 'bench_teacher@example.com', None, 'teacher')
+    teacher.set_password(password)
+    db.session.add(teacher)
+    db.session.flush()
+    users = []
+    for i in range(students):
+        student = User(f'bench_s{i}', f'Bench Student {i}', f'bench_s{i}@example.com', None, 'student')
+        student.password = teacher.password
+        users.append(student)
+    handouts = [Assignment(title=f'Bench {i}', teacher_id=teacher.id,
+                           file_path='assignments/bench_small.bin', filename='bench_small.bin')
+                for i in range(assignments)]
+    large = Assignment(title='Bench large', teacher_id=teacher.id,
+                       file_path='assignments/bench_large.bin', filename='bench_large.bin')
+    db.session.add_all(users + handouts + [large])
+    db.session.commit()
+    CounterService.rebuild_all()
+    return {
+        'students': [user.username for user in users],
+        'assignment_ids': [assignment.id for assignment in handouts],
+        'large_id': large.id,
+    }
+
+
+def _profile_client(base_url, stats, username, password, assignment_id):
+    """
+    Đăng nhập rồi mở trang nộp bài để lấy CSRF token của session mới
+    Các request chuẩn bị này không được tính vào `stats`
+    """
+    client = LoadClient(base_url, LoadStats(), timeout=120)
+    if not client.login(username, password):
+        return None
+    client.get('submit_page', f'/assignments/{assignment_id}/submit')
+    client.stats = stats
+    return client
+
+
+def _fast_user(base_url, username, password, targets, stats, deadline, upload_size, offset):
+    """Upload và download nhanh xen kẽ, mỗi lần nộp vào bài tập kế tiếp"""
+    assignment_ids = targets['assignment_ids']
+    client = _profile_client(base_url, stats, username, password, assignment_ids[offset % len(assignment_ids)])
+    if client is None:
+        return
+    for i in itertools.count():
+        if time.monotonic() >= deadline:
+            return
+        assignment_id = assignment_ids[(offset + i) % len(assignment_ids)]
+        client.post('upload', f'/assignments/{assignment_id}/submit', {'note': 'bench'},
+                    files={'file': ('bench.txt', os.urandom(upload_size))})
+        client.get('download', f'/assignments/download/assignment/{assignment_id}')
+
+
+def _slow_uploader(base_url, username, password, targets, stats, deadline, upload_size, rate):
+    assignment_ids = targets['assignment_ids']
+    client = _profile_client(base_url, stats, username, password, assignment_ids[0])
+    for assignment_id in assignment_ids:
+        if client is None or time.monotonic() >= deadline:
+            return
+        client.post('slow_upload', f'/assignments/{assignment_id}/submit', {'note': 'bench'},
+                    files={'file': ('bench.txt', os.urandom(upload_size))}, send_rate=rate)
+
+
+def _slow_downloader(base_url, username, password, targets, stats, deadline, rate):
+    client = _profile_client(base_url, stats, username, password, targets['assignment_ids'][0])
+    while client is not None and time.monotonic() < deadline:
+        client.get('slow_download', f"/assignments/download/assignment/{targets['large_id']}", read_rate=rate)
+
+
+def run_profile_scenario(base_url, targets, password, users=16, slow_uploads=4, slow_downloads=4,
+                         duration=20.0, upload_size=256 * 1024, slow_rate=64 * 1024):
+    """
+    Kịch bản so sánh worker model: `users` client nhanh upload + download liên tục,
+    trong khi `slow_uploads` / `slow_downloads` client gửi / đọc với tốc độ `slow_rate` byte/s
+    (giữ worker sync suốt thời gian truyền)
+    Client chậm chưa xong khi hết giờ không được tính (server bị dừng ngay sau đó)
+    Returns: (báo cáo client nhanh, báo cáo client chậm, số giây thực chạy)
+    """
+    fast, slow = LoadStats(), LoadStats()
+    started = time.monotonic()
+    deadline = started + duration
+    accounts = iter(targets['students'])
+    plans = [(_fast_user, (fast, deadline, upload_size, i * len(targets['assignment_ids']) // max(users, 1)))
+             for i in range(users)]
+    plans += [(_slow_uploader, (slow, deadline, upload_size, slow_rate)) for _ in range(slow_uploads)]
+    plans += [(_slow_downloader, (slow, deadline, slow_rate)) for _ in range(slow_downloads)]
+    threads = [
+        threading.Thread(target=target, args=(base_url, next(accounts), password, targets, *args), daemon=True)
+        for target, args in plans
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads[:users]:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return fast.report(elapsed), slow.report(elapsed), elapsed
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def gunicorn_server(project_root, workers=4, extra_args=(), startup_timeout=60, env=None):
+    """
+    Chạy `gunicorn run:app` trên cổng ngẫu nhiên (kế thừa biến môi trường hiện tại:
+    DATABASE_URL, APP_CONFIG, ... cộng thêm `env`) và trả về base URL khi server đã sẵn sàng
+    workers=None: để gunicorn.conf.py quyết định số worker
+    """
+    port = _free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}']
+    if workers is not None:
+        command += ['--workers', str(workers)]
+    command += [*extra_args, 'run:app']
+    process = subprocess.Popen(command, cwd=project_root, env=dict(os.environ, **(env or {})))
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        waited = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'gunicorn thoát với mã {process.returncode}')
+            try:
+                urllib.request.urlopen(base_url + '/auth/login', timeout=1).close()
+                break
+            except (urllib.error.URLError, OSError):
+                if time.monotonic() > waited:
+                    raise RuntimeError('gunicorn không sẵn sàng sau thời gian chờ')
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
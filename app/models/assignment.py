@@ -21,6 +21,12 @@ class Assignment(db.Model):
     teacher = db.relationship('User', backref=db.backref('assignments', lazy=True))
     submissions = db.relationship('Submission', backref='assignment', lazy=True, cascade='all, delete-orphan')
     
+    # Index cho danh sách bài tập (sắp xếp theo ngày tạo, phân trang keyset)
+    __table_args__ = (
+        db.Index('ix_assignments_created', 'created_at', 'id'),
+        db.Index('ix_assignments_teacher', 'teacher_id'),
+    )
+    
     def __repr__(self):
         return f'<Assignment {self.title}>'
     
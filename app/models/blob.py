@@ -0,0 +1,18 @@
+from app import db
+from datetime import datetime
+
+
+class Blob(db.Model):
+    """
+    File được lưu theo nội dung (content-addressed) dưới SHA-256
+    ref_count = số dòng Assignment/Submission/Challenge đang trỏ tới blob này
+    """
+    __tablename__ = 'blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Blob {self.sha256[:12]} refs={self.ref_count}>'
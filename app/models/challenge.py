@@ -12,6 +12,7 @@ class Challenge(db.Model):
     file_path = db.Column(db.String(500), nullable=False)  # Đường dẫn file txt (bài thơ, văn)
     filename = db.Column(db.String(200), nullable=False)  # Tên file gốc (KHÔNG lưu extension)
     hint = db.Column(db.Text)  # Gợi ý cho sinh viên
+    encoding = db.Column(db.String(20))  # Encoding của file, nhận diện lúc upload (NULL = dữ liệu cũ)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)  # Challenge có đang hoạt động không
     
@@ -21,6 +22,13 @@ class Challenge(db.Model):
     # Relationship
     teacher = db.relationship('User', backref=db.backref('challenges', lazy=True))
     
+    # Index cho danh sách challenge (lọc is_active, sắp xếp theo ngày tạo)
+    __table_args__ = (
+        db.Index('ix_challenges_active_created', 'is_active', 'created_at', 'id'),
+        db.Index('ix_challenges_created', 'created_at', 'id'),
+        db.Index('ix_challenges_teacher', 'teacher_id'),
+    )
+    
     def __repr__(self):
         return f'<Challenge {self.title}>'
     
@@ -0,0 +1,70 @@
+from app import db
+from datetime import datetime
+
+
+class ChallengeAttempt(db.Model):
+    """Nhật ký mỗi lần sinh viên trả lời challenge"""
+    __tablename__ = 'challenge_attempts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    answer = db.Column(db.String(200), nullable=False)
+    is_correct = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Foreign keys
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_challenge_attempts_challenge_created', 'challenge_id', 'created_at'),
+        db.Index('ix_challenge_attempts_user', 'user_id'),
+    )
+    
+    def __repr__(self):
+        return f'<ChallengeAttempt challenge={self.challenge_id} user={self.user_id} correct={self.is_correct}>'
+
+
+class ChallengeStanding(db.Model):
+    """
+    Bảng xếp hạng của một challenge: mỗi (challenge, user) một dòng,
+    cập nhật tăng dần theo từng lần trả lời
+    """
+    __tablename__ = 'challenge_standings'
+    
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Tổng số lần trả lời
+    solved_at = db.Column(db.DateTime)  # Lần trả lời đúng đầu tiên (NULL = chưa giải được)
+    attempts_to_solve = db.Column(db.Integer)  # Số lần trả lời tới khi đúng lần đầu
+    
+    # Relationship
+    user = db.relationship('User')
+    
+    __table_args__ = (
+        db.Index('ix_challenge_standings_challenge_solved', 'challenge_id', 'solved_at', 'attempts_to_solve'),
+        db.Index('ix_challenge_standings_user', 'user_id'),
+    )
+    
+    def __repr__(self):
+        return f'<ChallengeStanding challenge={self.challenge_id} user={self.user_id}>'
+
+
+class UserScore(db.Model):
+    """Bảng xếp hạng tổng: số challenge đã giải của mỗi user (cập nhật khi giải được lần đầu)"""
+    __tablename__ = 'user_scores'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    solved_count = db.Column(db.Integer, nullable=False, default=0)
+    total_attempts_to_solve = db.Column(db.Integer, nullable=False, default=0)
+    last_solved_at = db.Column(db.DateTime)
+    
+    # Relationship
+    user = db.relationship('User')
+    
+    def __repr__(self):
+        return f'<UserScore user={self.user_id} solved={self.solved_count}>'
+
+
+# Index khớp thứ tự xếp hạng (giải nhiều nhất, ít lần thử nhất, giải sớm nhất)
+db.Index('ix_user_scores_rank', UserScore.solved_count.desc(), UserScore.total_attempts_to_solve,
+         UserScore.last_solved_at)
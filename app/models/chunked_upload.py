@@ -0,0 +1,27 @@
+from app import db
+from datetime import datetime
+
+
+class ChunkedUpload(db.Model):
+    """Phiên upload chia nhỏ (resumable): dữ liệu được ghi dần vào file staging"""
+    __tablename__ = 'chunked_uploads'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    purpose = db.Column(db.String(20), nullable=False)  # 'submission' hoặc 'assignment'
+    filename = db.Column(db.String(200), nullable=False)  # Tên file gốc
+    total_size = db.Column(db.BigInteger, nullable=False)
+    is_completed = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Foreign keys
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignments.id'))
+    
+    __table_args__ = (
+        db.Index('ix_chunked_uploads_user', 'user_id'),
+        db.Index('ix_chunked_uploads_created', 'created_at'),
+        db.Index('ix_chunked_uploads_assignment', 'assignment_id'),
+    )
+    
+    def __repr__(self):
+        return f'<ChunkedUpload {self.id} {self.filename}>'
@@ -0,0 +1,17 @@
+from app import db
+from datetime import datetime
+
+
+class Counter(db.Model):
+    """
+    Bộ đếm được duy trì tăng dần (denormalized)
+    Ví dụ: users.student, assignment.<id>.submissions
+    """
+    __tablename__ = 'counters'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Counter {self.name}={self.value}>'
@@ -0,0 +1,57 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import DDL, event
+
+
+class SearchDocument(db.Model):
+    """
+    Nội dung được đánh chỉ mục tìm kiếm (bài tập, challenge)
+    Là bảng nội dung ngoài (external content) của bảng FTS5 search_index:
+    trigger bên dưới giữ search_index đồng bộ mỗi khi bảng này thay đổi
+    """
+    __tablename__ = 'search_documents'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'assignment' hoặc 'challenge'
+    object_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    hint = db.Column(db.String(500))
+    content = db.Column(db.Text)  # Nội dung file .txt của challenge (chỉ giáo viên tìm được)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'object_id', name='uq_search_documents_kind_object'),
+    )
+    
+    def __repr__(self):
+        return f'<SearchDocument {self.kind}:{self.object_id}>'
+
+
+# Bảng FTS5 + trigger đồng bộ, tạo cùng lúc với search_documents (chỉ SQLite)
+# remove_diacritics 2: tìm "bai tap" khớp "bài tập"
+_SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, description, hint, content,
+        content='search_documents', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_index(rowid, title, description, hint, content)
+        VALUES (new.id, new.title, new.description, new.hint, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_index(search_index, rowid, title, description, hint, content)
+        VALUES ('delete', old.id, old.title, old.description, old.hint, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_index(search_index, rowid, title, description, hint, content)
+        VALUES ('delete', old.id, old.title, old.description, old.hint, old.content);
+        INSERT INTO search_index(rowid, title, description, hint, content)
+        VALUES (new.id, new.title, new.description, new.hint, new.content);
+    END""",
+]
+
+for _statement in _SEARCH_INDEX_DDL:
+    event.listen(SearchDocument.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
@@ -0,0 +1,24 @@
+from app import db
+from datetime import datetime
+
+
+class StoredResult(db.Model):
+    """Dữ liệu tạm của một lần hiển thị kết quả (cookie chỉ giữ id)"""
+    __tablename__ = 'stored_results'
+    
+    id = db.Column(db.String(43), primary_key=True)  # secrets.token_urlsafe(32)
+    kind = db.Column(db.String(30), nullable=False)  # vd: 'challenge_result'
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    # Foreign key tới User (chỉ chủ sở hữu mới đọc được)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_stored_results_expires', 'expires_at'),
+        db.Index('ix_stored_results_user_created', 'user_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f'<StoredResult {self.kind} user={self.user_id}>'
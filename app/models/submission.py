@@ -22,10 +22,14 @@ class Submission(db.Model):
     # Constraint: Mỗi sinh viên chỉ nộp 1 lần cho mỗi assignment
     __table_args__ = (
         db.UniqueConstraint('student_id', 'assignment_id', name='unique_student_assignment'),
+        # Index cho các query nóng (lọc + sắp xếp theo thời gian nộp, phân trang keyset)
+        db.Index('ix_submissions_assignment_submitted', 'assignment_id', 'submitted_at', 'id'),
+        db.Index('ix_submissions_student_submitted', 'student_id', 'submitted_at', 'id'),
+        db.Index('ix_submissions_submitted', 'submitted_at', 'id'),
     )
     
     def __repr__(self):
-        return f'<Submission {self.student.username} - Assignment {self.assignment_id}>'
+        return f'<Submission student={self.student_id} - Assignment {self.assignment_id}>'
     
     def is_late(self):
         """Kiểm tra nộp muộn hay không"""
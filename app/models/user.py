@@ -1,6 +1,8 @@
 from app import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.passwords import hash_password, needs_rehash, verify_password
+from app.utils.text import normalize_key
+from sqlalchemy.orm import validates
 from datetime import datetime
 
 class User(UserMixin, db.Model):
@@ -15,6 +17,25 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(20), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Bản chuẩn hóa (chữ thường, bỏ dấu) để tìm theo tiền tố bằng index
+    # Tự cập nhật khi gán username / fullname / email (xem _sync_search_keys)
+    username_key = db.Column(db.String(80))
+    fullname_key = db.Column(db.String(100))
+    email_key = db.Column(db.String(120))
+    
+    # Index cho danh sách người dùng (lọc theo role, sắp xếp theo ngày tạo)
+    # và tìm kiếm theo tiền tố (có / không lọc role)
+    __table_args__ = (
+        db.Index('ix_users_role_created', 'role', 'created_at', 'id'),
+        db.Index('ix_users_created', 'created_at', 'id'),
+        db.Index('ix_users_username_key', 'username_key'),
+        db.Index('ix_users_fullname_key', 'fullname_key'),
+        db.Index('ix_users_email_key', 'email_key'),
+        db.Index('ix_users_role_username_key', 'role', 'username_key'),
+        db.Index('ix_users_role_fullname_key', 'role', 'fullname_key'),
+        db.Index('ix_users_role_email_key', 'role', 'email_key'),
+    )
+    
     def __init__(self, username, fullname, email, phone, role):
         self.username = username
         self.fullname = fullname
@@ -22,11 +43,20 @@ class User(UserMixin, db.Model):
         self.phone = phone
         self.role = role
     
+    @validates('username', 'fullname', 'email')
+    def _sync_search_keys(self, key, value):
+        setattr(self, f'{key}_key', normalize_key(value))
+        return value
+    
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return verify_password(self.password, password)
+    
+    def password_needs_rehash(self):
+        """Hash đang lưu dùng tham số cũ hơn PASSWORD_HASH_METHOD"""
+        return needs_rehash(self.password)
     
     def is_teacher(self):
         return self.role == 'teacher'
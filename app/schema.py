@@ -0,0 +1,36 @@
+from app import db
+from sqlalchemy import inspect
+
+
+def upgrade_schema():
+    """
+    Đưa database (mới hoặc cũ) về đúng schema của các model
+    - Tạo bảng còn thiếu (db.create_all)
+    - Thêm cột còn thiếu cho phép NULL trên bảng ĐÃ có sẵn (ALTER TABLE ADD COLUMN)
+    - Tạo index còn thiếu trên bảng đã có sẵn (create_all bỏ qua các bảng này)
+    Returns: danh sách thay đổi ('cột bảng.cột' / 'index tên')
+    Phải chạy trong app context, an toàn khi chạy lại nhiều lần
+    """
+    db.create_all()
+    
+    engine = db.engine
+    inspector = inspect(engine)
+    changes = []
+    for table in db.metadata.sorted_tables:
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable or column.server_default is not None:
+                raise RuntimeError(f'Không thể tự thêm cột bắt buộc {table.name}.{column.name}')
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+            changes.append(f'cột {table.name}.{column.name}')
+        
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing_indexes:
+                index.create(bind=engine, checkfirst=True)
+                changes.append(f'index {index.name}')
+    return changes
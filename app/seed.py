@@ -0,0 +1,181 @@
+import io
+import random
+from datetime import datetime, timedelta
+from app import db
+from app.models.submission import Submission
+from app.models.user import User
+from app.services.assignment_service import AssignmentService
+from app.services.challenge_service import ChallengeService
+from app.services.counter_service import CounterService
+from app.services.file_service import FileService
+from werkzeug.datastructures import FileStorage
+
+
+# Mọi tài khoản seed dùng chung tiền tố này để load test tìm lại được
+SEED_PREFIX = 'seed_'
+SEED_PASSWORD = 'password123'
+
+_WORDS = [
+    'trăng', 'sông', 'núi', 'gió', 'mây', 'hoa', 'lá', 'mưa', 'nắng', 'biển',
+    'quê', 'nhà', 'mẹ', 'cha', 'trường', 'bạn', 'sách', 'đêm', 'ngày', 'xuân',
+]
+
+
+def seed_username(role, index):
+    return f'{SEED_PREFIX}{role}{index}'
+
+
+def _text(rng, size):
+    """Sinh đoạn văn bản giả khoảng `size` byte"""
+    lines = []
+    length = 0
+    while length < size:
+        line = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(5, 10)))
+        lines.append(line)
+        length += len(line.encode()) + 1
+    return '\n'.join(lines)
+
+
+def _upload(content, filename):
+    """Bọc nội dung thành FileStorage để đi qua đúng đường lưu file của FileService"""
+    return FileStorage(stream=io.BytesIO(content.encode()), filename=filename)
+
+
+def _seed_users(role, total, password_hash, batch_size, progress):
+    """
+    Tạo user theo lô (add_all + commit mỗi batch_size dòng)
+    Mọi tài khoản dùng chung một hash mật khẩu đã tính sẵn: hash riêng cho
+    20k tài khoản tốn hàng giờ mà không làm dữ liệu thực tế hơn
+    """
+    ids = []
+    for start in range(0, total, batch_size):
+        users = []
+        for i in range(start, min(start + batch_size, total)):
+            username = seed_username(role, i)
+            user = User(username, f'{role.capitalize()} {i}', f'{username}@example.com',
+                        f'09{i:08d}', role)
+            user.password = password_hash
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        ids.extend(user.id for user in users)
+        progress(f'{role}: {len(ids)}/{total}')
+    return ids
+
+
+def _seed_assignments(rng, teacher_ids, total, file_size, progress):
+    """Tạo bài tập qua AssignmentService, 1/4 số bài có file đề"""
+    now = datetime.utcnow()
+    assignments = []
+    for i in range(total):
+        teacher_id = rng.choice(teacher_ids)
+        file_path = filename = None
+        if i % 4 == 0:
+            file_path, filename = FileService.save_assignment_file(
+                _upload(_text(rng, file_size), f'de_bai_{i}.txt'), teacher_id
+            )
+            if file_path is None:
+                raise RuntimeError(filename)
+
+        deadline = now + timedelta(days=rng.randint(-60, 30))
+        assignment, error = AssignmentService.create_assignment(
+            f'Bài tập {i}', _text(rng, 200), teacher_id,
+            file_path=file_path, filename=filename, deadline=deadline
+        )
+        if error:
+            raise RuntimeError(error)
+        assignments.append((assignment.id, deadline))
+        if (i + 1) % 100 == 0 or i + 1 == total:
+            progress(f'assignments: {i + 1}/{total}')
+    return assignments
+
+
+def _seed_submissions(rng, assignments, student_ids, total, file_size, progress):
+    """
+    Chia đều total bài nộp cho các bài tập, mỗi bài tập chọn ngẫu nhiên
+    sinh viên (không trùng); file thật được ghi qua FileService
+    Commit theo từng bài tập; counter được tính lại một lần ở cuối
+    """
+    per_assignment = min(len(student_ids), max(1, total // max(1, len(assignments))))
+    created = 0
+    for assignment_id, deadline in assignments:
+        count = min(per_assignment, total - created)
+        if count <= 0:
+            break
+
+        submissions = []
+        for student_id in rng.sample(student_ids, count):
+            file_path, filename = FileService.save_submission_file(
+                _upload(_text(rng, file_size), f'bai_lam_{student_id}.txt'), student_id, assignment_id
+            )
+            if file_path is None:
+                raise RuntimeError(filename)
+            # ~10% nộp muộn để trang danh sách bài nộp có cả hai trạng thái
+            offset = timedelta(hours=rng.randint(1, 72))
+            submitted_at = deadline + offset if rng.random() < 0.1 else deadline - offset
+            submissions.append(Submission(
+                student_id=student_id, assignment_id=assignment_id,
+                file_path=file_path, filename=filename, submitted_at=submitted_at
+            ))
+        db.session.add_all(submissions)
+        db.session.commit()
+        created += count
+        progress(f'submissions: {created}/{total}')
+    return created
+
+
+def _seed_challenges(rng, teacher_ids, total, file_size, progress):
+    """Tạo challenge qua ChallengeService; đáp án (tên file) là challenge_<i>"""
+    for i in range(total):
+        teacher_id = rng.choice(teacher_ids)
+        file_path, filename, encoding = ChallengeService.save_challenge_file(
+            _upload(_text(rng, file_size), f'challenge_{i}.txt'), teacher_id
+        )
+        if file_path is None:
+            raise RuntimeError(filename)
+        _, error = ChallengeService.create_challenge(
+            f'Challenge {i}', _text(rng, 150), teacher_id, file_path, filename,
+            hint='Đáp án có dạng challenge_<số>', encoding=encoding
+        )
+        if error:
+            raise RuntimeError(error)
+    progress(f'challenges: {total}/{total}')
+
+
+def seed_dataset(students=20000, teachers=50, assignments=2000, submissions=500000, challenges=200,
+                 file_size=2048, batch_size=1000, seed=0, progress=None):
+    """
+    Sinh bộ dữ liệu giả lập quy mô production qua model và service layer
+    Tài khoản: seed_student<i> / seed_teacher<i>, mật khẩu SEED_PASSWORD
+    Returns: (dict số lượng đã tạo, error_message)
+    """
+    progress = progress or (lambda message: None)
+    if User.query.filter_by(username=seed_username('teacher', 0)).first():
+        return None, 'Database đã có dữ liệu seed'
+
+    rng = random.Random(seed)
+    template = User('seed', 'seed', 'seed@example.com', None, 'student')
+    template.set_password(SEED_PASSWORD)
+
+    try:
+        teacher_ids = _seed_users('teacher', teachers, template.password, batch_size, progress)
+        student_ids = _seed_users('student', students, template.password, batch_size, progress)
+        created_assignments = _seed_assignments(rng, teacher_ids, assignments, file_size, progress)
+        created_submissions = _seed_submissions(rng, created_assignments, student_ids, submissions,
+                                                file_size, progress)
+        _seed_challenges(rng, teacher_ids, challenges, file_size, progress)
+    except Exception as e:
+        db.session.rollback()
+        return None, f'Lỗi khi seed dữ liệu: {str(e)}'
+
+    _, error = CounterService.rebuild_all()
+    if error:
+        return None, error
+
+    return {
+        'teachers': len(teacher_ids),
+        'students': len(student_ids),
+        'assignments': len(created_assignments),
+        'submissions': created_submissions,
+        'challenges': challenges,
+    }, None
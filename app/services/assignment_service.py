@@ -1,7 +1,15 @@
+import os
 from app import db
 from app.models.assignment import Assignment
+from app.models.chunked_upload import ChunkedUpload
 from app.models.submission import Submission
 from app.models.user import User
+from app.services.counter_service import CounterService
+from app.services.search_service import SearchService
+from app.services.job_service import JobService
+from app.utils.pagination import paginate_keyset
+from sqlalchemy import and_, case, false
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 
@@ -9,9 +17,39 @@ class AssignmentService:
     """Service layer cho quản lý assignments"""
     
     @staticmethod
-    def get_all_assignments():
-        """Lấy tất cả bài tập, sắp xếp theo ngày tạo mới nhất"""
-        return Assignment.query.order_by(Assignment.created_at.desc()).all()
+    def get_all_assignments(after=None, before=None, per_page=None):
+        """Lấy một trang bài tập, sắp xếp theo ngày tạo mới nhất"""
+        return paginate_keyset(Assignment.query, Assignment.created_at, Assignment.id,
+                               after=after, before=before, per_page=per_page)
+    
+    @staticmethod
+    def get_assignments_with_status(student_id=None, after=None, before=None, per_page=None):
+        """
+        Lấy một trang bài tập kèm giáo viên và tập bài đã nộp của sinh viên
+        Chỉ dùng 2 query bất kể số lượng bài tập (tránh N+1 ở trang danh sách)
+        Returns: (assignments, submitted_ids)
+        """
+        assignments = paginate_keyset(
+            Assignment.query.options(joinedload(Assignment.teacher)),
+            Assignment.created_at, Assignment.id,
+            after=after, before=before, per_page=per_page
+        )
+        
+        submitted_ids = set()
+        if student_id is not None and assignments:
+            rows = db.session.query(Submission.assignment_id).filter(
+                Submission.student_id == student_id,
+                Submission.assignment_id.in_([a.id for a in assignments])
+            ).all()
+            submitted_ids = {row.assignment_id for row in rows}
+        
+        return assignments, submitted_ids
+    
+    @staticmethod
+    def get_submitted_assignment_ids(student_id):
+        """Tập id bài tập sinh viên đã nộp (1 query trên index của submissions)"""
+        rows = db.session.query(Submission.assignment_id).filter(Submission.student_id == student_id)
+        return {row.assignment_id for row in rows}
     
     @staticmethod
     def get_assignment_by_id(assignment_id):
@@ -39,6 +77,9 @@ class AssignmentService:
         
         try:
             db.session.add(assignment)
+            db.session.flush()
+            SearchService.index_assignment(assignment)
+            CounterService.bump_version('assignments')
             db.session.commit()
             return assignment, None
         except Exception as e:
@@ -57,6 +98,8 @@ class AssignmentService:
         assignment.deadline = deadline
         
         try:
+            SearchService.index_assignment(assignment)
+            CounterService.bump_version('assignments')
             db.session.commit()
             return assignment, None
         except Exception as e:
@@ -65,13 +108,33 @@ class AssignmentService:
     
     @staticmethod
     def delete_assignment(assignment_id):
-        """Xóa bài tập"""
+        """
+        Xóa bài tập cùng các bài nộp
+        File bài tập và file bài nộp được xóa nền qua hàng đợi job,
+        job được commit cùng transaction với việc xóa dữ liệu
+        """
         assignment = Assignment.query.get(assignment_id)
         if not assignment:
             return False, "Không tìm thấy bài tập"
         
         try:
+            file_paths = [assignment.file_path]
+            file_paths += [row.file_path for row in db.session.query(Submission.file_path).filter_by(assignment_id=assignment_id)]
+            # Phiên upload chia nhỏ (dở dang hoặc chưa nộp) cho bài tập này
+            file_paths += [
+                os.path.join('staging', f"{row.id}.part")
+                for row in db.session.query(ChunkedUpload.id).filter_by(assignment_id=assignment_id)
+            ]
+            JobService.enqueue_file_deletions(file_paths)
+            
+            # Xóa hàng loạt bằng 1 câu lệnh thay vì load từng bài nộp để cascade
+            Submission.query.filter_by(assignment_id=assignment_id).delete(synchronize_session=False)
+            ChunkedUpload.query.filter_by(assignment_id=assignment_id).delete(synchronize_session=False)
+            db.session.expire(assignment, ['submissions'])
             db.session.delete(assignment)
+            CounterService.remove_assignment(assignment_id)
+            SearchService.remove('assignment', assignment_id)
+            CounterService.bump_version('assignments')
             db.session.commit()
             return True, None
         except Exception as e:
@@ -85,6 +148,53 @@ class AssignmentService:
         """Lấy tất cả bài nộp của một assignment"""
         return Submission.query.filter_by(assignment_id=assignment_id).order_by(Submission.submitted_at.desc()).all()
     
+    @staticmethod
+    def get_submission_rows(assignment_id):
+        """
+        Lấy bảng bài nộp của một assignment cho trang giáo viên trong 1 query
+        Join users để lấy thông tin sinh viên và tính cờ nộp muộn ngay trong SQL
+        Returns: list các row nhẹ (không phải ORM object)
+        """
+        is_late = case(
+            (and_(Assignment.deadline.isnot(None), Submission.submitted_at > Assignment.deadline), True),
+            else_=false()
+        ).label('is_late')
+        
+        return db.session.query(
+            Submission.id,
+            Submission.filename,
+            Submission.note,
+            Submission.submitted_at,
+            User.username,
+            User.fullname,
+            User.email,
+            is_late
+        ).join(
+            User, Submission.student_id == User.id
+        ).join(
+            Assignment, Submission.assignment_id == Assignment.id
+        ).filter(
+            Submission.assignment_id == assignment_id
+        ).order_by(Submission.submitted_at.desc()).all()
+    
+    @staticmethod
+    def get_submission_archive_entries(assignment_id):
+        """
+        Lấy danh sách file để đóng gói ZIP toàn bộ bài nộp của một assignment
+        Returns: list (arcname, relative_path), arcname = username/tên file gốc
+        """
+        rows = db.session.query(
+            User.username,
+            Submission.filename,
+            Submission.file_path
+        ).join(
+            User, Submission.student_id == User.id
+        ).filter(
+            Submission.assignment_id == assignment_id
+        ).order_by(Submission.submitted_at).all()
+        
+        return [(f"{row.username}/{row.filename}", row.file_path) for row in rows]
+    
     @staticmethod
     def get_submission_by_student_and_assignment(student_id, assignment_id):
         """Kiểm tra sinh viên đã nộp bài chưa"""
@@ -115,6 +225,7 @@ class AssignmentService:
         
         try:
             db.session.add(submission)
+            CounterService.add_submission(assignment_id)
             db.session.commit()
             return submission, None
         except Exception as e:
@@ -122,20 +233,23 @@ class AssignmentService:
             return None, f"Lỗi khi nộp bài: {str(e)}"
     
     @staticmethod
-    def get_all_submissions():
-        """Lấy tất cả bài nộp (cho giáo viên)"""
-        return Submission.query.order_by(Submission.submitted_at.desc()).all()
+    def get_all_submissions(after=None, before=None, per_page=None):
+        """Lấy một trang bài nộp (cho giáo viên)"""
+        return paginate_keyset(Submission.query, Submission.submitted_at, Submission.id,
+                               after=after, before=before, per_page=per_page)
     
     @staticmethod
-    def get_submissions_by_student(student_id):
-        """Lấy tất cả bài nộp của một sinh viên"""
-        return Submission.query.filter_by(student_id=student_id).order_by(Submission.submitted_at.desc()).all()
+    def get_submissions_by_student(student_id, after=None, before=None, per_page=None):
+        """Lấy một trang bài nộp của một sinh viên"""
+        return paginate_keyset(Submission.query.filter_by(student_id=student_id),
+                               Submission.submitted_at, Submission.id,
+                               after=after, before=before, per_page=per_page)
     
     @staticmethod
     def get_submission_stats(assignment_id):
-        """Lấy thống kê bài nộp cho một assignment"""
-        total_students = User.query.filter_by(role='student').count()
-        submitted_count = Submission.query.filter_by(assignment_id=assignment_id).count()
+        """Lấy thống kê bài nộp cho một assignment (đọc từ bộ đếm, không COUNT(*))"""
+        total_students = CounterService.get_user_count('student')
+        submitted_count = CounterService.get_submission_count(assignment_id)
         return {
             'total_students': total_students,
             'submitted_count': submitted_count,
@@ -0,0 +1,253 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from app import db
+from app.models.challenge_attempt import ChallengeAttempt, ChallengeStanding, UserScore
+from flask import current_app
+from sqlalchemy import and_, insert, select, update
+from sqlalchemy.orm import joinedload
+from datetime import datetime
+
+
+_writer_lock = threading.Lock()
+
+
+class _AttemptWriter:
+    """
+    Group commit cho nhật ký trả lời: request đưa attempt vào hàng đợi rồi chờ,
+    một thread ghi gom mọi attempt đang chờ vào MỘT transaction
+    Cả lớp cùng nộp đáp án thì chỉ tốn vài lần commit thay vì một lần mỗi request
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self.pid = os.getpid()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='attempt-writer', daemon=True)
+        self.thread.start()
+    
+    def submit(self, attempt):
+        future = Future()
+        self.queue.put((attempt, future))
+        return future
+    
+    def _next_batch(self):
+        batch_size = self.app.config.get('ATTEMPT_BATCH_SIZE', 200)
+        wait = self.app.config.get('ATTEMPT_BATCH_WAIT_MS', 0) / 1000.0
+        items = [self.queue.get()]
+        deadline = time.monotonic() + wait
+        while len(items) < batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                items.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+    
+    def _run(self):
+        while True:
+            items = self._next_batch()
+            with self.app.app_context():
+                try:
+                    self._commit(items)
+                finally:
+                    db.session.remove()
+    
+    @staticmethod
+    def _commit(items):
+        """
+        Commit cả lô trong một transaction; lô lỗi (vd: challenge / user vừa bị xóa)
+        được ghi lại từng attempt để chỉ request gây lỗi nhận exception
+        """
+        try:
+            AttemptService.apply_attempts([attempt for attempt, _ in items])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(items) == 1:
+                items[0][1].set_exception(e)
+                return
+            for item in items:
+                _AttemptWriter._commit([item])
+            return
+        for _, future in items:
+            future.set_result(True)
+
+
+class AttemptService:
+    """Nhật ký trả lời challenge và bảng xếp hạng cập nhật tăng dần"""
+    
+    @staticmethod
+    def _get_writer():
+        app = current_app._get_current_object()
+        writer = app.extensions.get('attempt_writer')
+        # Thread ghi không tồn tại sau fork (gunicorn) nên tạo lại theo pid
+        if writer is None or writer.pid != os.getpid():
+            with _writer_lock:
+                writer = app.extensions.get('attempt_writer')
+                if writer is None or writer.pid != os.getpid():
+                    writer = app.extensions['attempt_writer'] = _AttemptWriter(app)
+        return writer
+    
+    @staticmethod
+    def record_attempt(challenge_id, user_id, answer, is_correct):
+        """
+        Ghi một lần trả lời và cập nhật bảng xếp hạng
+        Mặc định đi qua group commit (ATTEMPT_GROUP_COMMIT), trả về sau khi đã commit
+        Returns: (True, None) hoặc (False, error_message)
+        """
+        attempt = {
+            'challenge_id': challenge_id,
+            'user_id': user_id,
+            'answer': (answer or '')[:200],
+            'is_correct': bool(is_correct),
+            'created_at': datetime.utcnow(),
+        }
+        
+        try:
+            if current_app.config.get('ATTEMPT_GROUP_COMMIT', True):
+                AttemptService._get_writer().submit(attempt).result(
+                    timeout=current_app.config.get('ATTEMPT_COMMIT_TIMEOUT', 30)
+                )
+            else:
+                AttemptService.apply_attempts([attempt])
+                db.session.commit()
+            return True, None
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Lỗi khi ghi lần trả lời: {str(e)}"
+    
+    @staticmethod
+    def apply_attempts(attempts):
+        """
+        Ghi danh sách attempt vào session hiện tại (KHÔNG commit)
+        Mọi câu lệnh đều là lệnh ghi có điều kiện nên đúng cả khi nhiều process
+        cùng ghi: lần giải đầu tiên được xác định bằng UPDATE ... WHERE solved_at IS NULL
+        """
+        if not attempts:
+            return
+        db.session.execute(insert(ChallengeAttempt), attempts)
+        
+        for attempt in attempts:
+            challenge_id, user_id = attempt['challenge_id'], attempt['user_id']
+            standing = and_(ChallengeStanding.challenge_id == challenge_id, ChallengeStanding.user_id == user_id)
+            
+            db.session.execute(insert(ChallengeStanding).prefix_with('OR IGNORE').values(
+                challenge_id=challenge_id, user_id=user_id, attempts=0
+            ))
+            db.session.execute(update(ChallengeStanding).where(standing).values(
+                attempts=ChallengeStanding.attempts + 1
+            ))
+            if not attempt['is_correct']:
+                continue
+            
+            first_solve = db.session.execute(update(ChallengeStanding).where(
+                standing, ChallengeStanding.solved_at.is_(None)
+            ).values(
+                solved_at=attempt['created_at'],
+                attempts_to_solve=ChallengeStanding.attempts
+            ))
+            if first_solve.rowcount != 1:
+                continue
+            
+            db.session.execute(insert(UserScore).prefix_with('OR IGNORE').values(
+                user_id=user_id, solved_count=0, total_attempts_to_solve=0
+            ))
+            attempts_to_solve = select(ChallengeStanding.attempts_to_solve).where(standing).scalar_subquery()
+            db.session.execute(update(UserScore).where(UserScore.user_id == user_id).values(
+                solved_count=UserScore.solved_count + 1,
+                total_attempts_to_solve=UserScore.total_attempts_to_solve + attempts_to_solve,
+                last_solved_at=attempt['created_at']
+            ))
+    
+    @staticmethod
+    def get_challenge_leaderboard(challenge_id, limit=50):
+        """Người giải được challenge, xếp theo thời điểm giải đầu tiên"""
+        return ChallengeStanding.query.options(joinedload(ChallengeStanding.user)).filter(
+            ChallengeStanding.challenge_id == challenge_id,
+            ChallengeStanding.solved_at.isnot(None)
+        ).order_by(ChallengeStanding.solved_at, ChallengeStanding.attempts_to_solve).limit(limit).all()
+    
+    @staticmethod
+    def get_overall_leaderboard(limit=50):
+        """Xếp hạng tổng: giải nhiều challenge nhất, ít lần thử nhất, giải sớm nhất"""
+        return UserScore.query.options(joinedload(UserScore.user)).filter(
+            UserScore.solved_count > 0
+        ).order_by(
+            UserScore.solved_count.desc(), UserScore.total_attempts_to_solve, UserScore.last_solved_at
+        ).limit(limit).all()
+    
+    @staticmethod
+    def get_standing(challenge_id, user_id):
+        return ChallengeStanding.query.get((challenge_id, user_id))
+    
+    @staticmethod
+    def remove_challenge(challenge_id):
+        """Xóa nhật ký và bảng xếp hạng của challenge, trừ điểm tổng tương ứng (KHÔNG commit)"""
+        solved = ChallengeStanding.query.filter(
+            ChallengeStanding.challenge_id == challenge_id,
+            ChallengeStanding.solved_at.isnot(None)
+        ).all()
+        for standing in solved:
+            db.session.execute(update(UserScore).where(UserScore.user_id == standing.user_id).values(
+                solved_count=UserScore.solved_count - 1,
+                total_attempts_to_solve=UserScore.total_attempts_to_solve - standing.attempts_to_solve
+            ))
+        ChallengeStanding.query.filter_by(challenge_id=challenge_id).delete(synchronize_session=False)
+        ChallengeAttempt.query.filter_by(challenge_id=challenge_id).delete(synchronize_session=False)
+    
+    @staticmethod
+    def remove_user(user_id):
+        """Xóa nhật ký, bảng xếp hạng và điểm tổng của user (KHÔNG commit)"""
+        UserScore.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        ChallengeStanding.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        ChallengeAttempt.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    
+    @staticmethod
+    def rebuild_leaderboards():
+        """
+        Tính lại toàn bộ bảng xếp hạng từ nhật ký trả lời (dùng khi cần sửa dữ liệu)
+        Returns: (số dòng bảng xếp hạng, error_message)
+        """
+        try:
+            UserScore.query.delete()
+            ChallengeStanding.query.delete()
+            
+            standings = {}
+            rows = db.session.query(
+                ChallengeAttempt.challenge_id, ChallengeAttempt.user_id,
+                ChallengeAttempt.is_correct, ChallengeAttempt.created_at
+            ).order_by(ChallengeAttempt.id).yield_per(1000)
+            for challenge_id, user_id, is_correct, created_at in rows:
+                standing = standings.get((challenge_id, user_id))
+                if standing is None:
+                    standing = standings[(challenge_id, user_id)] = ChallengeStanding(
+                        challenge_id=challenge_id, user_id=user_id, attempts=0
+                    )
+                standing.attempts += 1
+                if is_correct and standing.solved_at is None:
+                    standing.solved_at = created_at
+                    standing.attempts_to_solve = standing.attempts
+            
+            scores = {}
+            for standing in standings.values():
+                if standing.solved_at is None:
+                    continue
+                score = scores.get(standing.user_id)
+                if score is None:
+                    score = scores[standing.user_id] = UserScore(
+                        user_id=standing.user_id, solved_count=0, total_attempts_to_solve=0
+                    )
+                score.solved_count += 1
+                score.total_attempts_to_solve += standing.attempts_to_solve
+                if score.last_solved_at is None or standing.solved_at > score.last_solved_at:
+                    score.last_solved_at = standing.solved_at
+            
+            db.session.add_all(list(standings.values()) + list(scores.values()))
+            db.session.commit()
+            return len(standings), None
+        except Exception as e:
+            db.session.rollback()
+            return 0, f"Lỗi khi tính lại bảng xếp hạng: {str(e)}"
@@ -0,0 +1,250 @@
+import hashlib
+import os
+import tempfile
+import uuid
+from app import db
+from app.models.blob import Blob
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+
+BLOB_FOLDER = 'blobs'
+# Blob hết reference được đổi tên thành <sha256>.deleted-<uuid> trước khi commit
+TOMBSTONE_SUFFIX = '.deleted-'
+
+
+class BlobService:
+    """
+    Service layer cho kho file content-addressed (khử trùng lặp)
+    - File được hash SHA-256 trong lúc ghi, lưu 1 lần dưới blobs/ab/cd/<sha256>
+    - Mỗi dòng DB trỏ tới blob giữ 1 reference; blob chỉ bị xóa khi hết reference
+    Thứ tự thao tác đảm bảo an toàn khi nhiều worker cùng ghi/xóa:
+    ghi nhận reference (commit) TRƯỚC khi đưa file vào chỗ, và chỉ xóa file
+    trong lúc đang giữ write lock của transaction giảm reference về 0
+    """
+    
+    @staticmethod
+    def is_blob_path(relative_path):
+        return bool(relative_path) and relative_path.replace('\\', '/').startswith(BLOB_FOLDER + '/')
+    
+    @staticmethod
+    def relative_path_for(digest):
+        return os.path.join(BLOB_FOLDER, digest[:2], digest[2:4], digest)
+    
+    @staticmethod
+    def _root():
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], BLOB_FOLDER)
+    
+    @staticmethod
+    def _add_reference(digest, size):
+        """Tăng reference (tạo Blob nếu chưa có) và commit"""
+        updated = Blob.query.filter_by(sha256=digest).update(
+            {Blob.ref_count: Blob.ref_count + 1},
+            synchronize_session=False
+        )
+        if not updated:
+            db.session.add(Blob(sha256=digest, size=size, ref_count=1))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Một worker khác vừa tạo cùng blob -> tăng reference của nó
+            db.session.rollback()
+            Blob.query.filter_by(sha256=digest).update(
+                {Blob.ref_count: Blob.ref_count + 1},
+                synchronize_session=False
+            )
+            db.session.commit()
+    
+    @staticmethod
+    def store(stream, chunk_size=64 * 1024):
+        """
+        Lưu nội dung từ stream vào kho, hash trong lúc ghi
+        Returns: (relative_path, error_message)
+        """
+        staging = os.path.join(BlobService._root(), 'tmp')
+        os.makedirs(staging, exist_ok=True)
+        
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=staging)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            
+            sha256 = digest.hexdigest()
+            BlobService._add_reference(sha256, size)
+            
+            relative_path = BlobService.relative_path_for(sha256)
+            final_path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            return relative_path, None
+        except Exception as e:
+            db.session.rollback()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None, f'Lỗi khi lưu file: {str(e)}'
+    
+    @staticmethod
+    def _file_path(digest):
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], BlobService.relative_path_for(digest))
+    
+    @staticmethod
+    def release(relative_path, before_commit=None):
+        """
+        Bỏ 1 reference tới blob; xóa blob (DB + file) khi không còn reference
+        before_commit: hàm chạy trong cùng transaction trước khi commit (vd: xóa job
+        delete_file), để việc giảm reference chỉ được áp dụng đúng 1 lần
+        File chỉ bị xóa hẳn sau khi commit thành công: trong lúc giữ write lock nó được
+        đổi tên thành tombstone (store đồng thời sẽ ghi lại file mới), commit lỗi thì đổi lại
+        Lỗi được ném ra sau khi rollback để job chạy lại với backoff
+        Returns: True nếu file vật lý đã bị xóa
+        """
+        digest = os.path.basename(relative_path)
+        tombstone = None
+        try:
+            Blob.query.filter_by(sha256=digest).update(
+                {Blob.ref_count: Blob.ref_count - 1},
+                synchronize_session=False
+            )
+            remaining = db.session.query(Blob.ref_count).filter_by(sha256=digest).scalar()
+            
+            if remaining is None or remaining <= 0:
+                Blob.query.filter_by(sha256=digest).delete(synchronize_session=False)
+                file_path = BlobService._file_path(digest)
+                if os.path.exists(file_path):
+                    tombstone = f'{file_path}{TOMBSTONE_SUFFIX}{uuid.uuid4().hex}'
+                    os.replace(file_path, tombstone)
+            
+            if before_commit is not None:
+                before_commit()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if tombstone and os.path.exists(tombstone):
+                os.replace(tombstone, BlobService._file_path(digest))
+            current_app.logger.exception(f'Lỗi khi bỏ reference blob {digest}')
+            raise
+        
+        if tombstone is None:
+            return False
+        try:
+            os.remove(tombstone)
+        except OSError as e:
+            # Đã commit: tombstone còn sót được dọn bởi flask blobs recount
+            current_app.logger.warning(f'Không xóa được tombstone {tombstone}: {e}')
+        return True
+    
+    @staticmethod
+    def _tombstones():
+        """Các file tombstone còn sót (worker chết giữa lúc đổi tên và commit / xóa)"""
+        for directory, _, filenames in os.walk(BlobService._root()):
+            for filename in filenames:
+                if TOMBSTONE_SUFFIX in filename:
+                    yield os.path.join(directory, filename), filename.split(TOMBSTONE_SUFFIX)[0]
+    
+    # === MIGRATION / REPAIR ===
+    
+    @staticmethod
+    def _referencing_models():
+        from app.models.assignment import Assignment
+        from app.models.submission import Submission
+        from app.models.challenge import Challenge
+        return [Assignment, Submission, Challenge]
+    
+    @staticmethod
+    def migrate_existing():
+        """
+        Chuyển các file cũ (lưu theo tên có timestamp) vào kho content-addressed
+        Mỗi dòng được cập nhật và commit riêng; file gốc chỉ bị xóa sau khi commit
+        Returns: dict thống kê {migrated, missing, errors}
+        """
+        from app.services.file_service import FileService
+        
+        stats = {'migrated': 0, 'missing': 0, 'errors': 0}
+        for model in BlobService._referencing_models():
+            rows = model.query.filter(
+                model.file_path.isnot(None),
+                model.file_path != '',
+                ~model.file_path.startswith(BLOB_FOLDER + '/')
+            ).all()
+            for row in rows:
+                try:
+                    old_path = FileService.get_file_path(row.file_path)
+                except ValueError:
+                    stats['errors'] += 1
+                    continue
+                if not os.path.exists(old_path):
+                    stats['missing'] += 1
+                    continue
+                
+                with open(old_path, 'rb') as source:
+                    relative_path, error = BlobService.store(source)
+                if error:
+                    print(f"Error migrating {row.file_path}: {error}")
+                    stats['errors'] += 1
+                    continue
+                
+                row.file_path = relative_path
+                db.session.commit()
+                os.remove(old_path)
+                stats['migrated'] += 1
+        return stats
+    
+    @staticmethod
+    def recount():
+        """
+        Tính lại ref_count từ các dòng đang tham chiếu, xóa blob mồ côi
+        Returns: dict thống kê {blobs, orphans}
+        """
+        references = {}
+        for model in BlobService._referencing_models():
+            rows = db.session.query(model.file_path).filter(model.file_path.startswith(BLOB_FOLDER + '/'))
+            for (relative_path,) in rows:
+                digest = os.path.basename(relative_path)
+                references[digest] = references.get(digest, 0) + 1
+        
+        # Tombstone: blob vẫn còn trong bảng -> commit xóa chưa xảy ra, trả file về chỗ cũ
+        live = {sha256 for (sha256,) in db.session.query(Blob.sha256)}
+        for tombstone, digest in list(BlobService._tombstones()):
+            file_path = BlobService._file_path(digest)
+            if digest in live and not os.path.exists(file_path):
+                os.replace(tombstone, file_path)
+            else:
+                os.remove(tombstone)
+        
+        orphans = []
+        existing = set()
+        for blob in Blob.query.all():
+            existing.add(blob.sha256)
+            count = references.get(blob.sha256, 0)
+            if count:
+                blob.ref_count = count
+                continue
+            db.session.delete(blob)
+            orphans.append(blob.sha256)
+        
+        # Blob có reference nhưng thiếu dòng trong bảng blobs
+        for digest, count in references.items():
+            if digest in existing:
+                continue
+            file_path = BlobService._file_path(digest)
+            if os.path.exists(file_path):
+                db.session.add(Blob(sha256=digest, size=os.path.getsize(file_path), ref_count=count))
+        db.session.commit()
+        
+        # Chỉ xóa file blob mồ côi sau khi commit thành công
+        for digest in orphans:
+            file_path = BlobService._file_path(digest)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        return {'blobs': len(references), 'orphans': len(orphans)}
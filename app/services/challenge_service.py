@@ -1,20 +1,37 @@
 from app import db
 from app.models.challenge import Challenge
+from app.services.attempt_service import AttemptService
+from app.services.blob_service import BlobService
+from app.services.counter_service import CounterService
+from app.services.file_service import FileService
+from app.services.job_service import JobService
+from app.services.search_service import SearchService
+from app.utils.content_cache import ContentCache, detect_encoding, read_text
+from app.utils.pagination import paginate_keyset
+from sqlalchemy.orm import joinedload
 from flask import current_app
 import os
 from werkzeug.utils import secure_filename
 from datetime import datetime
 
 
+# Nội dung challenge đã giải mã, dùng chung trong process (xem CHALLENGE_CACHE_BYTES)
+_content_cache = ContentCache()
+
+
 class ChallengeService:
     
     @staticmethod
-    def get_all_challenges():
-        return Challenge.query.filter_by(is_active=True).order_by(Challenge.created_at.desc()).all()
+    def get_all_challenges(after=None, before=None, per_page=None):
+        return paginate_keyset(Challenge.query.options(joinedload(Challenge.teacher)).filter_by(is_active=True),
+                               Challenge.created_at, Challenge.id,
+                               after=after, before=before, per_page=per_page)
     
     @staticmethod
-    def get_all_challenges_for_teacher():
-        return Challenge.query.order_by(Challenge.created_at.desc()).all()
+    def get_all_challenges_for_teacher(after=None, before=None, per_page=None):
+        return paginate_keyset(Challenge.query.options(joinedload(Challenge.teacher)),
+                               Challenge.created_at, Challenge.id,
+                               after=after, before=before, per_page=per_page)
     
     @staticmethod
     def get_challenge_by_id(challenge_id):
@@ -22,11 +39,15 @@ class ChallengeService:
     
     @staticmethod
     def save_challenge_file(file, teacher_id):
+        """
+        Lưu file challenge (.txt)
+        Returns: (file_path, filename, encoding) hoặc (None, error_message, None)
+        """
         if not file or file.filename == '':
-            return None, 'Không có file được chọn'
+            return None, 'Không có file được chọn', None
         
         if not file.filename.lower().endswith('.txt'):
-            return None, 'Chỉ chấp nhận file .txt'
+            return None, 'Chỉ chấp nhận file .txt', None
         
         original_filename = secure_filename(file.filename)
         
@@ -35,19 +56,17 @@ class ChallengeService:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         unique_filename = f"teacher_{teacher_id}_{timestamp}_{original_filename}"
         
-        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'challenges')
-        os.makedirs(upload_folder, exist_ok=True)
+        # Xác định encoding một lần lúc upload, lúc đọc không phải thử lại
+        encoding = detect_encoding(file.stream.read())
+        file.stream.seek(0)
         
-        file_path = os.path.join(upload_folder, unique_filename)
-        try:
-            file.save(file_path)
-            relative_path = os.path.join('challenges', unique_filename)
-            return relative_path, filename_without_ext
-        except Exception as e:
-            return None, f'Lỗi khi lưu file: {str(e)}'
+        relative_path, error = FileService.store_upload(file, 'challenges', unique_filename)
+        if error:
+            return None, error, None
+        return relative_path, filename_without_ext, encoding
     
     @staticmethod
-    def create_challenge(title, description, teacher_id, file_path, filename, hint=None):
+    def create_challenge(title, description, teacher_id, file_path, filename, hint=None, encoding=None):
         if not title:
             return None, "Tiêu đề không được để trống"
         
@@ -60,11 +79,16 @@ class ChallengeService:
             teacher_id=teacher_id,
             file_path=file_path,
             filename=filename,
-            hint=hint
+            hint=hint,
+            encoding=encoding
         )
         
         try:
             db.session.add(challenge)
+            db.session.flush()
+            content, _ = ChallengeService.read_challenge_content(challenge)
+            SearchService.index_challenge(challenge, content or '')
+            CounterService.bump_version('challenges')
             db.session.commit()
             return challenge, None
         except Exception as e:
@@ -82,6 +106,8 @@ class ChallengeService:
         challenge.hint = hint
         
         try:
+            SearchService.index_challenge(challenge)
+            CounterService.bump_version('challenges')
             db.session.commit()
             return challenge, None
         except Exception as e:
@@ -97,6 +123,8 @@ class ChallengeService:
         challenge.is_active = False
         
         try:
+            SearchService.index_challenge(challenge)
+            CounterService.bump_version('challenges')
             db.session.commit()
             return True, None
         except Exception as e:
@@ -110,6 +138,11 @@ class ChallengeService:
             return False, "Không tìm thấy challenge"
         
         try:
+            # File được xóa nền qua hàng đợi job, commit cùng lúc với việc xóa challenge
+            JobService.enqueue_file_deletions([challenge.file_path])
+            AttemptService.remove_challenge(challenge_id)
+            SearchService.remove('challenge', challenge_id)
+            CounterService.bump_version('challenges')
             db.session.delete(challenge)
             db.session.commit()
             return True, None
@@ -130,28 +163,40 @@ class ChallengeService:
     
     @staticmethod
     def read_challenge_content(challenge):
+        """
+        Đọc nội dung challenge, ưu tiên từ cache trong bộ nhớ
+        Cache khóa theo đường dẫn + mtime + size nên file bị thay sẽ được đọc lại
+        Challenge cũ chưa có encoding thì tự nhận diện khi đọc
+        """
         try:
             file_path = ChallengeService.get_file_path(challenge.file_path)
             
-            if not os.path.exists(file_path):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
                 return None, "File không tồn tại"
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            key = (file_path, stat.st_mtime_ns, stat.st_size, challenge.encoding)
+            content = _content_cache.get(key)
+            if content is None:
+                content = read_text(file_path, challenge.encoding,
+                                    current_app.config.get('CHALLENGE_MMAP_THRESHOLD', 1024 * 1024))
+                _content_cache.max_bytes = current_app.config.get('CHALLENGE_CACHE_BYTES', _content_cache.max_bytes)
+                _content_cache.put(key, content)
             
             return content, None
-        except UnicodeDecodeError:
-            try:
-                with open(file_path, 'r', encoding='latin-1') as f:
-                    content = f.read()
-                return content, None
-            except Exception as e:
-                return None, f"Lỗi khi đọc file: {str(e)}"
         except Exception as e:
             return None, f"Lỗi khi đọc file: {str(e)}"
     
     @staticmethod
     def delete_challenge_file(relative_path):
+        if BlobService.is_blob_path(relative_path):
+            try:
+                return BlobService.release(relative_path)
+            except Exception:
+                # Đã log trong release; reference thừa được sửa bởi flask blobs recount
+                return False
+        
         try:
             file_path = ChallengeService.get_file_path(relative_path)
             if os.path.exists(file_path):
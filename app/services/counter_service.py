@@ -0,0 +1,148 @@
+import time
+from app import db
+from app.models.counter import Counter
+from app.models.submission import Submission
+from app.models.user import User
+from sqlalchemy import func
+
+
+class CounterService:
+    """
+    Service layer cho các bộ đếm denormalized
+    Các bộ đếm được cập nhật trong cùng transaction với thao tác ghi,
+    nên trang thống kê chỉ cần đọc 1 dòng thay vì COUNT(*) mỗi lần xem
+    """
+    
+    @staticmethod
+    def user_count_name(role):
+        return f'users.{role}'
+    
+    @staticmethod
+    def submission_count_name(assignment_id):
+        return f'assignment.{assignment_id}.submissions'
+    
+    @staticmethod
+    def _count_users(role):
+        return User.query.filter_by(role=role).count()
+    
+    @staticmethod
+    def _count_submissions(assignment_id):
+        return Submission.query.filter_by(assignment_id=assignment_id).count()
+    
+    @staticmethod
+    def get_value(name, compute):
+        """
+        Đọc giá trị bộ đếm
+        Nếu chưa có (DB cũ, chưa chạy rebuild) thì tính trực tiếp nhưng KHÔNG lưu,
+        việc khởi tạo bộ đếm chỉ diễn ra trong transaction ghi (xem add)
+        """
+        counter = db.session.get(Counter, name)
+        if counter is None:
+            return compute()
+        return counter.value
+    
+    @staticmethod
+    def add(name, delta, compute):
+        """
+        Cộng delta vào bộ đếm trong transaction hiện tại (KHÔNG commit)
+        Người gọi phải commit cùng với thao tác ghi chính
+        Nếu bộ đếm chưa tồn tại, khởi tạo bằng compute() - giá trị này đã bao gồm
+        thay đổi của transaction hiện tại nên không cộng thêm delta
+        """
+        updated = Counter.query.filter_by(name=name).update(
+            {Counter.value: Counter.value + delta},
+            synchronize_session=False
+        )
+        if not updated:
+            db.session.flush()
+            db.session.add(Counter(name=name, value=compute()))
+    
+    @staticmethod
+    def remove(name):
+        """Xóa bộ đếm trong transaction hiện tại (KHÔNG commit)"""
+        Counter.query.filter_by(name=name).delete(synchronize_session=False)
+    
+    # === USER COUNTERS ===
+    
+    @staticmethod
+    def get_user_count(role):
+        return CounterService.get_value(
+            CounterService.user_count_name(role),
+            lambda: CounterService._count_users(role)
+        )
+    
+    @staticmethod
+    def add_user(role, delta=1):
+        CounterService.add(
+            CounterService.user_count_name(role), delta,
+            lambda: CounterService._count_users(role)
+        )
+    
+    # === SUBMISSION COUNTERS ===
+    
+    @staticmethod
+    def get_submission_count(assignment_id):
+        return CounterService.get_value(
+            CounterService.submission_count_name(assignment_id),
+            lambda: CounterService._count_submissions(assignment_id)
+        )
+    
+    @staticmethod
+    def add_submission(assignment_id, delta=1):
+        CounterService.add(
+            CounterService.submission_count_name(assignment_id), delta,
+            lambda: CounterService._count_submissions(assignment_id)
+        )
+    
+    @staticmethod
+    def remove_assignment(assignment_id):
+        CounterService.remove(CounterService.submission_count_name(assignment_id))
+    
+    # === VERSION COUNTERS (vô hiệu hóa cache fragment) ===
+    
+    @staticmethod
+    def version_name(scope):
+        return f'version.{scope}'
+    
+    @staticmethod
+    def get_version(scope):
+        """Version hiện tại của một phạm vi dữ liệu ('assignments', 'student.<id>.submissions'...)"""
+        return CounterService.get_value(CounterService.version_name(scope), lambda: 0)
+    
+    @staticmethod
+    def bump_version(scope):
+        """
+        Tăng version trong transaction hiện tại (KHÔNG commit)
+        Version mới khởi tạo bằng thời điểm hiện tại (ms) thay vì 1 để không trùng
+        với fragment cũ còn trong cache nếu bộ đếm từng bị xóa
+        """
+        CounterService.add(CounterService.version_name(scope), 1, lambda: int(time.time() * 1000))
+    
+    # === REPAIR ===
+    
+    @staticmethod
+    def rebuild_all():
+        """
+        Tính lại toàn bộ bộ đếm từ dữ liệu gốc trong một transaction
+        Returns: (số bộ đếm đã ghi, error_message)
+        """
+        try:
+            # Giữ nguyên các version counter: không tính lại được từ dữ liệu gốc
+            Counter.query.filter(~Counter.name.like('version.%')).delete(synchronize_session=False)
+            
+            counters = []
+            for role, total in db.session.query(User.role, func.count(User.id)).group_by(User.role):
+                counters.append(Counter(name=CounterService.user_count_name(role), value=total))
+            
+            submission_counts = db.session.query(
+                Submission.assignment_id, func.count(Submission.id)
+            ).group_by(Submission.assignment_id)
+            for assignment_id, total in submission_counts:
+                counters.append(Counter(name=CounterService.submission_count_name(assignment_id), value=total))
+            
+            db.session.add_all(counters)
+            db.session.commit()
+            return len(counters), None
+        except Exception as e:
+            db.session.rollback()
+            return 0, f"Lỗi khi tính lại bộ đếm: {str(e)}"
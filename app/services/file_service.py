@@ -1,7 +1,33 @@
 import os
-from werkzeug.utils import secure_filename
-from flask import current_app, send_file
+import zipfile
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
+from flask import current_app, request, send_file
 from datetime import datetime
+from app.services.blob_service import BlobService
+from app.utils.metrics import add_file_bytes
+
+
+class _ZipStreamBuffer:
+    """
+    File-like chỉ-ghi, không seek được, dùng làm đích cho ZipFile
+    ZipFile sẽ ghi data descriptor thay vì seek lại header, nên có thể
+    lấy từng phần dữ liệu ra ngay sau khi ghi (streaming)
+    """
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
 
 
 class FileService:
@@ -30,6 +56,33 @@ class FileService:
         
         return full_path
     
+    @staticmethod
+    def store_upload(file, folder, unique_filename):
+        """
+        Ghi file upload vào thư mục con của UPLOAD_FOLDER
+        Khi bật CONTENT_ADDRESSED_STORAGE, file được lưu vào kho khử trùng lặp
+        và unique_filename bị bỏ qua
+        Returns: (relative_path, error_message)
+        """
+        if current_app.config.get('CONTENT_ADDRESSED_STORAGE'):
+            relative_path, error = BlobService.store(file.stream)
+            if relative_path:
+                add_file_bytes('upload', os.path.getsize(FileService.get_file_path(relative_path)))
+            return relative_path, error
+        
+        # Tạo thư mục nếu chưa có
+        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], folder)
+        os.makedirs(upload_folder, exist_ok=True)
+        
+        file_path = os.path.join(upload_folder, unique_filename)
+        try:
+            file.save(file_path)
+            add_file_bytes('upload', os.path.getsize(file_path))
+            # Trả về đường dẫn tương đối (dùng để lưu vào DB)
+            return os.path.join(folder, unique_filename), None
+        except Exception as e:
+            return None, f'Lỗi khi lưu file: {str(e)}'
+    
     @staticmethod
     def save_assignment_file(file, teacher_id):
         """
@@ -50,19 +103,11 @@ class FileService:
         name, ext = os.path.splitext(filename)
         unique_filename = f"teacher_{teacher_id}_{timestamp}_{name}{ext}"
         
-        # Tạo thư mục nếu chưa có
-        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'assignments')
-        os.makedirs(upload_folder, exist_ok=True)
-        
         # Lưu file
-        file_path = os.path.join(upload_folder, unique_filename)
-        try:
-            file.save(file_path)
-            # Trả về đường dẫn tương đối (dùng để lưu vào DB)
-            relative_path = os.path.join('assignments', unique_filename)
-            return relative_path, filename
-        except Exception as e:
-            return None, f'Lỗi khi lưu file: {str(e)}'
+        relative_path, error = FileService.store_upload(file, 'assignments', unique_filename)
+        if error:
+            return None, error
+        return relative_path, filename
     
     @staticmethod
     def save_submission_file(file, student_id, assignment_id):
@@ -84,19 +129,11 @@ class FileService:
         name, ext = os.path.splitext(filename)
         unique_filename = f"student_{student_id}_assignment_{assignment_id}_{timestamp}_{name}{ext}"
         
-        # Tạo thư mục nếu chưa có
-        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'submissions')
-        os.makedirs(upload_folder, exist_ok=True)
-        
         # Lưu file
-        file_path = os.path.join(upload_folder, unique_filename)
-        try:
-            file.save(file_path)
-            # Trả về đường dẫn tương đối (dùng để lưu vào DB)
-            relative_path = os.path.join('submissions', unique_filename)
-            return relative_path, filename
-        except Exception as e:
-            return None, f'Lỗi khi lưu file: {str(e)}'
+        relative_path, error = FileService.store_upload(file, 'submissions', unique_filename)
+        if error:
+            return None, error
+        return relative_path, filename
     
     @staticmethod
     def get_file_path(relative_path):
@@ -114,7 +151,14 @@ class FileService:
     
     @staticmethod
     def delete_file(relative_path):
-        """Xóa file"""
+        """Xóa file (với blob content-addressed: bỏ 1 reference)"""
+        if BlobService.is_blob_path(relative_path):
+            try:
+                return BlobService.release(relative_path)
+            except Exception:
+                # Đã log trong release; reference thừa được sửa bởi flask blobs recount
+                return False
+        
         try:
             file_path = FileService.get_file_path(relative_path)
             if os.path.exists(file_path):
@@ -130,3 +174,105 @@ class FileService:
         """Kiểm tra file có tồn tại không"""
         file_path = FileService.get_file_path(relative_path)
         return os.path.exists(file_path)
+    
+    @staticmethod
+    def file_etag(relative_path, stat):
+        """
+        ETag mạnh cho file upload
+        Blob content-addressed dùng luôn SHA-256; file thường dùng mtime + size + inode
+        """
+        if BlobService.is_blob_path(relative_path):
+            return os.path.basename(relative_path)
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}-{stat.st_ino:x}"
+    
+    @staticmethod
+    def send_upload(relative_path, download_name):
+        """
+        Trả file upload cho client (gọi SAU khi đã kiểm tra quyền)
+        - Luôn có ETag / Last-Modified, trả 304 khi client đã có bản mới nhất
+        - Chế độ mặc định: Python stream file, hỗ trợ Range (tải tiếp)
+        - FILE_OFFLOAD_MODE = 'x-accel-redirect' | 'x-sendfile': chỉ trả header,
+          proxy phía trước (nginx / apache / lighttpd) đọc và gửi file, kể cả Range
+        Returns: response hoặc None nếu file không tồn tại
+        """
+        file_path = FileService.get_file_path(relative_path)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        
+        etag = FileService.file_etag(relative_path, stat)
+        mode = current_app.config.get('FILE_OFFLOAD_MODE')
+        
+        if mode in ('x-accel-redirect', 'x-sendfile'):
+            response = werkzeug_send_file(
+                file_path,
+                request.environ,
+                as_attachment=True,
+                download_name=download_name,
+                conditional=False,
+                etag=etag,
+                last_modified=stat.st_mtime,
+                use_x_sendfile=True,
+                response_class=current_app.response_class,
+                _root_path=current_app.root_path
+            )
+            # Chỉ xử lý 304/412 ở app, Range để proxy xử lý trên file thật
+            response = response.make_conditional(request.environ)
+            if response.status_code != 200:
+                response.headers.pop('X-Sendfile', None)
+            elif mode == 'x-accel-redirect':
+                response.headers.pop('X-Sendfile', None)
+                prefix = current_app.config['X_ACCEL_REDIRECT_PREFIX'].rstrip('/')
+                response.headers['X-Accel-Redirect'] = f"{prefix}/{relative_path.replace(os.sep, '/')}"
+        else:
+            response = send_file(
+                file_path,
+                as_attachment=True,
+                download_name=download_name,
+                conditional=True,
+                etag=etag,
+                last_modified=stat.st_mtime
+            )
+        
+        # File bài tập/bài nộp cần đăng nhập -> không cho proxy dùng chung cache
+        response.cache_control.private = True
+        if response.status_code in (200, 206):
+            add_file_bytes('download', response.content_length)
+        return response
+    
+    @staticmethod
+    def stream_zip(entries, chunk_size=64 * 1024):
+        """
+        Tạo file ZIP dạng stream từ danh sách (arcname, relative_path)
+        Không tạo file tạm và không giữ cả archive trong bộ nhớ:
+        mỗi lần yield tối đa khoảng chunk_size byte
+        Dùng ZIP_STORED vì file nộp (pdf, docx, zip) thường đã được nén
+        """
+        buffer = _ZipStreamBuffer()
+        with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for arcname, relative_path in entries:
+                try:
+                    file_path = FileService.get_file_path(relative_path)
+                    stat = os.stat(file_path)
+                except (ValueError, OSError) as e:
+                    print(f"Skipping file in archive {relative_path}: {e}")
+                    continue
+                
+                info = zipfile.ZipInfo(arcname, date_time=datetime.fromtimestamp(stat.st_mtime).timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                info.file_size = stat.st_size
+                with open(file_path, 'rb') as source, archive.open(info, mode='w', force_zip64=True) as dest:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        yield FileService._count_download(buffer.drain())
+                yield FileService._count_download(buffer.drain())
+        yield FileService._count_download(buffer.drain())
+    
+    @staticmethod
+    def _count_download(data):
+        add_file_bytes('download', len(data))
+        return data
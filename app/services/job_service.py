@@ -0,0 +1,215 @@
+import json
+import threading
+import time
+import traceback
+from app import db
+from app.models.job import Job
+from app.services.blob_service import BlobService
+from app.services.file_service import FileService
+from flask import current_app
+from sqlalchemy import func
+from datetime import datetime, timedelta
+
+
+def _delete_file(payload, finish):
+    """
+    Handler: xóa file upload (blob: bỏ 1 reference)
+    Với blob, job được xóa (finish) trong cùng transaction giảm reference: worker chết
+    sau commit không làm reference bị giảm lần nữa khi job được đưa lại vào hàng đợi
+    """
+    relative_path = payload['path']
+    if BlobService.is_blob_path(relative_path):
+        BlobService.release(relative_path, before_commit=finish)
+        return
+    
+    FileService.delete_file(relative_path)
+    if FileService.file_exists(relative_path):
+        raise OSError(f"Không xóa được file {relative_path}")
+
+
+class JobService:
+    """
+    Hàng đợi công việc nền lưu trong database (bảng jobs)
+    - enqueue() chỉ thêm vào session: job được commit CÙNG transaction với thay đổi DB,
+      nên không bao giờ mất việc dọn file khi worker chết giữa chừng
+    - Worker (flask jobs work) claim job bằng UPDATE có điều kiện, chạy lại với backoff
+    - Handler nhận (payload, finish): handler tự commit thay đổi DB phải gọi finish()
+      trước commit để job bị xóa cùng transaction (không chạy lại thay đổi đã áp dụng)
+    """
+    
+    HANDLERS = {
+        'delete_file': _delete_file,
+    }
+    
+    @staticmethod
+    def enqueue(kind, payload, max_attempts=None):
+        """Thêm job vào session hiện tại (KHÔNG commit)"""
+        if kind not in JobService.HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(
+            kind=kind,
+            payload=json.dumps(payload),
+            max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS']
+        )
+        db.session.add(job)
+        return job
+    
+    @staticmethod
+    def enqueue_file_deletions(relative_paths):
+        """Thêm job xóa cho từng file (bỏ qua đường dẫn rỗng), KHÔNG commit"""
+        for relative_path in relative_paths:
+            if relative_path:
+                JobService.enqueue('delete_file', {'path': relative_path})
+    
+    @staticmethod
+    def claim_next():
+        """
+        Lấy và khóa job kế tiếp đến hạn chạy
+        Returns: Job hoặc None nếu hàng đợi trống
+        """
+        while True:
+            now = datetime.utcnow()
+            job_id = db.session.query(Job.id).filter(
+                Job.status == 'pending',
+                Job.run_after <= now
+            ).order_by(Job.run_after, Job.id).limit(1).scalar()
+            if job_id is None:
+                db.session.rollback()
+                return None
+            
+            claimed = Job.query.filter(Job.id == job_id, Job.status == 'pending').update(
+                {Job.status: 'running', Job.locked_at: now, Job.attempts: Job.attempts + 1},
+                synchronize_session=False
+            )
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+            # Worker khác đã lấy job này -> thử job tiếp theo
+    
+    @staticmethod
+    def run_job(job):
+        """
+        Chạy một job đã claim
+        Thành công: xóa job; lỗi: hẹn chạy lại (backoff lũy thừa) hoặc đánh dấu failed
+        Returns: True nếu thành công
+        """
+        handler = JobService.HANDLERS.get(job.kind)
+        job_id = job.id
+        
+        def finish():
+            """Xóa job trong transaction hiện tại (handler gọi trước khi commit thay đổi của nó)"""
+            Job.query.filter_by(id=job_id).delete(synchronize_session=False)
+        
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            handler(job.get_payload(), finish)
+            # Xóa job nếu handler chưa xóa trong transaction của nó (no-op nếu đã xóa)
+            finish()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            if job is None:
+                # Lỗi xảy ra sau khi handler đã commit việc xóa job: không còn gì để chạy lại
+                return True
+            job.last_error = f"{e}\n{traceback.format_exc(limit=5)}"
+            job.locked_at = None
+            if job.attempts >= job.max_attempts:
+                job.status = 'failed'
+            else:
+                delay = current_app.config['JOB_RETRY_BASE_SECONDS'] * (2 ** (job.attempts - 1))
+                job.status = 'pending'
+                job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            db.session.commit()
+            return False
+        
+        return True
+    
+    @staticmethod
+    def requeue_stale():
+        """
+        Đưa lại vào hàng đợi các job 'running' quá JOB_LOCK_TIMEOUT
+        (worker bị kill khi đang chạy)
+        Returns: số job được đưa lại
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_LOCK_TIMEOUT'])
+        total = Job.query.filter(Job.status == 'running', Job.locked_at < cutoff).update(
+            {Job.status: 'pending', Job.locked_at: None},
+            synchronize_session=False
+        )
+        db.session.commit()
+        return total
+    
+    @staticmethod
+    def retry_failed():
+        """Đưa toàn bộ job failed về pending (reset số lần thử)"""
+        total = Job.query.filter_by(status='failed').update(
+            {Job.status: 'pending', Job.attempts: 0, Job.run_after: datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.session.commit()
+        return total
+    
+    @staticmethod
+    def get_stats():
+        """Độ sâu hàng đợi theo trạng thái và tuổi của job pending lâu nhất"""
+        counts = dict(db.session.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+        oldest = db.session.query(func.min(Job.created_at)).filter(Job.status == 'pending').scalar()
+        return {
+            'pending': counts.get('pending', 0),
+            'running': counts.get('running', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_pending_seconds': int((datetime.utcnow() - oldest).total_seconds()) if oldest else 0
+        }
+    
+    @staticmethod
+    def get_failed_jobs(limit=50):
+        return Job.query.filter_by(status='failed').order_by(Job.id.desc()).limit(limit).all()
+    
+    @staticmethod
+    def work(app, workers=2, poll_interval=1.0, burst=False, stop_event=None):
+        """
+        Chạy pool gồm `workers` thread xử lý job cho tới khi stop_event được set
+        burst=True: thoát khi hàng đợi trống (dùng cho cron / kiểm thử)
+        Returns: (số job thành công, số job lỗi)
+        """
+        stop_event = stop_event or threading.Event()
+        results = {'ok': 0, 'error': 0}
+        lock = threading.Lock()
+        
+        def loop(index):
+            with app.app_context():
+                last_requeue = time.monotonic()
+                while not stop_event.is_set():
+                    # Thread đầu tiên định kỳ thu hồi job của worker đã chết
+                    if index == 0 and time.monotonic() - last_requeue > poll_interval * 60:
+                        JobService.requeue_stale()
+                        last_requeue = time.monotonic()
+                    
+                    job = JobService.claim_next()
+                    if job is None:
+                        db.session.remove()
+                        if burst:
+                            return
+                        stop_event.wait(poll_interval)
+                        continue
+                    ok = JobService.run_job(job)
+                    with lock:
+                        results['ok' if ok else 'error'] += 1
+        
+        with app.app_context():
+            JobService.requeue_stale()
+        
+        threads = [threading.Thread(target=loop, args=(i,), name=f'job-worker-{i}', daemon=True) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+        return results['ok'], results['error']
@@ -0,0 +1,93 @@
+import json
+import secrets
+from app import db
+from app.models.stored_result import StoredResult
+from flask import current_app
+from datetime import datetime, timedelta
+
+
+class ResultStoreService:
+    """
+    Lưu dữ liệu kết quả phía server, session cookie chỉ mang key ngắn
+    Mỗi bản ghi chỉ đọc được một lần, bởi đúng user đã tạo, trước khi hết hạn
+    """
+    
+    @staticmethod
+    def put(user_id, kind, payload):
+        """
+        Lưu payload (dict JSON được) cho user
+        Returns: (key, error_message)
+        """
+        data = json.dumps(payload, ensure_ascii=False)
+        if len(data.encode()) > current_app.config.get('RESULT_STORE_MAX_BYTES', 1024 * 1024):
+            return None, "Dữ liệu kết quả quá lớn"
+        
+        now = datetime.utcnow()
+        ttl = current_app.config.get('RESULT_STORE_TTL', 600)
+        result = StoredResult(
+            id=secrets.token_urlsafe(32),
+            kind=kind,
+            payload=data,
+            user_id=user_id,
+            created_at=now,
+            expires_at=now + timedelta(seconds=ttl)
+        )
+        
+        try:
+            # Dọn bản ghi hết hạn và giới hạn số bản ghi còn sống của mỗi user
+            StoredResult.query.filter(StoredResult.expires_at < now).delete(synchronize_session=False)
+            keep = current_app.config.get('RESULT_STORE_MAX_PER_USER', 20) - 1
+            stale_ids = [row.id for row in db.session.query(StoredResult.id).filter_by(user_id=user_id)
+                         .order_by(StoredResult.created_at.desc()).offset(keep)]
+            if stale_ids:
+                StoredResult.query.filter(StoredResult.id.in_(stale_ids)).delete(synchronize_session=False)
+            
+            db.session.add(result)
+            db.session.commit()
+            return result.id, None
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Lỗi khi lưu kết quả: {str(e)}"
+    
+    @staticmethod
+    def pop(key, user_id, kind):
+        """
+        Lấy và xóa payload theo key
+        Returns: dict hoặc None (không tồn tại, hết hạn, sai user / loại)
+        """
+        # Cookie cũ (trước khi có result store) chứa cả dict kết quả
+        if not key or not isinstance(key, str):
+            return None
+        
+        result = StoredResult.query.filter_by(id=key, user_id=user_id, kind=kind).first()
+        if not result:
+            return None
+        
+        payload = None
+        if result.expires_at >= datetime.utcnow():
+            payload = json.loads(result.payload)
+        
+        try:
+            db.session.delete(result)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+        return payload
+    
+    @staticmethod
+    def remove_user(user_id):
+        """Xóa mọi bản ghi của user, kể cả chưa hết hạn (KHÔNG commit)"""
+        StoredResult.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    
+    @staticmethod
+    def purge_expired():
+        """Xóa mọi bản ghi hết hạn, trả về số bản ghi đã xóa"""
+        try:
+            total = StoredResult.query.filter(StoredResult.expires_at < datetime.utcnow()).delete(
+                synchronize_session=False
+            )
+            db.session.commit()
+            return total
+        except Exception:
+            db.session.rollback()
+            return 0
@@ -0,0 +1,187 @@
+import re
+from app import db
+from app.models.assignment import Assignment
+from app.models.challenge import Challenge
+from app.models.search_document import SearchDocument
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import text
+
+
+# Ký tự đánh dấu đoạn khớp trong snippet, thay bằng <mark> SAU khi escape HTML
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+_MAX_TOKENS = 10
+
+# Trọng số bm25 theo cột: title, description, hint, content
+_RANK = 'bm25(10.0, 4.0, 2.0, 1.0)'
+
+_SEARCH_SQL = """
+    SELECT d.kind, d.object_id, d.title, d.is_active,
+           snippet(search_index, {snippet_column}, :mark_start, :mark_end, '…', 16) AS snippet
+    FROM search_index
+    JOIN search_documents AS d ON d.id = search_index.rowid
+    WHERE search_index MATCH :query AND search_index.rank MATCH :rank {visibility}
+    ORDER BY search_index.rank
+    LIMIT :limit OFFSET :offset
+"""
+
+
+class SearchHit:
+    """Một kết quả tìm kiếm; snippet đã được escape, đoạn khớp bọc trong <mark>"""
+    
+    def __init__(self, kind, object_id, title, is_active, snippet):
+        self.kind = kind
+        self.object_id = object_id
+        self.title = title
+        self.is_active = bool(is_active)
+        self.snippet = Markup(str(escape(snippet or ''))
+                              .replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+class SearchPage:
+    """Một trang kết quả tìm kiếm (xếp theo độ liên quan nên phân trang theo số trang)"""
+    
+    def __init__(self, items, page, has_next):
+        self.items = items
+        self.page = page
+        self.has_next = has_next
+    
+    @property
+    def has_prev(self):
+        return self.page > 1
+    
+    def __iter__(self):
+        return iter(self.items)
+    
+    def __len__(self):
+        return len(self.items)
+    
+    def __bool__(self):
+        return bool(self.items)
+
+
+class SearchService:
+    """Tìm kiếm toàn văn bài tập / challenge qua bảng FTS5 search_index"""
+    
+    @staticmethod
+    def build_match_query(query, columns=None):
+        """
+        Chuyển chuỗi người dùng nhập thành biểu thức MATCH an toàn:
+        mỗi từ được đặt trong ngoặc kép (không cú pháp FTS5 nào lọt vào),
+        từ cuối khớp theo tiền tố để gõ dở vẫn ra kết quả
+        """
+        tokens = _TOKEN.findall(query or '')[:_MAX_TOKENS]
+        if not tokens:
+            return None
+        terms = [f'"{token}"' for token in tokens]
+        terms[-1] += '*'
+        expression = ' '.join(terms)
+        if columns:
+            expression = '{' + ' '.join(columns) + '} : (' + expression + ')'
+        return expression
+    
+    @staticmethod
+    def search(query, include_private=False, page=1, per_page=None):
+        """
+        Tìm theo độ liên quan (bm25, tiêu đề nặng nhất)
+        - include_private=False (sinh viên): chỉ khớp tiêu đề / mô tả / gợi ý,
+          không tìm trong nội dung file challenge và bỏ challenge đã vô hiệu hóa
+        Returns: (SearchPage, error_message)
+        """
+        per_page = per_page or current_app.config.get('ITEMS_PER_PAGE', 20)
+        page = max(1, page)
+        columns = None if include_private else ('title', 'description', 'hint')
+        match = SearchService.build_match_query(query, columns)
+        if match is None:
+            return SearchPage([], page, False), None
+        
+        sql = _SEARCH_SQL.format(
+            snippet_column=-1 if include_private else 1,
+            visibility='' if include_private else 'AND d.is_active = 1',
+        )
+        try:
+            rows = db.session.execute(text(sql), {
+                'query': match,
+                'rank': _RANK,
+                'mark_start': _MARK_START,
+                'mark_end': _MARK_END,
+                'limit': per_page + 1,
+                'offset': (page - 1) * per_page,
+            }).all()
+        except Exception as e:
+            db.session.rollback()
+            return SearchPage([], page, False), f"Lỗi khi tìm kiếm: {str(e)}"
+        
+        hits = [SearchHit(*row) for row in rows[:per_page]]
+        return SearchPage(hits, page, len(rows) > per_page), None
+    
+    @staticmethod
+    def _upsert(kind, object_id, **fields):
+        document = SearchDocument.query.filter_by(kind=kind, object_id=object_id).first()
+        if document is None:
+            document = SearchDocument(kind=kind, object_id=object_id)
+            db.session.add(document)
+        for name, value in fields.items():
+            setattr(document, name, value)
+        return document
+    
+    @staticmethod
+    def index_assignment(assignment):
+        """Thêm / cập nhật chỉ mục của bài tập (KHÔNG commit, assignment phải có id)"""
+        return SearchService._upsert(
+            'assignment', assignment.id,
+            title=assignment.title, description=assignment.description, hint=None, content=None, is_active=True
+        )
+    
+    @staticmethod
+    def index_challenge(challenge, content=None):
+        """
+        Thêm / cập nhật chỉ mục của challenge (KHÔNG commit, challenge phải có id)
+        content: nội dung file .txt; None = giữ nội dung đã đánh chỉ mục trước đó
+        """
+        fields = dict(title=challenge.title, description=challenge.description,
+                      hint=challenge.hint, is_active=bool(challenge.is_active))
+        if content is not None:
+            fields['content'] = content[:current_app.config.get('SEARCH_MAX_CONTENT_CHARS', 200000)]
+        return SearchService._upsert('challenge', challenge.id, **fields)
+    
+    @staticmethod
+    def remove(kind, object_id):
+        """Xóa chỉ mục của một đối tượng (KHÔNG commit)"""
+        SearchDocument.query.filter_by(kind=kind, object_id=object_id).delete(synchronize_session=False)
+    
+    @staticmethod
+    def rebuild(batch_size=500):
+        """
+        Đánh chỉ mục lại toàn bộ bài tập và challenge (dữ liệu có từ trước khi có tìm kiếm)
+        Returns: (số tài liệu, error_message)
+        """
+        from app.services.challenge_service import ChallengeService
+        
+        try:
+            SearchDocument.query.delete(synchronize_session=False)
+            total = 0
+            for assignment in Assignment.query.order_by(Assignment.id).yield_per(batch_size):
+                db.session.add(SearchDocument(
+                    kind='assignment', object_id=assignment.id, title=assignment.title,
+                    description=assignment.description, is_active=True
+                ))
+                total += 1
+            for challenge in Challenge.query.order_by(Challenge.id).yield_per(batch_size):
+                content, _ = ChallengeService.read_challenge_content(challenge)
+                db.session.add(SearchDocument(
+                    kind='challenge', object_id=challenge.id, title=challenge.title,
+                    description=challenge.description, hint=challenge.hint, is_active=bool(challenge.is_active),
+                    content=(content or '')[:current_app.config.get('SEARCH_MAX_CONTENT_CHARS', 200000)]
+                ))
+                total += 1
+            db.session.commit()
+            # Gộp các segment của FTS5 để query nhanh hơn sau khi nạp hàng loạt
+            db.session.execute(text("INSERT INTO search_index(search_index) VALUES ('optimize')"))
+            db.session.commit()
+            return total, None
+        except Exception as e:
+            db.session.rollback()
+            return 0, f"Lỗi khi đánh chỉ mục lại: {str(e)}"
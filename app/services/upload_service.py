@@ -0,0 +1,194 @@
+import os
+import uuid
+from app import db
+from app.models.chunked_upload import ChunkedUpload
+from app.services.file_service import FileService
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+from datetime import datetime, timedelta
+
+
+class StagedFile(FileStorage):
+    """
+    FileStorage đọc từ file staging của một upload đã hoàn tất
+    save() tới một đường dẫn sẽ rename file thay vì copy lại toàn bộ dữ liệu
+    """
+    
+    def __init__(self, staging_path, filename):
+        self.staging_path = staging_path
+        super().__init__(stream=open(staging_path, 'rb'), filename=filename)
+    
+    def save(self, dst, buffer_size=16384):
+        if isinstance(dst, (str, os.PathLike)):
+            self.stream.close()
+            os.replace(self.staging_path, dst)
+            return
+        super().save(dst, buffer_size)
+
+
+class UploadService:
+    """
+    Service layer cho upload chia nhỏ có thể tiếp tục (resumable)
+    Giao thức: init -> PUT từng chunk kèm offset -> finalize,
+    sau đó form nộp bài / upload bài tập gửi upload_id thay cho file
+    """
+    
+    PURPOSES = ('submission', 'assignment')
+    
+    @staticmethod
+    def _staging_path(upload_id):
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], 'staging', f"{upload_id}.part")
+    
+    @staticmethod
+    def init_upload(user_id, filename, total_size, purpose, assignment_id=None):
+        """
+        Tạo phiên upload mới
+        Returns: (upload, error_message)
+        """
+        if purpose not in UploadService.PURPOSES:
+            return None, "Loại upload không hợp lệ"
+        
+        filename = secure_filename(filename or '')
+        if not filename or not FileService.allowed_file(filename):
+            return None, f'File không hợp lệ. Chỉ chấp nhận: {", ".join(current_app.config["ALLOWED_EXTENSIONS"])}'
+        
+        try:
+            total_size = int(total_size)
+        except (TypeError, ValueError):
+            return None, "Kích thước file không hợp lệ"
+        max_size = current_app.config['MAX_UPLOAD_SIZE']
+        if total_size <= 0 or total_size > max_size:
+            return None, f"Kích thước file phải từ 1 byte đến {max_size // (1024 * 1024)}MB"
+        
+        upload = ChunkedUpload(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            purpose=purpose,
+            assignment_id=assignment_id,
+            filename=filename,
+            total_size=total_size
+        )
+        
+        try:
+            staging_path = UploadService._staging_path(upload.id)
+            os.makedirs(os.path.dirname(staging_path), exist_ok=True)
+            open(staging_path, 'wb').close()
+            
+            db.session.add(upload)
+            db.session.commit()
+            return upload, None
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Lỗi khi tạo phiên upload: {str(e)}"
+    
+    @staticmethod
+    def get_upload(upload_id, user_id):
+        """Lấy phiên upload, chỉ trả về nếu thuộc về user_id"""
+        upload = db.session.get(ChunkedUpload, upload_id)
+        if not upload or upload.user_id != user_id:
+            return None
+        return upload
+    
+    @staticmethod
+    def get_offset(upload):
+        """Số byte đã nhận (= kích thước file staging)"""
+        try:
+            return os.path.getsize(UploadService._staging_path(upload.id))
+        except OSError:
+            return 0
+    
+    @staticmethod
+    def write_chunk(upload, offset, stream, chunk_size=64 * 1024):
+        """
+        Ghi một chunk bắt đầu tại offset
+        offset được phép nhỏ hơn số byte đã nhận (client gửi lại sau khi mất kết nối),
+        nhưng không được vượt quá - khi đó client phải hỏi lại offset hiện tại
+        Returns: (new_offset, error_message)
+        """
+        if upload.is_completed:
+            return None, "Upload đã hoàn tất"
+        
+        current = UploadService.get_offset(upload)
+        if offset < 0 or offset > current:
+            return current, f"Offset không hợp lệ, server đã nhận {current} byte"
+        
+        staging_path = UploadService._staging_path(upload.id)
+        position = offset
+        try:
+            with open(staging_path, 'r+b') as f:
+                f.seek(offset)
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    if position + len(chunk) > upload.total_size:
+                        return UploadService.get_offset(upload), "Dữ liệu vượt quá kích thước đã khai báo"
+                    f.write(chunk)
+                    position += len(chunk)
+        except OSError as e:
+            return UploadService.get_offset(upload), f"Lỗi khi ghi chunk: {str(e)}"
+        
+        return max(position, current), None
+    
+    @staticmethod
+    def finalize(upload):
+        """
+        Đánh dấu upload hoàn tất khi đã nhận đủ dữ liệu
+        Returns: (success, error_message)
+        """
+        received = UploadService.get_offset(upload)
+        if received != upload.total_size:
+            return False, f"Upload chưa đủ dữ liệu ({received}/{upload.total_size} byte)"
+        
+        upload.is_completed = True
+        try:
+            db.session.commit()
+            return True, None
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Lỗi khi hoàn tất upload: {str(e)}"
+    
+    @staticmethod
+    def open_completed(upload_id, user_id, purpose, assignment_id=None):
+        """
+        Mở upload đã hoàn tất như một FileStorage để đưa vào luồng
+        save_submission_file / save_assignment_file có sẵn
+        Returns: (file, error_message)
+        """
+        upload = UploadService.get_upload(upload_id, user_id)
+        if not upload or upload.purpose != purpose:
+            return None, "Không tìm thấy phiên upload"
+        if assignment_id is not None and upload.assignment_id != assignment_id:
+            return None, "Phiên upload không thuộc bài tập này"
+        if not upload.is_completed:
+            return None, "Upload chưa hoàn tất"
+        
+        return StagedFile(UploadService._staging_path(upload.id), upload.filename), None
+    
+    @staticmethod
+    def discard(upload_id):
+        """Xóa phiên upload và file staging (nếu còn)"""
+        upload = db.session.get(ChunkedUpload, upload_id)
+        staging_path = UploadService._staging_path(upload_id)
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+        if upload:
+            try:
+                db.session.delete(upload)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error discarding upload {upload_id}: {e}")
+    
+    @staticmethod
+    def purge_stale(max_age_hours=24):
+        """
+        Xóa các phiên upload bị bỏ dở quá max_age_hours
+        Returns: số phiên đã xóa
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        stale_ids = [row.id for row in db.session.query(ChunkedUpload.id).filter(ChunkedUpload.created_at < cutoff)]
+        for upload_id in stale_ids:
+            UploadService.discard(upload_id)
+        return len(stale_ids)
@@ -1,12 +1,78 @@
+import csv
+import io
+import os
+import re
 from app import db
+from app.models.assignment import Assignment
+from app.models.challenge import Challenge
+from app.models.chunked_upload import ChunkedUpload
+from app.models.submission import Submission
 from app.models.user import User
+from app.services.attempt_service import AttemptService
+from app.services.counter_service import CounterService
+from app.services.job_service import JobService
+from app.services.result_store_service import ResultStoreService
+from app.utils.pagination import paginate_keyset
+from app.utils.passwords import hash_passwords
+from app.utils.principal import principal_cache
+from app.utils.text import normalize_key, prefix_upper_bound
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+
+IMPORT_COLUMNS = ('username', 'password', 'fullname', 'email', 'phone', 'role')
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
 
 
 class UserService:
     
     @staticmethod
-    def get_all_users():
-        return User.query.order_by(User.created_at.desc()).all()
+    def get_all_users(after=None, before=None, per_page=None):
+        return paginate_keyset(User.query, User.created_at, User.id,
+                               after=after, before=before, per_page=per_page)
+    
+    @staticmethod
+    def search_users(query=None, role=None, after=None, before=None, per_page=None):
+        """
+        Lọc người dùng theo role và tìm theo tiền tố username / họ tên / email
+        (không phân biệt hoa thường, dấu). Mỗi nhánh OR là một range trên index
+        (role, *_key) nên chỉ đọc các dòng khớp, sau đó phân trang keyset như get_all_users
+        """
+        if role not in ('student', 'teacher'):
+            role = None
+        prefix = normalize_key(query)
+        if not prefix:
+            base = User.query.filter_by(role=role) if role else User.query
+            return paginate_keyset(base, User.created_at, User.id,
+                                   after=after, before=before, per_page=per_page)
+        
+        upper = prefix_upper_bound(prefix)
+        branches = []
+        for column in (User.username_key, User.fullname_key, User.email_key):
+            condition = and_(column >= prefix, column < upper)
+            branches.append(and_(User.role == role, condition) if role else condition)
+        return paginate_keyset(User.query.filter(or_(*branches)), User.created_at, User.id,
+                               after=after, before=before, per_page=per_page)
+    
+    @staticmethod
+    def backfill_search_keys(batch_size=1000):
+        """
+        Điền các cột *_key cho user tạo trước khi có tìm kiếm
+        Returns: số user đã cập nhật
+        """
+        total = 0
+        while True:
+            users = User.query.filter(or_(
+                User.username_key.is_(None), User.fullname_key.is_(None), User.email_key.is_(None)
+            )).limit(batch_size).all()
+            if not users:
+                return total
+            for user in users:
+                user.username_key = normalize_key(user.username)
+                user.fullname_key = normalize_key(user.fullname)
+                user.email_key = normalize_key(user.email)
+            db.session.commit()
+            total += len(users)
     
     @staticmethod
     def get_user_by_id(user_id):
@@ -20,6 +86,25 @@ class UserService:
     def get_user_by_email(email):
         return User.query.filter_by(email=email).first()
     
+    @staticmethod
+    def authenticate(username, password):
+        """
+        Kiểm tra đăng nhập; khi đúng mật khẩu mà hash dùng tham số cũ
+        thì hash lại theo PASSWORD_HASH_METHOD hiện tại (không bắt user đổi mật khẩu)
+        Returns: user hoặc None
+        """
+        user = UserService.get_user_by_username(username)
+        if not user or not password or not user.check_password(password):
+            return None
+        
+        if user.password_needs_rehash():
+            try:
+                user.set_password(password)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+        return user
+    
     @staticmethod
     def create_user(username, password, fullname, email, phone, role):
         if UserService.get_user_by_username(username):
@@ -39,6 +124,7 @@ class UserService:
         
         try:
             db.session.add(user)
+            CounterService.add_user(role)
             db.session.commit()
             return user, None
         except Exception as e:
@@ -56,8 +142,12 @@ class UserService:
             if existing_user:
                 return None, "Email đã được sử dụng"
         
-        if fullname:
+        if fullname and fullname != user.fullname:
             user.fullname = fullname
+            # Tên giáo viên hiển thị trên thẻ bài tập / challenge đã cache
+            if user.is_teacher():
+                CounterService.bump_version('assignments')
+                CounterService.bump_version('challenges')
         if email:
             user.email = email
         if phone:
@@ -67,6 +157,7 @@ class UserService:
         
         try:
             db.session.commit()
+            principal_cache.invalidate(user_id)
             return user, None
         except Exception as e:
             db.session.rollback()
@@ -78,18 +169,172 @@ class UserService:
         if not user:
             return False, "User không tồn tại"
         
+        if user.is_teacher():
+            owns_content = Assignment.query.filter_by(teacher_id=user_id).first() or \
+                Challenge.query.filter_by(teacher_id=user_id).first()
+            if owns_content:
+                return False, "Giáo viên vẫn còn bài tập hoặc challenge, hãy xóa chúng trước"
+        
         try:
+            # Xóa bài nộp và phiên upload dở dang của user; file được dọn nền qua hàng đợi job
+            submissions = db.session.query(Submission.assignment_id, Submission.file_path).filter_by(student_id=user_id).all()
+            staging_paths = [
+                os.path.join('staging', f"{row.id}.part")
+                for row in db.session.query(ChunkedUpload.id).filter_by(user_id=user_id)
+            ]
+            JobService.enqueue_file_deletions([row.file_path for row in submissions] + staging_paths)
+            for row in submissions:
+                CounterService.add_submission(row.assignment_id, -1)
+            Submission.query.filter_by(student_id=user_id).delete(synchronize_session=False)
+            ChunkedUpload.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+            AttemptService.remove_user(user_id)
+            ResultStoreService.remove_user(user_id)
+            db.session.expire(user, ['submissions'])
+            
             db.session.delete(user)
+            CounterService.add_user(user.role, -1)
             db.session.commit()
+            principal_cache.invalidate(user_id)
             return True, None
         except Exception as e:
             db.session.rollback()
             return False, str(e)
     
     @staticmethod
-    def get_all_students():
-        return User.query.filter_by(role='student').order_by(User.created_at.desc()).all()
+    def read_user_csv(stream, default_role='student'):
+        """
+        Đọc file CSV có header: username,password,fullname,email[,phone][,role]
+        Returns: (list dict kèm số dòng 'line', error_message)
+        """
+        raw = stream.read()
+        text = raw.decode('utf-8-sig', errors='replace') if isinstance(raw, bytes) else raw
+        reader = csv.DictReader(io.StringIO(text))
+        header = [name.strip().lower() for name in reader.fieldnames or []]
+        missing = [name for name in ('username', 'password', 'fullname', 'email') if name not in header]
+        if missing:
+            return None, f"File CSV thiếu cột: {', '.join(missing)}"
+        reader.fieldnames = header
+        
+        rows = []
+        for line, record in enumerate(reader, start=2):
+            row = {name: (record.get(name) or '').strip() for name in IMPORT_COLUMNS}
+            row['role'] = row['role'].lower() or default_role
+            row['line'] = line
+            rows.append(row)
+        return rows, None
+    
+    @staticmethod
+    def _existing_values(column, values, chunk_size=500):
+        """Các giá trị đã có trong DB, kiểm tra bằng query IN theo lô thay vì từng dòng"""
+        values = list(values)
+        existing = set()
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start:start + chunk_size]
+            existing.update(value for (value,) in db.session.query(column).filter(column.in_(chunk)))
+        return existing
+    
+    @staticmethod
+    def _validate_import_rows(rows):
+        """
+        Kiểm tra dữ liệu import: trường bắt buộc, role, email, trùng trong file và trùng trong DB
+        Returns: (dòng hợp lệ, list (số dòng, lỗi))
+        """
+        errors = []
+        candidates = []
+        seen_usernames, seen_emails = set(), set()
+        for row in rows:
+            missing = [name for name in ('username', 'password', 'fullname', 'email') if not row[name]]
+            if missing:
+                errors.append((row['line'], f"Thiếu {', '.join(missing)}"))
+            elif row['role'] not in ('student', 'teacher'):
+                errors.append((row['line'], f"Vai trò không hợp lệ: {row['role']}"))
+            elif not EMAIL_PATTERN.match(row['email']):
+                errors.append((row['line'], f"Email không hợp lệ: {row['email']}"))
+            elif row['username'] in seen_usernames:
+                errors.append((row['line'], f"Username {row['username']} bị trùng trong file"))
+            elif normalize_key(row['email']) in seen_emails:
+                errors.append((row['line'], f"Email {row['email']} bị trùng trong file"))
+            else:
+                seen_usernames.add(row['username'])
+                seen_emails.add(normalize_key(row['email']))
+                candidates.append(row)
+        
+        # Email so sánh không phân biệt hoa thường ở cả 2 phía: trong file và cột email_key
+        # (đã chuẩn hóa, có index) trong DB
+        taken_usernames = UserService._existing_values(User.username, seen_usernames)
+        taken_emails = UserService._existing_values(User.email_key, seen_emails)
+        valid = []
+        for row in candidates:
+            if row['username'] in taken_usernames:
+                errors.append((row['line'], f"Username {row['username']} đã tồn tại"))
+            elif normalize_key(row['email']) in taken_emails:
+                errors.append((row['line'], f"Email {row['email']} đã tồn tại"))
+            else:
+                valid.append(row)
+        return valid, errors
+    
+    @staticmethod
+    def _insert_user_batch(batch):
+        """
+        Ghi một lô user trong một transaction
+        Nếu lô vi phạm unique (user được tạo đồng thời từ nơi khác) thì ghi lại từng dòng
+        để chỉ các dòng lỗi bị bỏ qua
+        Returns: (số user đã tạo, list (số dòng, lỗi))
+        """
+        def build(row, password_hash):
+            user = User(row['username'], row['fullname'], row['email'], row['phone'] or None, row['role'])
+            user.password = password_hash
+            return user
+        
+        try:
+            db.session.add_all([build(row, password_hash) for row, password_hash in batch])
+            for role in {row['role'] for row, _ in batch}:
+                CounterService.add_user(role, sum(1 for row, _ in batch if row['role'] == role))
+            db.session.commit()
+            return len(batch), []
+        except IntegrityError:
+            db.session.rollback()
+        
+        created, errors = 0, []
+        for row, password_hash in batch:
+            try:
+                db.session.add(build(row, password_hash))
+                CounterService.add_user(row['role'])
+                db.session.commit()
+                created += 1
+            except IntegrityError:
+                db.session.rollback()
+                errors.append((row['line'], 'Username hoặc email đã tồn tại'))
+        return created, errors
+    
+    @staticmethod
+    def import_users(rows, batch_size=500):
+        """
+        Tạo user hàng loạt
+        - Kiểm tra trùng username/email bằng vài query IN thay vì 2 query mỗi dòng
+        - Hash mật khẩu song song trên mọi core
+        - Ghi theo lô batch_size dòng mỗi transaction
+        Returns: dict {'created': số user đã tạo, 'errors': list (số dòng, lỗi)}
+        """
+        valid, errors = UserService._validate_import_rows(rows)
+        password_hashes = hash_passwords([row['password'] for row in valid])
+        
+        created = 0
+        pairs = list(zip(valid, password_hashes))
+        for start in range(0, len(pairs), batch_size):
+            batch_created, batch_errors = UserService._insert_user_batch(pairs[start:start + batch_size])
+            created += batch_created
+            errors.extend(batch_errors)
+        
+        errors.sort()
+        return {'created': created, 'errors': errors}
+    
+    @staticmethod
+    def get_all_students(after=None, before=None, per_page=None):
+        return paginate_keyset(User.query.filter_by(role='student'), User.created_at, User.id,
+                               after=after, before=before, per_page=per_page)
     
     @staticmethod
-    def get_all_teachers():
-        return User.query.filter_by(role='teacher').order_by(User.created_at.desc()).all()
+    def get_all_teachers(after=None, before=None, per_page=None):
+        return paginate_keyset(User.query.filter_by(role='teacher'), User.created_at, User.id,
+                               after=after, before=before, per_page=per_page)
@@ -0,0 +1,98 @@
+import codecs
+import mmap
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+
+# BOM -> encoding, kiểm tra theo thứ tự (UTF-32 trước UTF-16 vì BOM của UTF-32 LE bắt đầu bằng BOM UTF-16 LE)
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def detect_encoding(data):
+    """
+    Đoán encoding của nội dung text: theo BOM, sau đó thử UTF-8,
+    không được thì latin-1 (giải mã được mọi chuỗi byte)
+    data có thể là bytes hoặc vùng mmap (mmap không có startswith nên so BOM trên 4 byte đầu)
+    """
+    head = bytes(data[:4])
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    try:
+        codecs.decode(data, 'utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def read_text(file_path, encoding=None, mmap_threshold=1024 * 1024):
+    """
+    Đọc toàn bộ file text, chuẩn hóa xuống dòng về \\n như chế độ text của open()
+    File lớn hơn mmap_threshold được map vào bộ nhớ và giải mã trực tiếp
+    từ vùng map (không tạo thêm bản sao bytes)
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= mmap_threshold and size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                encoding = encoding or detect_encoding(mapped)
+                content = str(mapped, encoding)
+        else:
+            data = f.read()
+            encoding = encoding or detect_encoding(data)
+            content = data.decode(encoding)
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+
+class ContentCache:
+    """
+    Cache LRU nội dung file text trong process, giới hạn theo tổng số byte
+    Khóa gồm đường dẫn + mtime + size: file bị thay thế thì khóa đổi,
+    bản cũ tự bị đẩy ra khỏi cache theo LRU
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, content):
+        cost = sys.getsizeof(content)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (content, cost)
+            self.current_bytes += cost
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_cost) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_cost
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
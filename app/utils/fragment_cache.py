@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+from app.utils.metrics import registry
+
+
+# Token CSRF là riêng của từng session nên không được nằm trong fragment dùng chung:
+# khi lưu, token của người render được thay bằng chuỗi này; khi trả ra, thay bằng token của người xem
+CSRF_SENTINEL = '\x00csrf-token\x00'
+
+
+class NullBackend:
+    """Không cache (FRAGMENT_CACHE_TYPE = 'null')"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryBackend:
+    """Cache LRU + TTL trong từng process, giới hạn theo số fragment"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemBackend:
+    """
+    Cache dùng chung giữa các gunicorn worker: mỗi fragment một file trong directory
+    Ghi ra file tạm rồi os.replace nên worker khác không bao giờ đọc phải file ghi dở
+    Khi số file vượt max_entries, các file cũ nhất (theo mtime) bị xóa
+    """
+
+    def __init__(self, directory, max_entries=1000):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['key'] != key or entry['expires_at'] < time.time():
+            return None
+        return entry['value']
+
+    def set(self, key, value, ttl):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'expires_at': time.time() + ttl, 'value': value}, f)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        self._prune()
+
+    def _prune(self):
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if not entry.name.startswith('.')]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def create_backend(app):
+    cache_type = app.config.get('FRAGMENT_CACHE_TYPE', 'memory')
+    max_entries = app.config.get('FRAGMENT_CACHE_SIZE', 1000)
+    if cache_type == 'filesystem':
+        directory = app.config.get('FRAGMENT_CACHE_DIR') or os.path.join(app.instance_path, 'fragment-cache')
+        return FileSystemBackend(directory, max_entries)
+    if cache_type == 'memory':
+        return MemoryBackend(max_entries)
+    return NullBackend()
+
+
+def init_fragment_cache(app):
+    """Gắn backend cache fragment (FRAGMENT_CACHE_TYPE) vào app.extensions"""
+    app.extensions['fragment_cache'] = create_backend(app)
+
+
+def make_key(*parts):
+    return ':'.join(str(part) for part in parts)
+
+
+def cached_fragment(key, render):
+    """
+    Trả về fragment HTML theo key, chỉ gọi render() khi cache chưa có / đã hết hạn
+    render() trả về (html, ttl): ttl None = FRAGMENT_CACHE_TTL, 0 = không lưu,
+    ttl khác được giới hạn bởi FRAGMENT_CACHE_TTL
+    Key phải chứa mọi thứ quyết định nội dung (role, version dữ liệu, trang...)
+    """
+    backend = current_app.extensions['fragment_cache']
+    html = backend.get(key)
+    if html is None:
+        registry.inc('fragment_cache_requests_total', {'result': 'miss'})
+        html, ttl = render()
+        html = str(html).replace(generate_csrf(), CSRF_SENTINEL)
+        max_ttl = current_app.config.get('FRAGMENT_CACHE_TTL', 300)
+        ttl = max_ttl if ttl is None else min(ttl, max_ttl)
+        if ttl > 0:
+            backend.set(key, html, ttl)
+    else:
+        registry.inc('fragment_cache_requests_total', {'result': 'hit'})
+    return Markup(html.replace(CSRF_SENTINEL, generate_csrf()))
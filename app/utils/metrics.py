@@ -0,0 +1,379 @@
+import atexit
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import (Response, abort, current_app, g, has_request_context, request, template_rendered,
+                   before_render_template)
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows: không khóa file (METRICS_DIR chỉ dùng với gunicorn)
+    fcntl = None
+
+
+# Bucket (giây) cho histogram latency request và thời gian render template
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# /metrics không có METRICS_TOKEN chỉ trả lời request từ các địa chỉ này
+LOCAL_ADDRESSES = {'127.0.0.1', '::1'}
+
+# Mô tả cho dòng # HELP / # TYPE
+METRICS = {
+    'http_requests_total': ('counter', 'Số request theo endpoint, method, status'),
+    'http_request_duration_seconds': ('histogram', 'Thời gian xử lý request theo endpoint'),
+    'db_queries_total': ('counter', 'Số câu SQL theo endpoint'),
+    'db_query_duration_seconds_total': ('counter', 'Tổng thời gian chạy SQL theo endpoint'),
+    'file_bytes_total': ('counter', 'Số byte file upload / download qua FileService'),
+    'template_render_duration_seconds': ('histogram', 'Thời gian render template'),
+}
+
+
+class MetricsRegistry:
+    """
+    Bộ đếm và histogram trong một process
+    Mỗi gunicorn worker ghi snapshot ra file riêng trong METRICS_DIR (<pid>-<token>.json,
+    token riêng mỗi process nên PID bị dùng lại không ghi đè số liệu của worker đã chết),
+    /metrics cộng dồn tất cả các file nên số liệu đúng với mọi worker
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._token = uuid.uuid4().hex[:12]
+        self.counters = {}
+        self.histograms = {}
+        self._dirty = False
+        self._last_flush = 0.0
+
+    def _check_fork(self):
+        # Process con sau fork không được tính lại số liệu của process cha
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            self.counters[key] = self.counters.get(key, 0) + value
+            self._dirty = True
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets),
+                                                    'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+            self._dirty = True
+
+    def snapshot(self):
+        with self._lock:
+            self._check_fork()
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), dict(histogram, counts=list(histogram['counts']))]
+                               for (name, labels), histogram in self.histograms.items()],
+            }
+
+    def filename(self):
+        with self._lock:
+            self._check_fork()
+            return f'{self._pid}-{self._token}.json'
+
+    def flush(self, directory, interval=0.0):
+        """Ghi snapshot ra <directory>/<pid>-<token>.json (ghi file tạm rồi rename để không bao giờ đọc phải file dở)"""
+        if not directory or not self._dirty or time.monotonic() - self._last_flush < interval:
+            return
+        with self._flush_lock:
+            self._dirty = False
+            self._last_flush = time.monotonic()
+            os.makedirs(directory, exist_ok=True)
+            _write_json(os.path.join(directory, self.filename()), self.snapshot())
+
+
+registry = MetricsRegistry()
+
+
+def add_file_bytes(direction, size):
+    """Ghi nhận byte file đi qua FileService (direction: 'upload' | 'download')"""
+    if size:
+        registry.inc('file_bytes_total', {'direction': direction}, size)
+
+
+def _endpoint_label():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return 'background'
+
+
+def merge_snapshots(snapshots):
+    """Cộng dồn snapshot của nhiều process: counter cộng, histogram cộng từng bucket"""
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get('counters', []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, histogram in snapshot.get('histograms', []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = dict(histogram, counts=list(histogram['counts']))
+                continue
+            merged['counts'] = [a + b for a, b in zip(merged['counts'], histogram['counts'])]
+            merged['sum'] += histogram['sum']
+            merged['count'] += histogram['count']
+    return counters, histograms
+
+
+AGGREGATE_FILE = 'aggregate.json'
+
+
+def _write_json(path, data):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _directory_lock(directory):
+    """Khóa độc quyền METRICS_DIR: gộp file của process đã thoát và đọc số liệu không xen nhau"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _fold_dead(directory, retired=None):
+    """
+    Gộp snapshot của các process đã thoát (và `retired`) vào aggregate.json rồi xóa file của chúng,
+    để thư mục không phình ra khi worker bị tái tạo (max_requests) (gọi khi đang giữ khóa)
+    aggregate.json ghi lại tên file đã gộp: chết giữa lúc ghi và xóa cũng không bị cộng 2 lần
+    Returns: aggregate (dict snapshot + danh sách 'folded')
+    """
+    aggregate_path = os.path.join(directory, AGGREGATE_FILE)
+    aggregate = _read_json(aggregate_path) or {'counters': [], 'histograms': [], 'folded': []}
+    folded = set(aggregate.get('folded', []))
+    paths = [path for path in glob.glob(os.path.join(directory, '*.json'))
+             if os.path.basename(path) != AGGREGATE_FILE]
+    present = {os.path.basename(path) for path in paths}
+
+    dead = []
+    for path in paths:
+        name = os.path.basename(path)
+        if name in folded:
+            continue
+        try:
+            pid = int(name.split('-')[0].split('.')[0])
+        except ValueError:
+            continue
+        if name == retired or (pid != os.getpid() and not _pid_alive(pid)):
+            snapshot = _read_json(path)
+            if snapshot is not None:
+                dead.append((name, snapshot))
+
+    if dead:
+        counters, histograms = merge_snapshots([aggregate] + [snapshot for _, snapshot in dead])
+        aggregate = {
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), histogram] for (name, labels), histogram in histograms.items()],
+            # Chỉ giữ tên file còn trên đĩa (chưa xóa được) để danh sách không phình ra
+            'folded': sorted((folded & present) | {name for name, _ in dead}),
+        }
+        _write_json(aggregate_path, aggregate)
+    for name in set(aggregate.get('folded', [])) & present:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+    return aggregate
+
+
+def retire(directory):
+    """Process sắp thoát: ghi snapshot cuối rồi gộp vào aggregate.json"""
+    registry.flush(directory)
+    with _directory_lock(directory):
+        _fold_dead(directory, retired=registry.filename())
+
+
+def collect(directory):
+    """
+    Snapshot của mọi process đã ghi vào directory: file của process còn sống cộng với
+    aggregate.json (số liệu đã gộp của các worker đã thoát, counter không bao giờ giảm)
+    Không cấu hình directory thì chỉ có số liệu của process hiện tại
+    """
+    if not directory:
+        return merge_snapshots([registry.snapshot()])
+
+    registry.flush(directory)
+    with _directory_lock(directory):
+        aggregate = _fold_dead(directory)
+        folded = set(aggregate.get('folded', []))
+        snapshots = [aggregate]
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            name = os.path.basename(path)
+            if name == AGGREGATE_FILE or name in folded:
+                continue
+            snapshot = _read_json(path)
+            if snapshot is not None:
+                snapshots.append(snapshot)
+    return merge_snapshots(snapshots)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = ','.join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                       for key, value in pairs)
+    return '{' + escaped + '}'
+
+
+def render_prometheus(counters, histograms):
+    """Xuất số liệu theo định dạng text của Prometheus (exposition format 0.0.4)"""
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+            continue
+
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(histogram['buckets'], histogram['counts']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {histogram["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {histogram["sum"]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_query_start', None)
+    if start is None:
+        return
+    labels = {'endpoint': _endpoint_label()}
+    registry.inc('db_queries_total', labels)
+    registry.inc('db_query_duration_seconds_total', labels, time.perf_counter() - start)
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('_metrics_templates', []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    starts = g.get('_metrics_templates')
+    if not starts:
+        return
+    registry.observe('template_render_duration_seconds', {'template': template.name or 'string'},
+                     time.perf_counter() - starts.pop())
+
+
+def init_metrics(app):
+    """
+    Gắn thu thập số liệu vào app (request, SQL, template) và đăng ký route /metrics
+    METRICS_DIR: thư mục dùng chung giữa các gunicorn worker (bỏ trống = chỉ process hiện tại)
+    """
+    from app import db
+
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    directory = app.config.get('METRICS_DIR')
+    interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+
+    @app.before_request
+    def start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            endpoint = request.endpoint or 'unmatched'
+            registry.observe('http_request_duration_seconds', {'endpoint': endpoint, 'method': request.method},
+                             time.perf_counter() - start)
+            registry.inc('http_requests_total', {'endpoint': endpoint, 'method': request.method,
+                                                 'status': str(response.status_code)})
+        registry.flush(directory, interval)
+        return response
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    with app.app_context():
+        engine = db.engine
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    if directory:
+        atexit.register(retire, directory)
+
+    token = app.config.get('METRICS_TOKEN')
+
+    def metrics():
+        # Có METRICS_TOKEN: yêu cầu 'Authorization: Bearer <token>'; không có: chỉ cho truy cập từ máy local
+        if token:
+            supplied = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+                abort(403)
+        elif request.remote_addr not in LOCAL_ADDRESSES:
+            abort(403)
+        counters, histograms = collect(current_app.config.get('METRICS_DIR'))
+        return Response(render_prometheus(counters, histograms),
+                        mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
@@ -0,0 +1,98 @@
+import os
+import sys
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+
+class NPlusOneError(RuntimeError):
+    """Cùng một lazy-load chạy quá NPLUSONE_THRESHOLD lần trong một request"""
+
+
+# Frame thuộc các thư viện này không phải là nơi gây ra lazy-load
+_SKIP_PREFIXES = ('sqlalchemy', 'flask_sqlalchemy', 'jinja2', 'markupsafe', 'flask', 'werkzeug')
+
+
+def _is_library_frame(frame):
+    module = frame.f_globals.get('__name__') or ''
+    return module == __name__ or module.split('.', 1)[0] in _SKIP_PREFIXES
+
+
+def find_trigger_location(app_root):
+    """
+    Tìm nơi kích hoạt lazy-load: dòng template Jinja (map về dòng trong file .html)
+    hoặc frame Python đầu tiên thuộc code của app
+    """
+    fallback = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        template = frame.f_globals.get('__jinja_template__')
+        if template is not None:
+            lineno = template.get_corresponding_lineno(frame.f_lineno)
+            return f'{template.name or template.filename}:{lineno}'
+        if not _is_library_frame(frame):
+            filename = frame.f_code.co_filename
+            location = f'{filename}:{frame.f_lineno} ({frame.f_code.co_name})'
+            if filename.startswith(app_root):
+                return location.replace(os.path.dirname(app_root) + os.sep, '', 1)
+            fallback = fallback or location
+        frame = frame.f_back
+    return fallback or 'không xác định'
+
+
+def _relationship_key(orm_execute_state):
+    """Khóa theo hình dạng lazy-load: <Model>.<relationship>"""
+    path = orm_execute_state.loader_strategy_path
+    prop = path[-1] if path is not None and len(path) else None
+    owner = orm_execute_state.lazy_loaded_from
+    owner_name = owner.class_.__name__ if owner is not None else '?'
+    return f"{owner_name}.{getattr(prop, 'key', prop)}"
+
+
+def _on_orm_execute(orm_execute_state):
+    if not orm_execute_state.is_relationship_load or not has_request_context():
+        return
+    config = current_app.config
+    mode = config.get('NPLUSONE_DETECT')
+    if mode not in ('log', 'raise'):
+        return
+
+    key = _relationship_key(orm_execute_state)
+    seen = g.setdefault('_nplusone', {})
+    entry = seen.get(key)
+    if entry is None:
+        entry = seen[key] = {'count': 0, 'location': None, 'statement': None}
+    entry['count'] += 1
+
+    if entry['count'] == config.get('NPLUSONE_THRESHOLD', 3) + 1:
+        entry['location'] = find_trigger_location(current_app.root_path)
+        entry['statement'] = ' '.join(str(orm_execute_state.statement).split())
+        if mode == 'raise':
+            raise NPlusOneError(_format(key, entry))
+
+
+def _format(key, entry):
+    return (f"N+1 query: {key} lazy-load {entry['count']} lần trong request "
+            f"{request.method} {request.path} tại {entry['location']}\n    {entry['statement']}")
+
+
+def init_nplusone(app):
+    """
+    Phát hiện N+1 khi NPLUSONE_DETECT = 'log' (ghi warning cuối request) hoặc 'raise'
+    (ném NPlusOneError ngay khi vượt ngưỡng, dùng trong test)
+    Đếm theo từng relationship bị lazy-load trong mỗi request
+    """
+    from app import db
+
+    if app.config.get('NPLUSONE_DETECT') not in ('log', 'raise'):
+        return
+
+    if not event.contains(db.session, 'do_orm_execute', _on_orm_execute):
+        event.listen(db.session, 'do_orm_execute', _on_orm_execute)
+
+    @app.after_request
+    def report_nplusone(response):
+        threshold = app.config.get('NPLUSONE_THRESHOLD', 3)
+        for key, entry in g.pop('_nplusone', {}).items():
+            if entry['count'] > threshold:
+                app.logger.warning(_format(key, entry))
+        return response
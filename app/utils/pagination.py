@@ -0,0 +1,107 @@
+import base64
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, or_
+
+
+class KeysetPage:
+    """
+    Một trang kết quả phân trang theo keyset (cursor)
+    Có thể lặp trực tiếp như một list trong template
+    """
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def encode_cursor(timestamp, row_id):
+    """Mã hóa (timestamp, id) thành chuỗi an toàn cho URL"""
+    raw = f"{timestamp.isoformat() if timestamp else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Giải mã cursor thành (timestamp, id)
+    Cursor không hợp lệ trả về None (coi như trang đầu)
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        timestamp, row_id = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def get_per_page(per_page=None):
+    """Số bản ghi mỗi trang (mặc định lấy từ config ITEMS_PER_PAGE)"""
+    if per_page:
+        return per_page
+    return current_app.config.get('ITEMS_PER_PAGE', 20)
+
+
+def paginate_keyset(query, time_column, id_column, after=None, before=None, per_page=None):
+    """
+    Phân trang keyset theo (time_column, id_column) giảm dần (mới nhất trước)
+    - after: cursor của bản ghi cuối trang trước -> lấy trang kế tiếp
+    - before: cursor của bản ghi đầu trang sau -> lấy trang trước đó
+    Mỗi trang chỉ đọc per_page + 1 dòng nhờ index, không dùng OFFSET
+    """
+    per_page = get_per_page(per_page)
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before) if after_key is None else None
+
+    if before_key is not None:
+        timestamp, row_id = before_key
+        rows = query.filter(or_(
+            time_column > timestamp,
+            and_(time_column == timestamp, id_column > row_id)
+        )).order_by(time_column.asc(), id_column.asc()).limit(per_page + 1).all()
+
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        if after_key is not None:
+            timestamp, row_id = after_key
+            query = query.filter(or_(
+                time_column < timestamp,
+                and_(time_column == timestamp, id_column < row_id)
+            ))
+        rows = query.order_by(time_column.desc(), id_column.desc()).limit(per_page + 1).all()
+
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = after_key is not None
+
+    if not items:
+        return KeysetPage(items)
+
+    time_attr = time_column.key
+    id_attr = id_column.key
+    first, last = items[0], items[-1]
+    next_cursor = encode_cursor(getattr(last, time_attr), getattr(last, id_attr)) if has_next else None
+    prev_cursor = encode_cursor(getattr(first, time_attr), getattr(first, id_attr)) if has_prev else None
+    return KeysetPage(items, next_cursor=next_cursor, prev_cursor=prev_cursor)
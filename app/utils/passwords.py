@@ -0,0 +1,95 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+
+# Tham số mặc định của Werkzeug, dùng để chuẩn hóa 'scrypt' / 'pbkdf2' khi so sánh
+_SCRYPT_DEFAULTS = ['scrypt', str(2 ** 15), '8', '1']
+_PBKDF2_DEFAULTS = ['pbkdf2', 'sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+
+_pool = None
+_pool_pid = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+
+
+def normalize_method(method):
+    """'scrypt' -> 'scrypt:32768:8:1', 'pbkdf2:sha256' -> 'pbkdf2:sha256:600000'"""
+    parts = method.split(':')
+    defaults = _SCRYPT_DEFAULTS if parts[0] == 'scrypt' else _PBKDF2_DEFAULTS if parts[0] == 'pbkdf2' else parts
+    return ':'.join(parts + defaults[len(parts):])
+
+
+def _config(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+
+def _get_pool(workers):
+    """
+    Pool tạo lazy trong từng process: pool tạo trước khi gunicorn fork
+    không dùng được ở process con nên phải tạo lại theo pid
+    """
+    global _pool, _pool_pid, _pool_slots
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_pid = os.getpid()
+            # Giới hạn số việc đang chờ để hàng đợi không phình vô hạn khi quá tải
+            _pool_slots = threading.BoundedSemaphore(workers * 4)
+        return _pool, _pool_slots
+
+
+def _run(func, *args):
+    """Chạy KDF trong process pool (PASSWORD_HASH_WORKERS > 0) hoặc ngay tại chỗ"""
+    workers = _config('PASSWORD_HASH_WORKERS', 0)
+    if not workers:
+        return func(*args)
+
+    pool, slots = _get_pool(workers)
+    timeout = _config('PASSWORD_HASH_TIMEOUT', 30)
+    if not slots.acquire(timeout=timeout):
+        raise TimeoutError('Hàng đợi hash mật khẩu đã đầy')
+    try:
+        return pool.submit(func, *args).result(timeout=timeout)
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    """Hash mật khẩu theo PASSWORD_HASH_METHOD"""
+    return _run(generate_password_hash, password, _config('PASSWORD_HASH_METHOD', 'scrypt'))
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash nhiều mật khẩu song song trên mọi core (import user hàng loạt)
+    Dùng pool riêng, tồn tại trong lúc import, để không chiếm chỗ của request đăng nhập
+    """
+    method = _config('PASSWORD_HASH_METHOD', 'scrypt')
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(passwords) < 2:
+        return [generate_password_hash(password, method) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(generate_password_hash, passwords, [method] * len(passwords), chunksize=chunksize))
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """Hash được tạo với thuật toán / tham số khác PASSWORD_HASH_METHOD hiện tại"""
+    stored_method = password_hash.split('$', 1)[0]
+    return normalize_method(stored_method) != normalize_method(_config('PASSWORD_HASH_METHOD', 'scrypt'))
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from flask_login import UserMixin
+
+
+class Principal(UserMixin):
+    """
+    Bản chụp gọn của User dùng làm current_user (không gắn với session SQLAlchemy)
+    Chỉ chứa các trường mà decorator phân quyền và template cần
+    """
+
+    def __init__(self, id, username, fullname, email, role):
+        self.id = id
+        self.username = username
+        self.fullname = fullname
+        self.email = email
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.fullname, user.email, user.role)
+
+    def is_teacher(self):
+        return self.role == 'teacher'
+
+    def is_student(self):
+        return self.role == 'student'
+
+    def __repr__(self):
+        return f'<Principal {self.username}>'
+
+
+class PrincipalCache:
+    """
+    Cache LRU + TTL của Principal trong từng process, khóa theo (user id, version)
+    Version của mỗi user là mtime của file đánh dấu trong PRINCIPAL_VERSION_DIR:
+    khi user bị sửa / xóa, file được touch nên mọi gunicorn worker đều thấy
+    version mới ở request kế tiếp (chỉ tốn 1 lần stat, không query DB)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _version_dir():
+        return current_app.config.get('PRINCIPAL_VERSION_DIR') or \
+            os.path.join(current_app.instance_path, 'principal-versions')
+
+    @staticmethod
+    def _marker(user_id):
+        return os.path.join(PrincipalCache._version_dir(), str(user_id))
+
+    @staticmethod
+    def _key(user_id):
+        # Nhiều app (database khác nhau) có thể chạy chung một process, vd: benchmark
+        return current_app.config['SQLALCHEMY_DATABASE_URI'], user_id
+
+    @staticmethod
+    def version(user_id):
+        try:
+            return os.stat(PrincipalCache._marker(user_id)).st_mtime_ns
+        except OSError:
+            return 0
+
+    def get(self, user_id):
+        """Trả về Principal còn hạn và đúng version, hoặc None"""
+        version = PrincipalCache.version(user_id)
+        key = PrincipalCache._key(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            principal, entry_version, expires_at = entry
+            if entry_version != version or expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def put(self, principal, version):
+        ttl = current_app.config.get('PRINCIPAL_CACHE_TTL', 300)
+        max_size = current_app.config.get('PRINCIPAL_CACHE_SIZE', 10000)
+        key = PrincipalCache._key(principal.id)
+        with self._lock:
+            self._entries[key] = (principal, version, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Bỏ cache của user ở process này và tăng version cho các process khác"""
+        with self._lock:
+            self._entries.pop(PrincipalCache._key(user_id), None)
+
+        marker = PrincipalCache._marker(user_id)
+        try:
+            os.makedirs(os.path.dirname(marker), exist_ok=True)
+            previous = PrincipalCache.version(user_id)
+            with open(marker, 'a'):
+                pass
+            # Bảo đảm mtime luôn tăng kể cả khi 2 lần sửa rơi vào cùng một tick đồng hồ
+            stamp = max(time.time_ns(), previous + 1)
+            os.utime(marker, ns=(stamp, stamp))
+        except OSError as e:
+            current_app.logger.warning(f'Không cập nhật được version principal {user_id}: {e}')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+def load_principal(user_id):
+    """
+    user_loader cho Flask-Login: lấy Principal từ cache, chỉ query DB khi
+    cache miss / hết hạn / version đổi
+    """
+    from app.models.user import User
+
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    # Đọc version TRƯỚC khi query để lần sửa xảy ra giữa chừng không bị che mất
+    version = PrincipalCache.version(user_id)
+    user = User.query.get(user_id)
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.put(principal, version)
+    return principal
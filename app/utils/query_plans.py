@@ -0,0 +1,162 @@
+import re
+from app import db
+from sqlalchemy import event
+from datetime import datetime
+
+
+# "SCAN users" (không có USING INDEX) = đọc toàn bộ bảng
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+# Sắp xếp toàn bộ kết quả trong bộ nhớ thay vì đọc theo thứ tự index
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|RIGHT PART OF ORDER BY)')
+
+# Probe được phép sort tạm: tìm kiếm OR trên nhiều index chỉ sắp xếp các dòng khớp tiền tố
+TEMP_SORT_ALLOWED = {'UserService.search_users', 'UserService.search_users(role)'}
+
+
+def _service_probes():
+    """
+    Các query đọc của service layer cần được index phục vụ
+    Mỗi probe là (tên, hàm không tham số); id = 1 và cursor mẫu là đủ vì
+    EXPLAIN QUERY PLAN không phụ thuộc dữ liệu
+    """
+    from app.services.assignment_service import AssignmentService
+    from app.services.attempt_service import AttemptService
+    from app.services.challenge_service import ChallengeService
+    from app.services.counter_service import CounterService
+    from app.services.job_service import JobService
+    from app.services.result_store_service import ResultStoreService
+    from app.services.search_service import SearchService
+    from app.services.user_service import UserService
+    from app.utils.pagination import encode_cursor
+
+    cursor = encode_cursor(datetime.utcnow(), 1)
+    return [
+        ('AssignmentService.get_all_assignments', lambda: AssignmentService.get_all_assignments()),
+        ('AssignmentService.get_all_assignments(after)', lambda: AssignmentService.get_all_assignments(after=cursor)),
+        ('AssignmentService.get_all_assignments(before)', lambda: AssignmentService.get_all_assignments(before=cursor)),
+        ('AssignmentService.get_assignments_with_status', lambda: AssignmentService.get_assignments_with_status(1)),
+        ('AssignmentService.get_submitted_assignment_ids', lambda: AssignmentService.get_submitted_assignment_ids(1)),
+        ('AssignmentService.get_assignment_by_id', lambda: AssignmentService.get_assignment_by_id(1)),
+        ('AssignmentService.get_submission_rows', lambda: AssignmentService.get_submission_rows(1)),
+        ('AssignmentService.get_submission_archive_entries', lambda: AssignmentService.get_submission_archive_entries(1)),
+        ('AssignmentService.get_submissions_by_assignment', lambda: AssignmentService.get_submissions_by_assignment(1)),
+        ('AssignmentService.get_submission_by_student_and_assignment',
+         lambda: AssignmentService.get_submission_by_student_and_assignment(1, 1)),
+        ('AssignmentService.get_all_submissions', lambda: AssignmentService.get_all_submissions()),
+        ('AssignmentService.get_all_submissions(after)', lambda: AssignmentService.get_all_submissions(after=cursor)),
+        ('AssignmentService.get_submissions_by_student', lambda: AssignmentService.get_submissions_by_student(1)),
+        ('AssignmentService.get_submissions_by_student(after)',
+         lambda: AssignmentService.get_submissions_by_student(1, after=cursor)),
+        ('AssignmentService.get_submission_stats', lambda: AssignmentService.get_submission_stats(1)),
+        ('UserService.get_all_users', lambda: UserService.get_all_users()),
+        ('UserService.get_all_users(after)', lambda: UserService.get_all_users(after=cursor)),
+        ('UserService.get_all_students', lambda: UserService.get_all_students()),
+        ('UserService.get_all_students(after)', lambda: UserService.get_all_students(after=cursor)),
+        ('UserService.get_all_teachers', lambda: UserService.get_all_teachers()),
+        ('UserService.search_users', lambda: UserService.search_users('probe')),
+        ('UserService.search_users(role)', lambda: UserService.search_users('probe', role='student', after=cursor)),
+        ('UserService.search_users(role only)', lambda: UserService.search_users(role='teacher')),
+        ('UserService.get_user_by_id', lambda: UserService.get_user_by_id(1)),
+        ('UserService.get_user_by_username', lambda: UserService.get_user_by_username('probe')),
+        ('UserService.get_user_by_email', lambda: UserService.get_user_by_email('probe@example.com')),
+        ('ChallengeService.get_all_challenges', lambda: ChallengeService.get_all_challenges()),
+        ('ChallengeService.get_all_challenges(after)', lambda: ChallengeService.get_all_challenges(after=cursor)),
+        ('ChallengeService.get_all_challenges_for_teacher', lambda: ChallengeService.get_all_challenges_for_teacher()),
+        ('ChallengeService.get_all_challenges_for_teacher(after)',
+         lambda: ChallengeService.get_all_challenges_for_teacher(after=cursor)),
+        ('ChallengeService.get_challenge_by_id', lambda: ChallengeService.get_challenge_by_id(1)),
+        ('CounterService.get_user_count', lambda: CounterService.get_user_count('student')),
+        ('CounterService.get_submission_count', lambda: CounterService.get_submission_count(1)),
+        ('CounterService.get_version', lambda: CounterService.get_version('assignments')),
+        ('JobService.get_stats', lambda: JobService.get_stats()),
+        ('JobService.get_failed_jobs', lambda: JobService.get_failed_jobs()),
+        ('AttemptService.get_challenge_leaderboard', lambda: AttemptService.get_challenge_leaderboard(1)),
+        ('AttemptService.get_overall_leaderboard', lambda: AttemptService.get_overall_leaderboard()),
+        ('AttemptService.get_standing', lambda: AttemptService.get_standing(1, 1)),
+        ('SearchService.search', lambda: SearchService.search('probe')),
+        ('SearchService.search(private)', lambda: SearchService.search('probe', include_private=True, page=2)),
+        ('ResultStoreService.pop', lambda: ResultStoreService.pop('probe', 1, 'challenge_result')),
+    ]
+
+
+def _seed_probe_rows():
+    """
+    Thêm 1 dòng mẫu cho mỗi bảng chính (trong transaction sẽ bị rollback)
+    để các nhánh code phụ thuộc dữ liệu (vd: query bài đã nộp) cũng được chạy
+    """
+    from app.models.assignment import Assignment
+    from app.models.challenge import Challenge
+    from app.models.submission import Submission
+    from app.models.user import User
+
+    teacher = User('probe_teacher', 'Probe', 'probe_teacher@example.com', None, 'teacher')
+    student = User('probe_student', 'Probe', 'probe_student@example.com', None, 'student')
+    teacher.password = student.password = '!'
+    db.session.add_all([teacher, student])
+    db.session.flush()
+    assignment = Assignment(title='Probe', teacher_id=teacher.id)
+    db.session.add(assignment)
+    db.session.add(Challenge(title='Probe', file_path='probe', filename='probe', teacher_id=teacher.id))
+    db.session.flush()
+    db.session.add(Submission(student_id=student.id, assignment_id=assignment.id, file_path='probe', filename='probe'))
+    db.session.flush()
+
+
+def analyze_plan(plan_details, allow_temp_sort=False):
+    """Trả về danh sách vấn đề (full scan / sort tạm) trong các dòng của query plan"""
+    problems = []
+    for detail in plan_details:
+        match = FULL_SCAN.match(detail)
+        if match:
+            problems.append(f'full table scan on {match.group(1)}')
+        elif TEMP_SORT.search(detail) and not allow_temp_sort:
+            problems.append(detail.lower())
+    return problems
+
+
+def check_query_plans():
+    """
+    Chạy mọi probe, thu các câu SELECT thực sự được gửi xuống SQLite,
+    rồi chạy EXPLAIN QUERY PLAN cho từng câu
+    Returns: list dict {probe, statement, plan, problems}
+    Chỉ hỗ trợ SQLite; mọi thay đổi dữ liệu đều bị rollback
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        raise RuntimeError('EXPLAIN QUERY PLAN check chỉ hỗ trợ SQLite')
+
+    captured = []
+    current_probe = [None]
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if current_probe[0] and statement.lstrip().upper().startswith('SELECT'):
+            captured.append((current_probe[0], statement, parameters))
+
+    results = []
+    seen = set()
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        _seed_probe_rows()
+        for name, probe in _service_probes():
+            current_probe[0] = name
+            probe()
+        current_probe[0] = None
+
+        connection = db.session.connection()
+        for name, statement, parameters in captured:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+            plan = [row[-1] for row in rows]
+            results.append({
+                'probe': name,
+                'statement': ' '.join(statement.split()),
+                'plan': plan,
+                'problems': analyze_plan(plan, allow_temp_sort=name in TEMP_SORT_ALLOWED),
+            })
+    finally:
+        current_probe[0] = None
+        event.remove(engine, 'before_cursor_execute', capture)
+        db.session.rollback()
+    return results
@@ -0,0 +1,30 @@
+from sqlalchemy import event
+
+
+def _apply_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def configure_sqlite(app):
+    """
+    Đăng ký PRAGMA trong SQLITE_PRAGMAS cho mọi kết nối SQLite mới của app
+    Không làm gì nếu database không phải SQLite hoặc không cấu hình PRAGMA
+    """
+    from app import db
+    
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+    
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            return
+        event.listen(engine, 'connect', _apply_pragmas(pragmas))
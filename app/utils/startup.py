@@ -0,0 +1,48 @@
+import os
+import weakref
+from jinja2 import FileSystemBytecodeCache
+
+
+def init_template_cache(app):
+    """
+    Lưu bytecode của template đã biên dịch xuống TEMPLATE_CACHE_DIR
+    (TEMPLATE_BYTECODE_CACHE): worker mới khởi động không phải parse lại template
+    Phải gọi trước lần đầu truy cập app.jinja_env
+    """
+    if not app.config.get('TEMPLATE_BYTECODE_CACHE'):
+        return
+    directory = app.config.get('TEMPLATE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja-cache')
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(directory)}
+
+
+def precompile_templates(app):
+    """
+    Biên dịch mọi template trong app/views (ghi vào bytecode cache nếu được bật)
+    Returns: số template đã biên dịch; template lỗi cú pháp sẽ ném TemplateSyntaxError
+    """
+    names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def dispose_engines_after_fork(app):
+    """
+    Sau fork (gunicorn --preload, multiprocessing), process con bỏ pool kết nối
+    kế thừa từ process cha mà không đóng chúng (close=False): kết nối SQLite
+    không được dùng chung giữa các process, process cha vẫn dùng được kết nối của mình
+    """
+    from app import db
+    
+    app_ref = weakref.ref(app)
+    
+    def after_fork():
+        target = app_ref()
+        if target is None:
+            return
+        with target.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+    
+    os.register_at_fork(after_in_child=after_fork)
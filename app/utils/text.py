@@ -0,0 +1,22 @@
+import unicodedata
+
+
+def normalize_key(value):
+    """
+    Chuẩn hóa chuỗi để tìm kiếm không phân biệt hoa thường / dấu:
+    'Nguyễn Văn Đức' -> 'nguyen van duc'
+    """
+    if value is None:
+        return None
+    value = unicodedata.normalize('NFKD', value.replace('đ', 'd').replace('Đ', 'D'))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.lower().split())
+
+
+def prefix_upper_bound(prefix):
+    """
+    Cận trên (không bao gồm) của mọi chuỗi bắt đầu bằng prefix
+    'abc' -> 'abd', dùng cho điều kiện key >= prefix AND key < cận trên
+    (range trên index thường, không cần LIKE / COLLATE NOCASE)
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
@@ -0,0 +1,76 @@
+"""
+Cấu hình gunicorn: gunicorn -c gunicorn.conf.py run:app
+
+Chọn profile worker bằng GUNICORN_PROFILE:
+- sync:     mỗi worker xử lý 1 request; client chậm (upload / download qua mạng yếu) giữ
+            nguyên worker suốt thời gian truyền -> chỉ dùng sau proxy có buffer (nginx)
+- gthread:  (mặc định) mỗi worker nhiều thread, upload / download chậm chỉ chiếm 1 thread
+- gevent / eventlet: mỗi worker hàng trăm greenlet, hợp với rất nhiều kết nối chậm;
+            cần cài gevent / eventlet. SQLite và hash mật khẩu vẫn chặn cả worker trong lúc
+            chạy, nên giữ PASSWORD_HASH_WORKERS > 0 và query ngắn
+
+Mặc định APP_CONFIG=production (xem cuối file)
+Ghi đè bằng GUNICORN_WORKERS, GUNICORN_THREADS, GUNICORN_WORKER_CONNECTIONS,
+GUNICORN_TIMEOUT, GUNICORN_BIND (hoặc PORT)
+Pool kết nối DB của mỗi worker được đặt theo số request đồng thời của profile
+(DB_POOL_SIZE / DB_MAX_OVERFLOW, đọc trong ProductionConfig) nếu chưa đặt sẵn
+"""
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name) or default)
+
+
+cores = multiprocessing.cpu_count()
+profile = os.environ.get('GUNICORN_PROFILE') or 'gthread'
+
+if profile == 'sync':
+    worker_class = 'sync'
+    workers = _env_int('GUNICORN_WORKERS', 2 * cores + 1)
+    concurrency = 1
+    # Worker sync bị giữ trong lúc nhận body: để đủ thời gian cho 1 chunk upload chậm
+    timeout = _env_int('GUNICORN_TIMEOUT', 120)
+elif profile == 'gthread':
+    worker_class = 'gthread'
+    workers = _env_int('GUNICORN_WORKERS', cores + 1)
+    threads = _env_int('GUNICORN_THREADS', 8)
+    concurrency = threads
+    # Heartbeat do thread chính gửi, không phụ thuộc request dài
+    timeout = _env_int('GUNICORN_TIMEOUT', 60)
+elif profile in ('gevent', 'eventlet'):
+    worker_class = profile
+    workers = _env_int('GUNICORN_WORKERS', cores)
+    worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 200)
+    # Greenlet chỉ chạm DB trong thời gian ngắn: pool nhỏ hơn nhiều so với số kết nối
+    concurrency = min(worker_connections, 16)
+    timeout = _env_int('GUNICORN_TIMEOUT', 60)
+else:
+    raise ValueError(f'GUNICORN_PROFILE không hợp lệ: {profile} (sync, gthread, gevent, eventlet)')
+
+bind = os.environ.get('GUNICORN_BIND') or f"0.0.0.0:{os.environ.get('PORT') or 8000}"
+graceful_timeout = 30
+keepalive = 5
+
+# Khởi động lại worker định kỳ (lệch nhau nhờ jitter để không restart cùng lúc)
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# sync / gthread: tạo app một lần trong master rồi fork (engine được dispose sau fork);
+# gevent / eventlet phải monkey-patch trước khi import app nên mỗi worker tự load
+preload_app = worker_class in ('sync', 'gthread')
+
+# File heartbeat trên tmpfs: tránh worker bị coi là treo khi đĩa chậm
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Server gunicorn chạy ProductionConfig (không tạo schema khi khởi động, WAL, pool, template
+# biên dịch sẵn) trừ khi APP_CONFIG được đặt khác; đặt ở đây để có hiệu lực cả khi preload
+os.environ.setdefault('APP_CONFIG', 'production')
+os.environ.setdefault('DB_POOL_SIZE', str(concurrency))
+# Thêm kết nối cho thread nền (ghi nhật ký challenge, metrics) và request stream
+os.environ.setdefault('DB_MAX_OVERFLOW', str(max(2, concurrency // 2)))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
@@ -3,4 +3,8 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    # Server dev: nâng cấp schema trước khi chạy (gunicorn / production dùng flask db upgrade)
+    from app.schema import upgrade_schema
+    with app.app_context():
+        upgrade_schema()
     app.run(debug=True, host='0.0.0.0', port=5000)
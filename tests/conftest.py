@@ -0,0 +1,39 @@
+import pytest
+from app import create_app, db
+
+
+def make_app(tmp_path, **overrides):
+    """App với SQLite trong bộ nhớ, thư mục upload / cache nằm trong tmp_path"""
+    return create_app(config_overrides={
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'WTF_CSRF_ENABLED': False,
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'PRINCIPAL_VERSION_DIR': str(tmp_path / 'principal-versions'),
+        'AUTO_UPGRADE_SCHEMA': True,
+        'FRAGMENT_CACHE_TYPE': 'null',
+        'METRICS_ENABLED': False,
+        'ATTEMPT_GROUP_COMMIT': False,
+        'NPLUSONE_DETECT': 'raise',
+        **overrides,
+    })
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user_id):
+    """Đăng nhập bằng session của Flask-Login (bỏ qua form và hash mật khẩu)"""
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import db
+from app.models.assignment import Assignment
+from app.models.submission import Submission
+from app.models.user import User
+from tests.conftest import login, make_app
+
+
+def _make_user(username, role):
+    user = User(username=username, fullname=username.title(), email=f'{username}@example.com',
+                phone=None, role=role)
+    user.password = 'x'
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def _seed(count):
+    """count bài tập, mỗi bài một giáo viên khác nhau, sinh viên đã nộp một nửa số bài"""
+    teachers = [_make_user(f'teacher{i}', 'teacher') for i in range(count)]
+    student = _make_user('student', 'student')
+    now = datetime.utcnow()
+    for i in range(count):
+        assignment = Assignment(title=f'Bài {i}', description='', teacher_id=teachers[i].id,
+                                deadline=now + timedelta(days=i - count // 2))
+        db.session.add(assignment)
+        db.session.flush()
+        if i % 2 == 0:
+            db.session.add(Submission(file_path=f'sub{i}.txt', filename=f'sub{i}.txt',
+                                      student_id=student.id, assignment_id=assignment.id))
+    db.session.commit()
+    return student.id
+
+
+def _count_queries(app, client, url):
+    """Số câu lệnh SQL được gửi tới database trong một request"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements), response
+
+
+def _list_query_count(tmp_path, count):
+    """Số query của trang /assignments/ (sinh viên) khi có count bài tập"""
+    app = make_app(tmp_path / str(count), ITEMS_PER_PAGE=50)
+    # Seed trong app context riêng: request phải tự load dữ liệu, không dùng lại identity map
+    with app.app_context():
+        student_id = _seed(count)
+        db.session.remove()
+    client = app.test_client()
+    login(client, student_id)
+    # Request đầu nạp cache principal / version, chỉ đếm request thứ hai
+    client.get('/assignments/')
+    total, response = _count_queries(app, client, '/assignments/')
+    assert f'Bài {count - 1}'.encode() in response.data
+    return total
+
+
+def test_assignment_list_query_count_is_constant(tmp_path):
+    # NPLUSONE_DETECT='raise' (make_app): lazy-load lặp lại trong template cũng làm test lỗi
+    assert _list_query_count(tmp_path, 3) == _list_query_count(tmp_path, 30)
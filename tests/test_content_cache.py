@@ -0,0 +1,41 @@
+import codecs
+import os
+import pytest
+from app.models.challenge import Challenge
+from app.services.challenge_service import ChallengeService
+from app.utils.content_cache import read_text
+
+
+THRESHOLD = 1024 * 1024
+TEXT = 'Nước chảy đá mòn\r\n' * 80000  # > THRESHOLD khi mã hóa
+
+
+@pytest.mark.parametrize('encoding, bom', [
+    ('utf-8', b''),
+    ('utf-8', codecs.BOM_UTF8),
+    ('utf-16-le', codecs.BOM_UTF16_LE),
+    ('utf-32-be', codecs.BOM_UTF32_BE),
+    ('latin-1', b''),
+])
+def test_read_text_detects_encoding_above_mmap_threshold(tmp_path, encoding, bom):
+    text = TEXT if encoding != 'latin-1' else 'Café crème\r\n' * 100000
+    path = tmp_path / 'content.txt'
+    path.write_bytes(bom + text.encode(encoding))
+    assert os.path.getsize(path) >= THRESHOLD
+
+    content = read_text(str(path), None, THRESHOLD)
+
+    assert content == text.replace('\r\n', '\n')
+
+
+def test_legacy_challenge_above_mmap_threshold_is_readable(app):
+    # Challenge tạo trước khi có cột encoding: encoding = NULL
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], 'legacy.txt'), 'wb') as f:
+        f.write(TEXT.encode('utf-8'))
+    challenge = Challenge(title='Cũ', file_path='legacy.txt', filename='legacy', encoding=None)
+
+    content, error = ChallengeService.read_challenge_content(challenge)
+
+    assert error is None
+    assert content == TEXT.replace('\r\n', '\n')
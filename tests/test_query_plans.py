@@ -0,0 +1,18 @@
+from app.utils.query_plans import analyze_plan, check_query_plans
+
+
+def test_service_queries_use_indexes(app):
+    """Mọi query đọc của service layer phải được index phục vụ (như flask db check-plans)"""
+    results = check_query_plans()
+    assert results
+    failures = [
+        f"{result['probe']}: {'; '.join(result['problems'])}\n    {result['statement']}"
+        for result in results if result['problems']
+    ]
+    assert not failures, '\n'.join(failures)
+
+
+def test_analyze_plan_flags_full_scan_and_temp_sort():
+    assert analyze_plan(['SCAN users'])
+    assert analyze_plan(['SEARCH users USING INDEX ix_users_created (created_at<?)', 'USE TEMP B-TREE FOR ORDER BY'])
+    assert not analyze_plan(['SEARCH users USING INDEX ix_users_created (created_at<?)'])
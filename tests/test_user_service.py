@@ -0,0 +1,25 @@
+from app import db
+from app.models.stored_result import StoredResult
+from app.models.user import User
+from app.services.result_store_service import ResultStoreService
+from app.services.user_service import UserService
+from tests.conftest import make_app
+
+
+def test_delete_user_removes_unexpired_stored_results(tmp_path):
+    # Bật kiểm tra foreign key như database không phải SQLite
+    app = make_app(tmp_path, SQLITE_PRAGMAS={'foreign_keys': 'ON'})
+    with app.test_request_context():
+        user = User(username='sv1', fullname='Sinh Viên', email='sv1@example.com', phone=None, role='student')
+        user.password = 'x'
+        db.session.add(user)
+        db.session.commit()
+        key, error = ResultStoreService.put(user.id, 'challenge_result', {'is_correct': True})
+        assert error is None
+
+        ok, error = UserService.delete_user(user.id)
+
+        assert (ok, error) == (True, None)
+        assert db.session.get(StoredResult, key) is None
+        assert db.session.get(User, user.id) is None
+        db.session.remove()